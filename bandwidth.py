@@ -0,0 +1,251 @@
+import io
+import os
+import time
+import logging
+import threading
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+DIRECTIONS = ('ingress', 'egress')  # Скачивание и отдача
+
+class TokenBucket:
+    """
+    Ведро токенов (1 токен = 1 байт) с изменяемой скоростью
+    Потребление сверх накопленного уходит в долг, который отрабатывается
+    ожиданием; ожидание идет короткими отрезками, чтобы новая скорость
+    применялась сразу
+    """
+    BURST_SECONDS = 1.0  # Емкость ведра в секундах передачи на текущей скорости
+    MAX_SLEEP = 0.25
+
+    def __init__(self, rate=None):
+        self._lock = threading.Lock()
+        self.rate = rate
+        self.tokens = 0.0
+        self._updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        if self.rate:
+            capacity = self.rate * self.BURST_SECONDS
+            self.tokens = min(capacity, self.tokens + (now - self._updated) * self.rate)
+        else:
+            self.tokens = 0.0  # Без ограничения долг не копится
+        self._updated = now
+
+    def set_rate(self, rate):
+        with self._lock:
+            self._refill()
+            self.rate = rate or None
+
+    def consume(self, amount):
+        """Списание amount байт; блокирует поток, пока скорость выше лимита"""
+        with self._lock:
+            self._refill()
+            if not self.rate:
+                return
+            self.tokens -= amount
+        while True:
+            with self._lock:
+                self._refill()
+                if not self.rate or self.tokens >= 0:
+                    return
+                wait = min(-self.tokens / self.rate, self.MAX_SLEEP)
+            time.sleep(wait)
+
+class BandwidthJob:
+    """
+    Участник распределения полосы: загрузка или отдача одного файла
+    Получает долю общего лимита направления пропорционально своему весу
+    """
+    def __init__(self, scheduler, direction, weight, name):
+        self.scheduler = scheduler
+        self.direction = direction
+        self.weight = weight
+        self.name = name
+        self.bucket = TokenBucket()
+        self._seen = {}  # Файл -> уже учтенные байты (для хука yt-dlp)
+        self._seen_lock = threading.Lock()
+        self._closed = False
+
+    @property
+    def rate(self):
+        """Текущая доля полосы, байт/с (None - без ограничения)"""
+        return self.bucket.rate
+
+    def consume(self, amount):
+        self.scheduler.refresh_profile()
+        if amount > 0:
+            self.bucket.consume(amount)
+
+    def progress_hook(self, d):
+        """
+        Хук прогресса yt-dlp: вызывается потоком загрузки (и потоками фрагментов),
+        поэтому ожидание в нем замедляет саму загрузку
+        """
+        if d.get('status') != 'downloading':
+            return
+        downloaded = d.get('downloaded_bytes') or 0
+        key = d.get('tmpfilename') or d.get('filename')
+        with self._seen_lock:
+            previous = self._seen.get(key, 0)
+            self._seen[key] = downloaded
+        # Уменьшение счетчика - загрузка файла началась заново
+        self.consume(downloaded - previous if downloaded >= previous else downloaded)
+
+    def close(self):
+        if not self._closed:
+            self._closed = True
+            self.scheduler._unregister(self)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+class BandwidthScheduler:
+    """
+    Общий для процесса планировщик полосы
+    Для скачивания (ingress) и отдачи (egress) задается общий лимит в байт/с;
+    он делится между активными задачами пропорционально их весам, поэтому
+    сумма скоростей не превышает лимита. Лимиты меняются на ходу (set_caps),
+    профили по времени суток перекрывают базовые лимиты в своем интервале:
+    {'start': '09:00', 'end': '18:00', 'ingress': ..., 'egress': ...}
+    """
+    PROFILE_CHECK_INTERVAL = 30  # Как часто проверять смену профиля, секунд
+
+    def __init__(self, settings=None):
+        settings = settings or {}
+        self._lock = threading.Lock()
+        self._jobs = {direction: [] for direction in DIRECTIONS}
+        self._base_caps = {direction: settings.get(direction) for direction in DIRECTIONS}
+        self._profiles = list(settings.get('profiles', []))
+        self._caps = dict(self._base_caps)
+        self._profile_checked = 0.0
+        self.refresh_profile(force=True)
+
+    @staticmethod
+    def _minutes(value):
+        hours, minutes = value.split(':')
+        return int(hours) * 60 + int(minutes)
+
+    def _active_profile(self, now=None):
+        """Профиль, действующий в текущее время суток, или None"""
+        now = now or datetime.now()
+        minute = now.hour * 60 + now.minute
+        for profile in self._profiles:
+            start, end = self._minutes(profile['start']), self._minutes(profile['end'])
+            # Интервал может переходить через полночь (например, 22:00-06:00)
+            if start <= minute < end if start <= end else (minute >= start or minute < end):
+                return profile
+        return None
+
+    def refresh_profile(self, force=False):
+        """Пересчет лимитов по профилю времени суток (не чаще PROFILE_CHECK_INTERVAL)"""
+        now = time.monotonic()
+        if not force and now - self._profile_checked < self.PROFILE_CHECK_INTERVAL:
+            return
+        with self._lock:
+            self._profile_checked = now
+            profile = self._active_profile() or {}
+            caps = {direction: profile.get(direction, self._base_caps[direction]) for direction in DIRECTIONS}
+            if caps != self._caps:
+                logger.info(f"Лимиты полосы: скачивание {self._format_cap(caps['ingress'])}, "
+                            f"отдача {self._format_cap(caps['egress'])}")
+                self._caps = caps
+                for direction in DIRECTIONS:
+                    self._rebalance(direction)
+
+    @staticmethod
+    def _format_cap(cap):
+        return f"{cap / (1024 * 1024):.1f} МБ/с" if cap else "без ограничения"
+
+    def _rebalance(self, direction):
+        """Распределение лимита направления между задачами по весам (под self._lock)"""
+        jobs = self._jobs[direction]
+        cap = self._caps[direction]
+        total_weight = sum(job.weight for job in jobs)
+        for job in jobs:
+            job.bucket.set_rate(cap * job.weight / total_weight if cap and total_weight else None)
+
+    def set_caps(self, **caps):
+        """Изменение базовых лимитов на ходу: set_caps(ingress=..., egress=...); None - без ограничения"""
+        unknown = set(caps) - set(DIRECTIONS)
+        if unknown:
+            raise ValueError(f"Неизвестные направления: {', '.join(sorted(unknown))}")
+        with self._lock:
+            self._base_caps.update(caps)
+        self.refresh_profile(force=True)
+
+    def set_profiles(self, profiles):
+        """Замена профилей времени суток на ходу"""
+        with self._lock:
+            self._profiles = list(profiles)
+        self.refresh_profile(force=True)
+
+    def caps(self):
+        """Действующие лимиты направлений"""
+        self.refresh_profile()
+        with self._lock:
+            return dict(self._caps)
+
+    def register(self, direction, weight=1.0, name=None):
+        """Новая задача в направлении direction; закрывается через close() или with"""
+        if direction not in DIRECTIONS:
+            raise ValueError(f"Неизвестное направление: {direction}")
+        job = BandwidthJob(self, direction, max(float(weight), 0.01), name)
+        with self._lock:
+            self._jobs[direction].append(job)
+            self._rebalance(direction)
+        return job
+
+    def _unregister(self, job):
+        with self._lock:
+            if job in self._jobs[job.direction]:
+                self._jobs[job.direction].remove(job)
+                self._rebalance(job.direction)
+
+class ThrottledReader:
+    """
+    Файлоподобное тело запроса из частей (bytes или путь к файлу)
+    Читается потоком по кускам, каждый кусок списывается с задачи отдачи;
+    requests отправляет такое тело без загрузки файла в память
+    """
+    def __init__(self, parts, job=None):
+        self._parts = list(parts)
+        self._job = job
+        self._length = sum(len(part) if isinstance(part, bytes) else os.path.getsize(part)
+                           for part in self._parts)
+        self._current = None
+
+    def __len__(self):
+        return self._length
+
+    def _next_part(self):
+        if not self._parts:
+            return False
+        part = self._parts.pop(0)
+        self._current = io.BytesIO(part) if isinstance(part, bytes) else open(part, 'rb')
+        return True
+
+    def read(self, size=-1):
+        chunks = []
+        while size != 0 and (self._current or self._next_part()):
+            chunk = self._current.read(size)
+            if not chunk:
+                self.close()
+                continue
+            chunks.append(chunk)
+            if size > 0:
+                size -= len(chunk)
+        data = b''.join(chunks)
+        if self._job:
+            self._job.consume(len(data))
+        return data
+
+    def close(self):
+        if self._current:
+            self._current.close()
+            self._current = None
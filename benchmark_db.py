@@ -0,0 +1,127 @@
+"""
+Микро-бенчмарк VideoDatabase: пул соединений в режиме WAL, пакетная вставка
+и сжатое хранение метаданных против прежнего поведения (новое соединение на
+каждый вызов и полный JSON в колонке metadata).
+
+Запуск: python benchmark_db.py [количество_видео]
+"""
+import json
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+
+from database import VideoDatabase
+
+
+class LegacyVideoDatabase(VideoDatabase):
+    """Прежнее поведение: новое соединение без настроек и несжатый JSON"""
+
+    INSERT_VIDEO_SQL = '''
+        INSERT OR REPLACE INTO videos (
+            video_id, url, title, uploader, duration, view_count,
+            upload_date, thumbnail, description, download_date,
+            download_path, metadata
+        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    '''
+
+    def _connection(self):
+        return sqlite3.connect(self.db_path)
+
+    def _video_row(self, video_info, download_path=None):
+        row = super()._video_row(video_info, download_path)
+        return row[:11] + (json.dumps(video_info),)
+
+    def get_video(self, url, full=False):
+        with self._connection() as conn:
+            result = conn.execute(
+                'SELECT metadata FROM videos WHERE video_id = ?', (url.split('=')[-1],)
+            ).fetchone()
+            return json.loads(result[0]) if result else None
+
+
+def make_video_info(i):
+    """Информация о видео, похожая по объему на ответ yt-dlp"""
+    video_id = f"vid{i:08d}"
+    stream_url = f"https://rr1---sn-abc.googlevideo.com/videoplayback?id={video_id}&sig=" + 'x' * 300
+    return {
+        'id': video_id,
+        'webpage_url': f"https://www.youtube.com/watch?v={video_id}",
+        'title': f"Тестовое видео номер {i}",
+        'uploader': f"Канал {i % 100}",
+        'duration': 60 + i % 3600,
+        'view_count': i * 17,
+        'upload_date': '20240101',
+        'thumbnail': f"https://i.ytimg.com/vi/{video_id}/hqdefault.jpg",
+        'description': "Описание видео. " * 50,
+        'formats': [
+            {
+                'format_id': str(n), 'ext': 'mp4', 'height': 144 * (n % 8),
+                'vcodec': 'avc1.640028', 'acodec': 'none', 'url': stream_url,
+                'http_headers': {'User-Agent': 'Mozilla/5.0', 'Accept': '*/*'},
+            }
+            for n in range(60)
+        ],
+        'thumbnails': [
+            {'url': f"https://i.ytimg.com/vi/{video_id}/{n}.jpg", 'id': str(n)} for n in range(40)
+        ],
+        'automatic_captions': {
+            lang: [{'ext': ext, 'url': f"https://www.youtube.com/api/timedtext?v={video_id}&lang={lang}"}
+                   for ext in ('json3', 'srv1', 'srv2', 'srv3', 'ttml', 'vtt')]
+            for lang in ('en', 'ru', 'de', 'fr', 'es', 'it', 'ja', 'ko', 'pt', 'uk')
+        },
+        'heatmap': [{'start_time': n, 'end_time': n + 1, 'value': 0.5} for n in range(100)],
+    }
+
+
+def run(db, videos, bulk=False, full=False):
+    start = time.perf_counter()
+    if bulk:
+        db.add_videos(videos)
+    else:
+        for video in videos:
+            db.add_video(video)
+    insert_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for video in videos:
+        db.get_video(video['webpage_url'], full=full)
+    lookup_time = time.perf_counter() - start
+
+    return insert_time, lookup_time
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    videos = [make_video_info(i) for i in range(count)]
+
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        modes = (
+            ('legacy', LegacyVideoDatabase, False, True),
+            ('pooled', VideoDatabase, False, False),
+            ('bulk', VideoDatabase, True, False),
+            ('full', VideoDatabase, True, True),
+        )
+        for name, cls, bulk, full in modes:
+            db_path = os.path.join(tmp_dir, f"{name}.db")
+            db = cls(db_path)
+            insert_time, lookup_time = run(db, videos, bulk, full)
+            db.close()
+            results[name] = (insert_time, lookup_time, os.path.getsize(db_path))
+
+    print(f"Видео: {count}")
+    print(f"{'режим':<8} {'вставка, оп/с':>15} {'get_video, мкс':>15} {'размер БД, МБ':>15}")
+    for name, (insert_time, lookup_time, size) in results.items():
+        print(f"{name:<8} {count / insert_time:>15.0f} "
+              f"{lookup_time / count * 1e6:>15.1f} {size / 1024 / 1024:>15.2f}")
+
+    legacy, pooled, bulk = results['legacy'], results['pooled'], results['bulk']
+    print(f"Ускорение вставки: x{legacy[0] / pooled[0]:.1f}, чтения: x{legacy[1] / pooled[1]:.1f}")
+    print(f"Ускорение пакетной вставки: x{legacy[0] / bulk[0]:.1f}")
+    print(f"Размер БД: x{legacy[2] / bulk[2]:.1f} меньше")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,98 @@
+"""
+Бенчмарк фильтра результатов: прежняя проверка any(marker in field) по каждому
+полю против скомпилированного ContentFilter на корпусе видео с длинными описаниями.
+Заодно проверяется, что оба способа отсеивают одни и те же видео.
+
+Запуск: python benchmark_filter.py [количество_видео] [длина_описания]
+"""
+import random
+import sys
+import time
+
+from content_filter import ContentFilter, FilterRule
+
+WORDS = (
+    'видео обзор свежий выпуск музыка играем сегодня рецепт канал подписка '
+    'лайк комментарий ссылка описание трек альбом концерт тур беседа '
+    'video review music today recipe channel subscribe like comment link '
+    'track album concert tour interview gameplay tutorial guide stream'
+).split()
+
+
+def legacy_rejects(video, markers, countries, languages, excluded_words):
+    """Прежняя проверка из search_youtube_videos"""
+    for field in ('channel', 'channel_title', 'uploader'):
+        if any(marker in video.get(field, '').lower() for marker in markers):
+            return True
+    if video.get('channel_language', '').lower() in languages:
+        return True
+    if video.get('channel_country', '').lower() in countries:
+        return True
+    for field in ('channel_description', 'title', 'description'):
+        if any(marker in video.get(field, '').lower() for marker in markers):
+            return True
+    description = video.get('description', '').lower()
+    return bool(excluded_words) and any(word in description for word in excluded_words)
+
+
+def make_corpus(count, description_length, markers):
+    rng = random.Random(42)
+
+    def text(length):
+        words = []
+        size = 0
+        while size < length:
+            word = rng.choice(WORDS)
+            words.append(word)
+            size += len(word) + 1
+        # Примерно в каждом десятом тексте встречается маркер
+        if rng.random() < 0.1:
+            words.insert(rng.randrange(len(words)), rng.choice(markers))
+        return ' '.join(words)
+
+    return [
+        {
+            'title': text(60),
+            'channel': text(15),
+            'uploader': text(15),
+            'channel_description': text(description_length // 4),
+            'description': text(description_length),
+            'channel_country': rng.choice(['RU', 'US', 'DE', 'UA', '']),
+        }
+        for _ in range(count)
+    ]
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    description_length = int(sys.argv[2]) if len(sys.argv) > 2 else 5000
+    excluded_words = ['реклама', 'промокод', 'sponsor']
+
+    base = ContentFilter.from_file()
+    engine = base.extend([FilterRule('excluded_words', ('description',), excluded_words)])
+    rules = {rule.name: rule for rule in base.rules}
+    markers = list(rules['ukrainian_markers'].markers)
+    countries = rules['ukrainian_country'].values
+    languages = rules['ukrainian_language'].values
+
+    corpus = make_corpus(count, description_length, markers + excluded_words)
+
+    start = time.perf_counter()
+    legacy = [legacy_rejects(video, markers, countries, languages, excluded_words) for video in corpus]
+    legacy_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    compiled = [engine.match(video) is not None for video in corpus]
+    compiled_time = time.perf_counter() - start
+
+    print(f"Видео: {count}, длина описания: {description_length}, маркеров: {len(markers)}")
+    print(f"{'способ':<10} {'мкс на видео':>14} {'отсеяно':>10}")
+    print(f"{'legacy':<10} {legacy_time / count * 1e6:>14.1f} {sum(legacy):>10}")
+    print(f"{'compiled':<10} {compiled_time / count * 1e6:>14.1f} {sum(compiled):>10}")
+    print(f"Ускорение: x{legacy_time / compiled_time:.1f}")
+    mismatches = sum(a != b for a, b in zip(legacy, compiled))
+    print(f"Расхождений: {mismatches}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,63 @@
+"""
+Бенчмарк пула YoutubeDL: задержка получения метаданных с созданием нового
+экземпляра на каждый вызов (прежнее поведение) и с экземпляром из пула.
+
+Запуск: python benchmark_ytdl.py [URL] [количество_вызовов]
+Без URL измеряется только подготовка экземпляра (без сети).
+"""
+import statistics
+import sys
+import tempfile
+import time
+
+from yt_dlp import YoutubeDL
+
+from ytdl_pool import YoutubeDLPool
+
+
+def measure(call, count):
+    timings = []
+    for _ in range(count):
+        start = time.perf_counter()
+        call()
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def report(name, timings):
+    print(f"{name:<8} медиана {statistics.median(timings) * 1000:>9.1f} мс, "
+          f"первый вызов {timings[0] * 1000:>9.1f} мс")
+
+
+def main():
+    url = sys.argv[1] if len(sys.argv) > 1 else None
+    count = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+
+    with tempfile.TemporaryDirectory() as cachedir:
+        pool = YoutubeDLPool(cachedir=cachedir)
+        options = pool.options('metadata')
+
+        def fresh():
+            with YoutubeDL(options) as ydl:
+                ydl.get_info_extractor('Youtube')
+                if url:
+                    ydl.extract_info(url, download=False)
+
+        def pooled():
+            with pool.acquire('metadata') as ydl:
+                ydl.get_info_extractor('Youtube')
+                if url:
+                    ydl.extract_info(url, download=False)
+
+        print(f"Вызовов: {count}, {'URL: ' + url if url else 'без сети'}")
+        fresh_timings = measure(fresh, count)
+        report('fresh', fresh_timings)
+        pooled_timings = measure(pooled, count)
+        report('pooled', pooled_timings)
+        pool.close()
+
+    print(f"Ускорение (медиана): x{statistics.median(fresh_timings) / statistics.median(pooled_timings):.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,188 @@
+"""
+Пакетная загрузка без графического интерфейса
+
+Источники ссылок: аргументы, файл со списком (например, link.txt; '-' - stdin),
+stdin при перенаправлении ввода или URL канала. Видео скачиваются в нескольких
+процессах (см. job_engine.py) и при --vk загружаются в VK. Ход работы и
+результаты выводятся в stdout построчно в формате JSON (одно событие на
+строку), журнал - в stderr.
+
+Примеры:
+    python cli.py -f link.txt -j 4
+    cat link.txt | python cli.py --vk
+    python cli.py --channel https://www.youtube.com/@channel --max-videos 20
+
+Коды завершения:
+    0   - все видео скачаны (и загружены в VK)
+    1   - часть видео не удалось скачать или загрузить
+    2   - неверные аргументы или нет ссылок
+    3   - нет действующего токена VK для --vk
+    130 - прервано пользователем
+"""
+import sys
+import json
+import time
+import logging
+import argparse
+import threading
+import multiprocessing
+
+from main import get_channel_videos, logger, bandwidth, download_engine, OUTPUT_DIR
+from youtube_id import video_key
+from job_engine import JobEngine, COMPLETED, FINAL_STATES
+
+EXIT_OK = 0
+EXIT_FAILED = 1
+EXIT_USAGE = 2
+EXIT_VK_AUTH = 3
+EXIT_INTERRUPTED = 130
+
+DEFAULT_WORKERS = 3
+# Служебные поля событий движка, которые не выводятся
+HIDDEN_FIELDS = ('event', 'state', 'pid')
+
+class EventWriter:
+    """Вывод событий в формате JSON Lines; строки разных потоков не перемешиваются"""
+    def __init__(self, stream=None):
+        self.stream = stream or sys.stdout
+        self._lock = threading.Lock()
+
+    def emit(self, event, **fields):
+        line = json.dumps({'event': event, 'time': round(time.time(), 3), **fields}, ensure_ascii=False)
+        with self._lock:
+            self.stream.write(line + '\n')
+            self.stream.flush()
+
+def read_urls(lines):
+    """Ссылки из строк файла: пустые строки и комментарии (#) пропускаются, повторы удаляются"""
+    urls = []
+    seen = set()
+    for line in lines:
+        url = line.strip()
+        if not url or url.startswith('#'):
+            continue
+        key = video_key(url)
+        if key not in seen:
+            seen.add(key)
+            urls.append(url)
+    return urls
+
+def collect_urls(args):
+    """Все ссылки из аргументов, файла, stdin и канала"""
+    lines = list(args.urls)
+    if args.file == '-':
+        lines.extend(sys.stdin)
+    elif args.file:
+        with open(args.file, 'r', encoding='utf-8') as f:
+            lines.extend(f)
+    elif not args.urls and not args.channel:
+        if sys.stdin.isatty():
+            # Запуск без аргументов в терминале: одна ссылка, как раньше
+            sys.stderr.write("Введите ссылку на YouTube видео: ")
+            sys.stderr.flush()
+            lines.append(sys.stdin.readline())
+        else:
+            lines.extend(sys.stdin)
+    if args.channel:
+        videos = get_channel_videos(args.channel, args.max_videos)
+        lines.extend(video['url'] for video in videos)
+    return read_urls(lines)
+
+def check_vk_token():
+    """Проверка сохраненного токена VK до начала загрузок"""
+    from vk_api import VkApi
+    vk_api = VkApi()
+    access_token = vk_api.get_current_token()
+    return bool(access_token) and vk_api.check_token(access_token)
+
+def forward_event(events, event):
+    """Событие задачи движка -> строка JSON (completed не выводится: его заменяют downloaded/uploaded)"""
+    if event['event'] == COMPLETED:
+        return
+    fields = {key: value for key, value in event.items() if key not in HIDDEN_FIELDS}
+    events.emit(event['event'], **fields)
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        description="Пакетная загрузка видео YouTube (события - JSON Lines в stdout)"
+    )
+    parser.add_argument('urls', nargs='*', help="ссылки на видео")
+    parser.add_argument('-f', '--file', help="файл со ссылками, по одной в строке ('-' - stdin)")
+    parser.add_argument('-c', '--channel', help="URL канала: скачать его последние видео")
+    parser.add_argument('--max-videos', type=int, default=50, help="видео с канала (по умолчанию 50)")
+    parser.add_argument('-j', '--workers', type=int, default=DEFAULT_WORKERS,
+                        help=f"параллельных загрузок (по умолчанию {DEFAULT_WORKERS})")
+    parser.add_argument('-o', '--output', default=OUTPUT_DIR, help=f"папка для видео (по умолчанию {OUTPUT_DIR})")
+    parser.add_argument('--format', help="ID формата yt-dlp (по умолчанию 1080p MP4)")
+    parser.add_argument('--preset', choices=list(download_engine.PRESETS),
+                        help="настройки движка загрузки (по умолчанию из config.py)")
+    parser.add_argument('--limit', type=float, help="общий лимит скачивания, МБ/с")
+    parser.add_argument('--force', action='store_true', help="скачивать заново уже скачанные видео")
+    parser.add_argument('--vk', action='store_true', help="загружать видео в VK после скачивания")
+    parser.add_argument('-v', '--verbose', action='store_true', help="подробный журнал в stderr")
+    return parser
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if args.workers < 1:
+        parser.error("количество потоков должно быть положительным")
+
+    # stdout занят событиями; журнал в консоли (stderr) - только предупреждения
+    for handler in logging.getLogger().handlers:
+        if type(handler) is logging.StreamHandler:
+            handler.setLevel(logging.DEBUG if args.verbose else logging.WARNING)
+
+    if args.limit:
+        bandwidth.set_caps(ingress=int(args.limit * 1024 * 1024))
+
+    events = EventWriter()
+    try:
+        urls = collect_urls(args)
+    except Exception as e:
+        events.emit('error', error=f"Не удалось получить список ссылок: {str(e)}")
+        return EXIT_USAGE
+    if not urls:
+        events.emit('error', error="Нет ссылок для загрузки")
+        return EXIT_USAGE
+
+    if args.vk and not check_vk_token():
+        events.emit('error', error="Нет действующего токена VK, выполните авторизацию (test_vk_auth.py)")
+        return EXIT_VK_AUTH
+
+    events.emit('queued', count=len(urls), workers=args.workers)
+    started = time.monotonic()
+    engine = JobEngine(max_workers=args.workers)
+    engine.subscribe(lambda event: forward_event(events, event))
+    try:
+        job_ids = [
+            engine.submit(
+                url, output_dir=args.output, format_id=args.format,
+                engine_overrides=download_engine.PRESETS.get(args.preset),
+                reuse_existing=not args.force, upload_vk=args.vk,
+            )
+            for url in urls
+        ]
+        succeeded = 0
+        for job_id in job_ids:
+            # Ожидание короткими отрезками, чтобы Ctrl+C срабатывал и в Windows
+            while engine.wait(job_id, timeout=0.5)['state'] not in FINAL_STATES:
+                pass
+            succeeded += engine.status(job_id)['state'] == COMPLETED
+    except KeyboardInterrupt:
+        succeeded = sum(job['state'] == COMPLETED for job in engine.status().values())
+        events.emit('interrupted', succeeded=succeeded, total=len(urls))
+        # Незавершенные загрузки остаются в журнале и продолжатся при следующем запуске
+        engine.shutdown(cancel_running=True)
+        return EXIT_INTERRUPTED
+    engine.shutdown()
+
+    failed = len(urls) - succeeded
+    events.emit('summary', total=len(urls), succeeded=succeeded, failed=failed,
+                elapsed=round(time.monotonic() - started, 1))
+    logger.info(f"Пакетная загрузка завершена: успешно {succeeded}, с ошибками {failed}")
+    return EXIT_FAILED if failed else EXIT_OK
+
+if __name__ == '__main__':
+    multiprocessing.freeze_support()  # Рабочие процессы загрузок в собранном exe
+    sys.exit(main())
@@ -1,6 +1,25 @@
 # Директория для сохранения видео
 OUTPUT_DIR = 'downloads'
 
+# Настройки движка загрузки (необязательно, см. download_engine.DownloadEngine)
+DOWNLOAD_ENGINE = {
+    'concurrent_fragments': 4,        # Одновременно загружаемых фрагментов DASH/HLS
+    'http_chunk_size': 10485760,      # Размер HTTP-запроса, байт
+    'external_downloader': None,      # 'aria2c' для загрузки внешней программой
+    'aria2c_connections': 16,
+    'aria2c_split': 16,
+}
+
+# Общие лимиты полосы, байт/с (None - без ограничения), см. bandwidth.BandwidthScheduler
+BANDWIDTH = {
+    'ingress': None,                  # Скачивание (все загрузки yt-dlp вместе)
+    'egress': None,                   # Отдача (загрузка видео в VK)
+    # Профили по времени суток перекрывают лимиты выше в своем интервале
+    'profiles': [
+        # {'start': '09:00', 'end': '18:00', 'ingress': 2 * 1024 * 1024, 'egress': 1024 * 1024},
+    ],
+}
+
 # Настройки VK API
 VK_CLIENT_ID = 'YOUR_VK_CLIENT_ID'  # ID вашего приложения VK
 VK_GROUP_ID = 'YOUR_GROUP_ID'       # ID группы ВКонтакте (без минуса)
@@ -0,0 +1,129 @@
+import os
+import re
+import json
+import logging
+from collections import namedtuple
+
+logger = logging.getLogger(__name__)
+
+# Результат проверки: какое правило сработало, в каком поле и на каком значении
+FilterMatch = namedtuple('FilterMatch', ['rule', 'field', 'value'])
+
+# Файл правил по умолчанию - рядом с модулем
+DEFAULT_RULES_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'filters.json')
+
+# Разделитель полей при объединении в один текст; в маркерах не встречается
+FIELD_SEPARATOR = '\x00'
+
+def _trie_pattern(words) -> str:
+    """
+    Регулярное выражение в виде префиксного дерева: общие префиксы маркеров
+    проверяются один раз, поэтому поиск не перебирает маркеры по очереди
+    """
+    trie = {}
+    for word in words:
+        node = trie
+        for char in word:
+            node = node.setdefault(char, {})
+        node[''] = None  # Конец маркера
+
+    def build(node):
+        branches = [re.escape(char) + build(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ''
+        if len(branches) == 1 and '' not in node:
+            return branches[0]
+        pattern = f"(?:{'|'.join(branches)})"
+        # Маркер может закончиться в этом узле: продолжение необязательно
+        return f"{pattern}?" if '' in node else pattern
+
+    return build(trie)
+
+class FilterRule:
+    """
+    Правило фильтрации
+    markers ищутся как подстроки в любом из полей fields, values сравниваются
+    со значением поля целиком; регистр не учитывается
+    """
+    def __init__(self, name, fields, markers=(), values=()):
+        self.name = name
+        self.fields = tuple(fields)
+        self.markers = tuple(marker.lower() for marker in markers if marker)
+        self.values = frozenset(value.lower() for value in values if value)
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data['name'], data['fields'], data.get('markers', ()), data.get('values', ()))
+
+class ContentFilter:
+    """
+    Фильтр видео по набору правил
+    Маркеры всех правил с одинаковым набором полей компилируются в одно
+    регулярное выражение, а поля объединяются в один текст, поэтому каждое
+    видео проверяется несколькими проходами вместо маркеры × поля
+    """
+    def __init__(self, rules=()):
+        self.rules = list(rules)
+        self._compile()
+
+    @classmethod
+    def from_file(cls, path=DEFAULT_RULES_FILE):
+        """Загрузка правил из JSON-файла вида {"rules": [{"name", "fields", "markers"|"values"}]}"""
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            rules = [FilterRule.from_dict(rule) for rule in data.get('rules', [])]
+            logger.debug(f"Загружено правил фильтрации: {len(rules)} из {path}")
+            return cls(rules)
+        except FileNotFoundError:
+            logger.warning(f"Файл правил фильтрации не найден: {os.path.abspath(path)}")
+            return cls()
+        except Exception as e:
+            logger.error(f"Ошибка при загрузке правил фильтрации: {str(e)}")
+            return cls()
+
+    def extend(self, rules):
+        """Новый фильтр с дополнительными правилами"""
+        return ContentFilter(self.rules + list(rules))
+
+    def _compile(self):
+        # Правила с маркерами группируются по набору полей: {поля: [(группа, правило)]}
+        marker_groups = {}
+        # Точные значения: {поле: {значение: правило}}
+        self._values = {}
+
+        for index, rule in enumerate(self.rules):
+            if rule.markers:
+                marker_groups.setdefault(rule.fields, []).append((f"r{index}", rule))
+            for field in rule.fields:
+                for value in rule.values:
+                    self._values.setdefault(field, {}).setdefault(value, rule)
+
+        self._patterns = []
+        for fields, group_rules in marker_groups.items():
+            pattern = '|'.join(f"(?P<{group}>{_trie_pattern(rule.markers)})" for group, rule in group_rules)
+            self._patterns.append((fields, re.compile(pattern), dict(group_rules)))
+
+    def match(self, video: dict):
+        """Первое сработавшее правило для видео или None"""
+        for field, values in self._values.items():
+            value = (video.get(field) or '').lower()
+            if value in values:
+                return FilterMatch(values[value].name, field, value)
+
+        for fields, pattern, group_rules in self._patterns:
+            texts = [(video.get(field) or '').lower() for field in fields]
+            found = pattern.search(FIELD_SEPARATOR.join(texts))
+            if found:
+                # Определяем поле по позиции совпадения
+                field_index = found.string.count(FIELD_SEPARATOR, 0, found.start())
+                return FilterMatch(group_rules[found.lastgroup].name, fields[field_index], found.group())
+
+        return None
+
+    def filter(self, videos):
+        """Видео, не попавшие ни под одно правило"""
+        return [video for video in videos if self.match(video) is None]
+
+    def __len__(self):
+        return len(self.rules)
@@ -1,19 +1,261 @@
+import os
 import sqlite3
+import atexit
 import json
+import queue
+import threading
+import time
+from contextlib import contextmanager
 from datetime import datetime
 import logging
+import zlib
+
+from youtube_id import video_key
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
 
 logger = logging.getLogger(__name__)
 
+def compress_metadata(video_info):
+    """Сжатие полной информации yt-dlp: zstd, если установлен, иначе zlib"""
+    data = json.dumps(video_info, ensure_ascii=False).encode('utf-8')
+    if zstandard is not None:
+        return zstandard.ZstdCompressor(level=10).compress(data), 'zstd'
+    return zlib.compress(data, 6), 'zlib'
+
+def decompress_metadata(blob, codec):
+    """Распаковка информации, сохраненной compress_metadata"""
+    if codec == 'zstd':
+        if zstandard is None:
+            raise RuntimeError("Для чтения метаданных требуется пакет zstandard")
+        data = zstandard.ZstdDecompressor().decompress(blob)
+    elif codec == 'zlib':
+        data = zlib.decompress(blob)
+    else:
+        raise ValueError(f"Неизвестный формат сжатия: {codec}")
+    return json.loads(data)
+
 class VideoDatabase:
-    def __init__(self, db_path='videos.db'):
+    # Настройки, применяемые к каждому соединению пула
+    PRAGMAS = {
+        'journal_mode': 'WAL',
+        'synchronous': 'NORMAL',
+        'mmap_size': 256 * 1024 * 1024,  # 256 МБ
+        'cache_size': -64000,            # ~64 МБ (отрицательное значение - в КиБ)
+        'temp_store': 'MEMORY',
+        'busy_timeout': 5000,
+    }
+    POOL_SIZE = 4  # Максимальное количество простаивающих соединений
+    
+    # Поля, которые хранятся в отдельных колонках и возвращаются без распаковки
+    PROJECTION_COLUMNS = (
+        'video_id', 'url', 'title', 'uploader', 'duration', 'view_count',
+        'upload_date', 'thumbnail', 'description', 'download_date', 'download_path',
+        'fetched_at'
+    )
+    MIGRATION_BATCH_SIZE = 500
+    
+    # Колонки, отсутствующие в таблицах старых версий
+    ADDED_COLUMNS = (
+        ('metadata_blob', 'BLOB'),
+        ('metadata_codec', 'TEXT'),
+        ('fetched_at', 'REAL'),
+        ('download_size', 'INTEGER'),
+    )
+    
+    # Время жизни кэша по полям (в секундах): изменчивые поля устаревают быстро
+    FIELD_TTL = {
+        'view_count': 30 * 60,
+        'thumbnail': 24 * 3600,
+        'description': 24 * 3600,
+        'title': 7 * 24 * 3600,
+        'uploader': 7 * 24 * 3600,
+        'upload_date': 30 * 24 * 3600,
+        'duration': 30 * 24 * 3600,
+    }
+    DEFAULT_TTL = 24 * 3600
+    FORMATS_TTL = 24 * 3600  # Время жизни списка форматов
+    FORMAT_COLUMNS = ('format_id', 'ext', 'resolution', 'height', 'vcodec', 'acodec', 'filesize')
+    
+    # Кэш результатов поиска: записи старше SEARCH_CACHE_TTL не используются,
+    # старше SEARCH_CACHE_REVALIDATE_AFTER - показываются и обновляются в фоне;
+    # хранится не более SEARCH_CACHE_SIZE последних использованных запросов
+    SEARCH_CACHE_TTL = 24 * 3600
+    SEARCH_CACHE_REVALIDATE_AFTER = 10 * 60
+    SEARCH_CACHE_SIZE = 200
+    
+    # Журнал загрузок: поля, которые можно обновлять через update_job
+    JOB_FIELDS = (
+        'state', 'format_id', 'selected_format', 'engine_overrides', 'output_dir', 'video_dir', 'title',
+        'downloaded_bytes', 'total_bytes', 'fragment_index', 'fragment_count', 'error'
+    )
+    # Состояния, в которых загрузку можно продолжить в той же папке
+    RESUMABLE_JOB_STATES = ('queued', 'downloading', 'failed')
+    
+    # Отложенная запись: групповой commit каждые WRITE_FLUSH_INTERVAL секунд
+    # или по накоплении WRITE_BATCH_SIZE строк
+    WRITE_FLUSH_INTERVAL = 0.05
+    WRITE_BATCH_SIZE = 500
+    
+    def __init__(self, db_path='videos.db', store_full_metadata=True, write_behind=False):
         self.db_path = db_path
+        # Хранить ли полную информацию yt-dlp (форматы, субтитры и т.д.) в сжатом виде
+        self.store_full_metadata = store_full_metadata
+        self._pool = queue.LifoQueue(maxsize=self.POOL_SIZE)
+        self._closed = False
+        self.fts_enabled = False
+        # Счетчики попаданий в кэш: каждое попадание - сэкономленное извлечение yt-dlp
+        self.lookup_hits = 0
+        self.lookup_misses = 0
+        self._stats_lock = threading.Lock()
         self.init_db()
+        
+        # Записи, поставленные в очередь, но еще не сохраненные (для чтения своих записей)
+        self.write_behind = write_behind
+        self._pending_rows = {}
+        self._pending_paths = {}
+        self._pending_formats = {}
+        self._pending_lock = threading.Lock()
+        self._write_queue = queue.Queue()
+        self._writer = None
+        if write_behind:
+            self._writer = threading.Thread(
+                target=self._writer_loop, name='video-db-writer', daemon=True
+            )
+            self._writer.start()
+            atexit.register(self.close)
+    
+    def _create_connection(self):
+        """Создание нового соединения с настройками производительности"""
+        # check_same_thread=False: соединение может вернуться в пул из одного
+        # потока и быть выдано другому, но одновременно им владеет только один
+        conn = sqlite3.connect(self.db_path, timeout=30, check_same_thread=False)
+        for name, value in self.PRAGMAS.items():
+            conn.execute(f'PRAGMA {name} = {value}')
+        return conn
+    
+    @contextmanager
+    def _connection(self):
+        """Выдача соединения из пула, commit при успехе и rollback при ошибке"""
+        try:
+            conn = self._pool.get_nowait()
+        except queue.Empty:
+            conn = self._create_connection()
+        
+        try:
+            with conn:
+                yield conn
+        finally:
+            if self._closed:
+                conn.close()
+            else:
+                try:
+                    self._pool.put_nowait(conn)
+                except queue.Full:
+                    conn.close()
+    
+    def _writer_loop(self):
+        """Поток записи: собирает операции из очереди и сохраняет их группами"""
+        stopping = False
+        while not stopping:
+            batch = [self._write_queue.get()]
+            rows = len(batch[0][1])
+            deadline = time.monotonic() + self.WRITE_FLUSH_INTERVAL
+            
+            # Копим операции до таймаута, лимита строк или запроса на сброс
+            while batch[-1][0] not in ('flush', 'stop') and rows < self.WRITE_BATCH_SIZE:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    item = self._write_queue.get(timeout=timeout)
+                except queue.Empty:
+                    break
+                batch.append(item)
+                rows += len(item[1])
+            
+            stopping = batch[-1][0] == 'stop'
+            self._write_batch(batch)
+    
+    def _write_batch(self, batch):
+        """Сохранение группы отложенных операций одной транзакцией"""
+        try:
+            with self._connection() as conn:
+                for kind, payload in batch:
+                    if kind == 'insert':
+                        conn.executemany(self.INSERT_VIDEO_SQL, payload)
+                    elif kind == 'formats':
+                        self._write_formats(conn, payload)
+                    elif kind == 'update_path':
+                        conn.executemany('''
+                            UPDATE videos SET download_path = ?, download_date = ?, download_size = ?
+                            WHERE video_id = ?
+                        ''', payload)
+            logger.debug(f"Групповая запись в БД: операций {len(batch)}")
+        except Exception as e:
+            logger.error(f"Ошибка при отложенной записи в БД: {str(e)}")
+        finally:
+            with self._pending_lock:
+                for kind, payload in batch:
+                    if kind == 'insert':
+                        for row in payload:
+                            # Более новая запись того же видео остается в ожидании
+                            if self._pending_rows.get(row[0]) is row:
+                                del self._pending_rows[row[0]]
+                    elif kind == 'formats':
+                        for video_id, rows in payload:
+                            if self._pending_formats.get(video_id) is rows:
+                                del self._pending_formats[video_id]
+                    elif kind == 'update_path':
+                        for path, date, size, video_id in payload:
+                            if self._pending_paths.get(video_id) == (path, date, size):
+                                del self._pending_paths[video_id]
+            for kind, payload in batch:
+                if kind == 'flush':
+                    payload[0].set()
+    
+    def _enqueue_rows(self, rows, format_sets):
+        """Постановка строк videos и их форматов в очередь отложенной записи"""
+        with self._pending_lock:
+            for row in rows:
+                self._pending_rows[row[0]] = row
+                if row[10] is not None:
+                    # Явно указанный путь заменяет еще не записанный
+                    self._pending_paths.pop(row[0], None)
+            for video_id, format_rows in format_sets:
+                self._pending_formats[video_id] = format_rows
+        self._write_queue.put(('insert', rows))
+        if format_sets:
+            self._write_queue.put(('formats', format_sets))
+    
+    def flush(self):
+        """Ожидание записи всех отложенных операций"""
+        if not self._writer or not self._writer.is_alive():
+            return
+        done = threading.Event()
+        self._write_queue.put(('flush', [done]))
+        done.wait()
+    
+    def close(self):
+        """Сохранение отложенных записей и закрытие всех соединений пула"""
+        if self._writer and self._writer.is_alive():
+            self._write_queue.put(('stop', []))
+            self._writer.join()
+        self._closed = True
+        while True:
+            try:
+                self._pool.get_nowait().close()
+            except queue.Empty:
+                break
+        logger.debug("Соединения с БД закрыты")
     
     def init_db(self):
         """Инициализация базы данных"""
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with self._connection() as conn:
                 cursor = conn.cursor()
                 
                 # Таблица для хранения информации о видео
@@ -30,81 +272,470 @@ class VideoDatabase:
                         description TEXT,
                         download_date TEXT,
                         download_path TEXT,
-                        metadata TEXT
+                        metadata TEXT,
+                        metadata_blob BLOB,
+                        metadata_codec TEXT,
+                        fetched_at REAL,
+                        download_size INTEGER
+                    )
+                ''')
+                
+                self._add_missing_columns(cursor)
+                migrated = self._migrate_metadata(cursor)
+                
+                # Нормализованный список форматов (без подписанных URL, которые быстро истекают)
+                cursor.execute('''
+                    CREATE TABLE IF NOT EXISTS formats (
+                        video_id TEXT NOT NULL,
+                        format_id TEXT NOT NULL,
+                        ext TEXT,
+                        resolution TEXT,
+                        height INTEGER,
+                        vcodec TEXT,
+                        acodec TEXT,
+                        filesize INTEGER,
+                        expires_at REAL NOT NULL,
+                        PRIMARY KEY (video_id, format_id)
                     )
                 ''')
                 
+                # Индекс для запросов "лучший формат со звуком не выше N p"
+                cursor.execute('''
+                    CREATE INDEX IF NOT EXISTS idx_formats_audio_height
+                    ON formats (video_id, height DESC, filesize DESC)
+                    WHERE acodec <> 'none'
+                ''')
+                
+                # Кэш результатов поиска по нормализованному набору параметров
+                cursor.execute('''
+                    CREATE TABLE IF NOT EXISTS search_cache (
+                        cache_key TEXT PRIMARY KEY,
+                        results BLOB NOT NULL,
+                        results_codec TEXT NOT NULL,
+                        created_at REAL NOT NULL,
+                        accessed_at REAL NOT NULL
+                    )
+                ''')
+                cursor.execute('''
+                    CREATE INDEX IF NOT EXISTS idx_search_cache_accessed
+                    ON search_cache (accessed_at)
+                ''')
+                
+                # Журнал загрузок для продолжения после закрытия или сбоя приложения
+                cursor.execute('''
+                    CREATE TABLE IF NOT EXISTS download_jobs (
+                        job_id INTEGER PRIMARY KEY AUTOINCREMENT,
+                        video_id TEXT NOT NULL,
+                        url TEXT NOT NULL,
+                        state TEXT NOT NULL,
+                        format_id TEXT,
+                        selected_format TEXT,
+                        engine_overrides TEXT,
+                        output_dir TEXT,
+                        video_dir TEXT,
+                        title TEXT,
+                        downloaded_bytes INTEGER,
+                        total_bytes INTEGER,
+                        fragment_index INTEGER,
+                        fragment_count INTEGER,
+                        error TEXT,
+                        created_at REAL NOT NULL,
+                        updated_at REAL NOT NULL
+                    )
+                ''')
+                cursor.execute('''
+                    CREATE INDEX IF NOT EXISTS idx_download_jobs_video
+                    ON download_jobs (video_id, state)
+                ''')
+                
+                # Покрывающий индекс для постраничного списка скачанных видео
+                cursor.execute('DROP INDEX IF EXISTS idx_videos_download_date')
+                cursor.execute('''
+                    CREATE INDEX IF NOT EXISTS idx_videos_history
+                    ON videos (download_date DESC, video_id DESC, url, title, download_path)
+                    WHERE download_path IS NOT NULL
+                ''')
+                
+                self.fts_enabled = self._init_fts(cursor)
+                
                 conn.commit()
+                
+                # Освобождаем место, занятое несжатыми JSON
+                if migrated:
+                    conn.execute('VACUUM')
+                
                 logger.debug("База данных инициализирована")
         except Exception as e:
             logger.error(f"Ошибка при инициализации БД: {str(e)}")
             raise
     
+    def _add_missing_columns(self, cursor):
+        """Добавление колонок, появившихся после создания таблицы"""
+        cursor.execute('PRAGMA table_info(videos)')
+        columns = {row[1] for row in cursor.fetchall()}
+        for column, column_type in self.ADDED_COLUMNS:
+            if column not in columns:
+                cursor.execute(f'ALTER TABLE videos ADD COLUMN {column} {column_type}')
+    
+    def _migrate_metadata(self, cursor):
+        """Перевод старых записей с JSON в колонке metadata на сжатое хранение"""
+        # Переносим порциями, чтобы не держать в памяти всю таблицу
+        migrated = 0
+        while True:
+            cursor.execute(
+                'SELECT video_id, metadata FROM videos WHERE metadata IS NOT NULL LIMIT ?',
+                (self.MIGRATION_BATCH_SIZE,)
+            )
+            rows = cursor.fetchall()
+            if not rows:
+                break
+            
+            updates = []
+            for video_id, metadata in rows:
+                blob, codec = None, None
+                if self.store_full_metadata:
+                    try:
+                        blob, codec = compress_metadata(json.loads(metadata))
+                    except ValueError as e:
+                        logger.warning(f"Не удалось перенести метаданные видео {video_id}: {str(e)}")
+                updates.append((blob, codec, video_id))
+            
+            cursor.executemany('''
+                UPDATE videos SET metadata_blob = ?, metadata_codec = ?, metadata = NULL
+                WHERE video_id = ?
+            ''', updates)
+            migrated += len(updates)
+        
+        if migrated:
+            logger.info(f"Метаданные переведены в сжатый формат: {migrated}")
+        return migrated
+    
+    def _init_fts(self, cursor):
+        """Создание полнотекстового индекса FTS5 и триггеров синхронизации"""
+        try:
+            cursor.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'videos_fts'"
+            )
+            exists = cursor.fetchone() is not None
+            
+            cursor.execute('''
+                CREATE VIRTUAL TABLE IF NOT EXISTS videos_fts USING fts5(
+                    title, uploader, description,
+                    content='videos', content_rowid='rowid'
+                )
+            ''')
+            cursor.executescript('''
+                CREATE TRIGGER IF NOT EXISTS videos_fts_insert AFTER INSERT ON videos BEGIN
+                    INSERT INTO videos_fts (rowid, title, uploader, description)
+                    VALUES (new.rowid, new.title, new.uploader, new.description);
+                END;
+                
+                CREATE TRIGGER IF NOT EXISTS videos_fts_delete AFTER DELETE ON videos BEGIN
+                    INSERT INTO videos_fts (videos_fts, rowid, title, uploader, description)
+                    VALUES ('delete', old.rowid, old.title, old.uploader, old.description);
+                END;
+                
+                CREATE TRIGGER IF NOT EXISTS videos_fts_update
+                AFTER UPDATE OF title, uploader, description ON videos BEGIN
+                    INSERT INTO videos_fts (videos_fts, rowid, title, uploader, description)
+                    VALUES ('delete', old.rowid, old.title, old.uploader, old.description);
+                    INSERT INTO videos_fts (rowid, title, uploader, description)
+                    VALUES (new.rowid, new.title, new.uploader, new.description);
+                END;
+            ''')
+            
+            # Индексируем записи, добавленные до появления FTS
+            if not exists:
+                cursor.execute("INSERT INTO videos_fts (videos_fts) VALUES ('rebuild')")
+                logger.info("Полнотекстовый индекс библиотеки построен")
+            
+            return True
+        except sqlite3.OperationalError as e:
+            logger.warning(f"FTS5 недоступен, поиск по библиотеке будет медленнее: {str(e)}")
+            return False
+    
+    # Обновление метаданных не стирает сведения о скачанном файле
+    INSERT_VIDEO_SQL = '''
+        INSERT INTO videos (
+            video_id, url, title, uploader, duration, view_count,
+            upload_date, thumbnail, description, download_date,
+            download_path, fetched_at, metadata_blob, metadata_codec
+        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ON CONFLICT (video_id) DO UPDATE SET
+            url = excluded.url,
+            title = excluded.title,
+            uploader = excluded.uploader,
+            duration = excluded.duration,
+            view_count = excluded.view_count,
+            upload_date = excluded.upload_date,
+            thumbnail = excluded.thumbnail,
+            description = excluded.description,
+            download_date = CASE WHEN excluded.download_path IS NULL AND videos.download_path IS NOT NULL
+                                 THEN videos.download_date ELSE excluded.download_date END,
+            download_path = COALESCE(excluded.download_path, videos.download_path),
+            download_size = CASE WHEN excluded.download_path IS NULL
+                                 THEN videos.download_size ELSE NULL END,
+            fetched_at = excluded.fetched_at,
+            metadata_blob = excluded.metadata_blob,
+            metadata_codec = excluded.metadata_codec
+    '''
+    
+    def _video_row(self, video_info, download_path=None):
+        """Подготовка строки таблицы videos из информации yt-dlp"""
+        video_id = video_info.get('id') or video_key(video_info['url'])
+        if self.store_full_metadata:
+            blob, codec = compress_metadata(video_info)
+        else:
+            blob, codec = None, None
+        return (
+            video_id,
+            video_info.get('webpage_url') or video_info.get('url', ''),
+            video_info.get('title', ''),
+            video_info.get('uploader', ''),
+            video_info.get('duration', 0),
+            video_info.get('view_count', 0),
+            video_info.get('upload_date', ''),
+            video_info.get('thumbnail', ''),
+            video_info.get('description', ''),
+            datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+            download_path,
+            time.time(),
+            blob,
+            codec
+        )
+    
+    @staticmethod
+    def normalize_format(fmt):
+        """Поля формата yt-dlp, нужные для выбора качества (без URL потока)"""
+        return {
+            'format_id': fmt.get('format_id', ''),
+            'ext': fmt.get('ext', ''),
+            'resolution': fmt.get('resolution') or 'unknown',
+            'height': fmt.get('height'),
+            'vcodec': fmt.get('vcodec') or 'none',
+            'acodec': fmt.get('acodec') or 'none',
+            'filesize': fmt.get('filesize') or fmt.get('filesize_approx') or 0,
+        }
+    
+    def _format_sets(self, videos):
+        """Подготовка строк таблицы formats для видео, в информации которых есть форматы"""
+        expires_at = time.time() + self.FORMATS_TTL
+        format_sets = []
+        for video_info in videos:
+            if not video_info.get('formats'):
+                continue
+            video_id = video_info.get('id') or video_key(video_info['url'])
+            rows = [
+                (video_id, *self.normalize_format(fmt).values(), expires_at)
+                for fmt in video_info['formats']
+            ]
+            format_sets.append((video_id, rows))
+        return format_sets
+    
+    def _write_formats(self, conn, format_sets):
+        """Замена списка форматов видео"""
+        for video_id, rows in format_sets:
+            conn.execute('DELETE FROM formats WHERE video_id = ?', (video_id,))
+            conn.executemany(f'''
+                INSERT OR REPLACE INTO formats (video_id, {', '.join(self.FORMAT_COLUMNS)}, expires_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ''', rows)
+    
+    def get_formats(self, url):
+        """
+        Получение сохраненного списка форматов видео
+        Возвращает None, если список отсутствует или устарел
+        """
+        try:
+            video_id = video_key(url)
+            
+            with self._pending_lock:
+                pending = self._pending_formats.get(video_id)
+            if pending is not None:
+                return [dict(zip(self.FORMAT_COLUMNS, row[1:-1])) for row in pending]
+            
+            with self._connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute(f'''
+                    SELECT {', '.join(self.FORMAT_COLUMNS)} FROM formats
+                    WHERE video_id = ? AND expires_at > ?
+                ''', (video_id, time.time()))
+                rows = cursor.fetchall()
+            
+            if not rows:
+                return None
+            return [dict(zip(self.FORMAT_COLUMNS, row)) for row in rows]
+            
+        except Exception as e:
+            logger.error(f"Ошибка при получении форматов из БД: {str(e)}")
+            return None
+    
+    def get_best_format(self, url, max_height, with_audio=True):
+        """Лучший сохраненный формат не выше max_height (по умолчанию - со звуком)"""
+        try:
+            self.flush()
+            audio_filter = "AND acodec <> 'none'" if with_audio else ''
+            with self._connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute(f'''
+                    SELECT {', '.join(self.FORMAT_COLUMNS)} FROM formats
+                    WHERE video_id = ? AND height <= ? AND expires_at > ? {audio_filter}
+                    ORDER BY height DESC, filesize DESC
+                    LIMIT 1
+                ''', (video_key(url), max_height, time.time()))
+                row = cursor.fetchone()
+            return dict(zip(self.FORMAT_COLUMNS, row)) if row else None
+            
+        except Exception as e:
+            logger.error(f"Ошибка при выборе формата из БД: {str(e)}")
+            return None
+    
     def add_video(self, video_info, download_path=None):
         """Добавление видео в базу"""
         try:
-            video_id = video_info.get('id') or video_info['url'].split('=')[-1]
+            row = self._video_row(video_info, download_path)
+            format_sets = self._format_sets([video_info])
             
-            with sqlite3.connect(self.db_path) as conn:
-                cursor = conn.cursor()
+            if self.write_behind:
+                self._enqueue_rows([row], format_sets)
+                return
+            
+            with self._connection() as conn:
+                conn.execute(self.INSERT_VIDEO_SQL, row)
+                self._write_formats(conn, format_sets)
                 
-                cursor.execute('''
-                    INSERT OR REPLACE INTO videos (
-                        video_id, url, title, uploader, duration, view_count,
-                        upload_date, thumbnail, description, download_date,
-                        download_path, metadata
-                    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                ''', (
-                    video_id,
-                    video_info.get('url', ''),
-                    video_info.get('title', ''),
-                    video_info.get('uploader', ''),
-                    video_info.get('duration', 0),
-                    video_info.get('view_count', 0),
-                    video_info.get('upload_date', ''),
-                    video_info.get('thumbnail', ''),
-                    video_info.get('description', ''),
-                    datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
-                    download_path,
-                    json.dumps(video_info)
-                ))
-                
-                logger.debug(f"Видео добавлено в БД: {video_id}")
+                logger.debug(f"Видео добавлено в БД: {row[0]}")
         except Exception as e:
             logger.error(f"Ошибка при добавлении видео в БД: {str(e)}")
             raise
     
-    def get_video(self, url):
-        """Получение информации о видео из базы"""
+    def add_videos(self, videos):
+        """Добавление набора видео в базу одной транзакцией"""
         try:
-            video_id = url.split('=')[-1]
+            rows = [self._video_row(video_info) for video_info in videos]
+            if not rows:
+                return 0
             
-            with sqlite3.connect(self.db_path) as conn:
-                cursor = conn.cursor()
-                
-                cursor.execute('SELECT metadata FROM videos WHERE video_id = ?', (video_id,))
-                result = cursor.fetchone()
-                
+            format_sets = self._format_sets(videos)
+            
+            if self.write_behind:
+                self._enqueue_rows(rows, format_sets)
+                return len(rows)
+            
+            with self._connection() as conn:
+                conn.executemany(self.INSERT_VIDEO_SQL, rows)
+                self._write_formats(conn, format_sets)
+            
+            logger.debug(f"Добавлено видео в БД: {len(rows)}")
+            return len(rows)
+        except Exception as e:
+            logger.error(f"Ошибка при пакетном добавлении видео в БД: {str(e)}")
+            raise
+    
+    def get_video(self, url, full=False):
+        """
+        Получение информации о видео из базы
+        По умолчанию возвращает только поля из отдельных колонок; полная информация
+        yt-dlp распаковывается только при full=True
+        """
+        try:
+            video_id = video_key(url)
+            
+            # Еще не записанные данные имеют приоритет над содержимым БД
+            with self._pending_lock:
+                result = self._pending_rows.get(video_id)
+                pending_path = self._pending_paths.get(video_id)
+            
+            if result is not None and result[10] is None and not pending_path:
+                # Upsert сохранит прежний путь к скачанному файлу - показываем его и до записи
+                with self._connection() as conn:
+                    cursor = conn.cursor()
+                    cursor.execute(
+                        'SELECT download_path, download_date FROM videos WHERE video_id = ?',
+                        (video_id,)
+                    )
+                    stored = cursor.fetchone()
+                if stored and stored[0]:
+                    pending_path = stored
+            
+            if result is None:
+                with self._connection() as conn:
+                    cursor = conn.cursor()
+                    
+                    columns = ', '.join(self.PROJECTION_COLUMNS)
+                    cursor.execute(
+                        f'SELECT {columns}, metadata_blob, metadata_codec FROM videos WHERE video_id = ?',
+                        (video_id,)
+                    )
+                    result = cursor.fetchone()
+            
+            with self._stats_lock:
                 if result:
-                    return json.loads(result[0])
+                    self.lookup_hits += 1
+                else:
+                    self.lookup_misses += 1
+            
+            if not result:
                 return None
-                
+            
+            *projection, blob, codec = result
+            if full:
+                if blob is None:
+                    return None
+                return decompress_metadata(blob, codec)
+            
+            info = dict(zip(self.PROJECTION_COLUMNS, projection))
+            info['id'] = info['video_id']
+            if pending_path:
+                info['download_path'], info['download_date'] = pending_path[:2]
+            return info
+            
         except Exception as e:
             logger.error(f"Ошибка при получении видео из БД: {str(e)}")
             return None
     
-    def get_downloaded_videos(self):
-        """Получение списка скачанных видео"""
+    def cache_stats(self):
+        """Статистика попаданий get_video в кэш"""
+        with self._stats_lock:
+            hits, misses = self.lookup_hits, self.lookup_misses
+        total = hits + misses
+        return {
+            'hits': hits,
+            'misses': misses,
+            'hit_rate': hits / total if total else 0.0,
+        }
+    
+    def is_stale(self, info, fields=None):
+        """
+        Проверка устаревания кэшированной информации о видео
+        Учитывается наименьший TTL среди запрошенных полей (по умолчанию - всех)
+        """
+        fetched_at = info.get('fetched_at')
+        if not fetched_at:
+            return True
+        
+        ttl = min(self.FIELD_TTL.get(field, self.DEFAULT_TTL) for field in (fields or self.FIELD_TTL))
+        return time.time() - fetched_at > ttl
+    
+    def get_downloaded_videos(self, after=None, limit=None):
+        """
+        Получение списка скачанных видео (от новых к старым)
+        Постраничная выборка по ключу: after - пара (download_date, video_id)
+        последней строки предыдущей страницы, limit - размер страницы
+        """
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            self.flush()
+            with self._connection() as conn:
                 cursor = conn.cursor()
                 
-                cursor.execute('''
+                after_filter = 'AND (download_date, video_id) < (?, ?)' if after else ''
+                cursor.execute(f'''
                     SELECT video_id, url, title, download_path, download_date 
                     FROM videos 
-                    WHERE download_path IS NOT NULL 
-                    ORDER BY download_date DESC
-                ''')
+                    WHERE download_path IS NOT NULL {after_filter}
+                    ORDER BY download_date DESC, video_id DESC
+                    LIMIT ?
+                ''', (*(after or ()), limit if limit is not None else -1))
                 
                 return cursor.fetchall()
                 
@@ -112,23 +743,304 @@ class VideoDatabase:
             logger.error(f"Ошибка при получении списка скачанных видео: {str(e)}")
             return []
     
+    @staticmethod
+    def _fts_query(query):
+        """Преобразование пользовательского ввода в запрос FTS5 (поиск по префиксам слов)"""
+        terms = [term.replace('"', '""') for term in query.split()]
+        return ' '.join(f'"{term}"*' for term in terms)
+    
+    def search_library(self, query, limit=50, offset=0, downloaded_only=True, video_filter=None):
+        """
+        Поиск по названию, автору и описанию видео в локальной библиотеке
+        video_filter (ContentFilter) исключает видео, попавшие под его правила
+        """
+        try:
+            query = (query or '').strip()
+            if not query and video_filter is None:
+                return self.get_downloaded_videos(limit=offset + limit)[offset:]
+            
+            self.flush()
+            with self._connection() as conn:
+                cursor = conn.cursor()
+                
+                conditions = ['v.download_path IS NOT NULL'] if downloaded_only else []
+                if video_filter is not None:
+                    # Правила проверяются в самом запросе, поэтому LIMIT/OFFSET
+                    # отсчитываются только по прошедшим фильтр видео
+                    conn.create_function(
+                        'filtered_out', 3,
+                        lambda title, uploader, description: video_filter.match({
+                            'title': title, 'uploader': uploader, 'description': description
+                        }) is not None
+                    )
+                    conditions.append('NOT filtered_out(v.title, v.uploader, v.description)')
+                extra_filter = ''.join(f' AND {condition}' for condition in conditions)
+                
+                if self.fts_enabled and query:
+                    cursor.execute(f'''
+                        SELECT v.video_id, v.url, v.title, v.download_path, v.download_date
+                        FROM videos_fts
+                        JOIN videos v ON v.rowid = videos_fts.rowid
+                        WHERE videos_fts MATCH ? {extra_filter}
+                        ORDER BY videos_fts.rank
+                        LIMIT ? OFFSET ?
+                    ''', (self._fts_query(query), limit, offset))
+                else:
+                    pattern = f"%{query}%"
+                    cursor.execute(f'''
+                        SELECT v.video_id, v.url, v.title, v.download_path, v.download_date
+                        FROM videos v
+                        WHERE (v.title LIKE ? OR v.uploader LIKE ? OR v.description LIKE ?)
+                        {extra_filter}
+                        ORDER BY v.download_date DESC
+                        LIMIT ? OFFSET ?
+                    ''', (pattern, pattern, pattern, limit, offset))
+                
+                return cursor.fetchall()
+                
+        except Exception as e:
+            logger.error(f"Ошибка при поиске по библиотеке: {str(e)}")
+            return []
+    
+    @staticmethod
+    def search_cache_key(query, min_views=0, excluded_words=None, max_results=50):
+        """Нормализованный ключ кэша поиска: регистр, пробелы и порядок слов не важны"""
+        words = sorted({word.strip().lower() for word in (excluded_words or []) if word.strip()})
+        return json.dumps(
+            [' '.join(query.lower().split()), int(min_views or 0), words, int(max_results)],
+            ensure_ascii=False
+        )
+    
+    def get_search_results(self, cache_key):
+        """
+        Получение результатов поиска из кэша
+        Возвращает пару (результаты, нужно ли обновить) или None, если записи нет
+        или она старше SEARCH_CACHE_TTL
+        """
+        try:
+            now = time.time()
+            with self._connection() as conn:
+                row = conn.execute(
+                    'SELECT results, results_codec, created_at FROM search_cache WHERE cache_key = ?',
+                    (cache_key,)
+                ).fetchone()
+                if not row:
+                    return None
+                
+                results, codec, created_at = row
+                if now - created_at > self.SEARCH_CACHE_TTL:
+                    conn.execute('DELETE FROM search_cache WHERE cache_key = ?', (cache_key,))
+                    return None
+                
+                # Отметка использования для вытеснения давно не используемых запросов
+                conn.execute(
+                    'UPDATE search_cache SET accessed_at = ? WHERE cache_key = ?', (now, cache_key)
+                )
+            
+            return decompress_metadata(results, codec), now - created_at > self.SEARCH_CACHE_REVALIDATE_AFTER
+            
+        except Exception as e:
+            logger.error(f"Ошибка при чтении кэша поиска: {str(e)}")
+            return None
+    
+    def put_search_results(self, cache_key, results):
+        """Сохранение результатов поиска с вытеснением давно не используемых записей"""
+        try:
+            now = time.time()
+            blob, codec = compress_metadata(results)
+            with self._connection() as conn:
+                conn.execute('''
+                    INSERT OR REPLACE INTO search_cache (cache_key, results, results_codec, created_at, accessed_at)
+                    VALUES (?, ?, ?, ?, ?)
+                ''', (cache_key, blob, codec, now, now))
+                conn.execute('''
+                    DELETE FROM search_cache WHERE cache_key NOT IN (
+                        SELECT cache_key FROM search_cache ORDER BY accessed_at DESC LIMIT ?
+                    )
+                ''', (self.SEARCH_CACHE_SIZE,))
+                
+        except Exception as e:
+            logger.error(f"Ошибка при сохранении кэша поиска: {str(e)}")
+    
+    def _job_dict(self, cursor, row):
+        job = dict(zip([column[0] for column in cursor.description], row))
+        if job.get('engine_overrides'):
+            job['engine_overrides'] = json.loads(job['engine_overrides'])
+        return job
+    
+    def start_job(self, url, format_id=None, engine_overrides=None, output_dir=None):
+        """
+        Запись загрузки в журнал
+        Если для видео уже есть незавершенная загрузка, возвращается она (с ее
+        папкой), а переданные параметры обновляются; иначе создается новая
+        """
+        try:
+            video_id = video_key(url)
+            now = time.time()
+            placeholders = ', '.join('?' * len(self.RESUMABLE_JOB_STATES))
+            with self._connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute(f'''
+                    SELECT job_id FROM download_jobs
+                    WHERE video_id = ? AND state IN ({placeholders})
+                    ORDER BY job_id DESC LIMIT 1
+                ''', (video_id, *self.RESUMABLE_JOB_STATES))
+                row = cursor.fetchone()
+                
+                overrides = json.dumps(engine_overrides) if engine_overrides else None
+                if row:
+                    job_id = row[0]
+                    cursor.execute('''
+                        UPDATE download_jobs
+                        SET format_id = COALESCE(?, format_id),
+                            engine_overrides = COALESCE(?, engine_overrides),
+                            output_dir = COALESCE(?, output_dir),
+                            updated_at = ?
+                        WHERE job_id = ?
+                    ''', (format_id, overrides, output_dir, now, job_id))
+                else:
+                    cursor.execute('''
+                        INSERT INTO download_jobs (
+                            video_id, url, state, format_id, engine_overrides,
+                            output_dir, created_at, updated_at
+                        ) VALUES (?, ?, 'queued', ?, ?, ?, ?, ?)
+                    ''', (video_id, url, format_id, overrides, output_dir, now, now))
+                    job_id = cursor.lastrowid
+                
+                cursor.execute('SELECT * FROM download_jobs WHERE job_id = ?', (job_id,))
+                return self._job_dict(cursor, cursor.fetchone())
+                
+        except Exception as e:
+            logger.error(f"Ошибка при записи загрузки в журнал: {str(e)}")
+            return None
+    
+    def update_job(self, job_id, **fields):
+        """Обновление записи журнала загрузок (поля из JOB_FIELDS)"""
+        try:
+            unknown = set(fields) - set(self.JOB_FIELDS)
+            if unknown:
+                raise ValueError(f"Неизвестные поля журнала: {', '.join(sorted(unknown))}")
+            if 'engine_overrides' in fields and fields['engine_overrides'] is not None:
+                fields['engine_overrides'] = json.dumps(fields['engine_overrides'])
+            
+            assignments = ', '.join(f"{field} = ?" for field in fields)
+            with self._connection() as conn:
+                conn.execute(
+                    f'UPDATE download_jobs SET {assignments}, updated_at = ? WHERE job_id = ?',
+                    (*fields.values(), time.time(), job_id)
+                )
+                
+        except Exception as e:
+            logger.error(f"Ошибка при обновлении журнала загрузок: {str(e)}")
+    
+    def cancel_jobs(self, url):
+        """Отмена незавершенных загрузок видео (например, при удалении из очереди)"""
+        try:
+            placeholders = ', '.join('?' * len(self.RESUMABLE_JOB_STATES))
+            with self._connection() as conn:
+                conn.execute(f'''
+                    UPDATE download_jobs SET state = 'cancelled', updated_at = ?
+                    WHERE video_id = ? AND state IN ({placeholders})
+                ''', (time.time(), video_key(url), *self.RESUMABLE_JOB_STATES))
+                
+        except Exception as e:
+            logger.error(f"Ошибка при отмене загрузки в журнале: {str(e)}")
+
+    def requeue_jobs(self, url):
+        """Возврат незавершенных загрузок видео в очередь (прерваны закрытием приложения)"""
+        try:
+            placeholders = ', '.join('?' * len(self.RESUMABLE_JOB_STATES))
+            with self._connection() as conn:
+                conn.execute(f'''
+                    UPDATE download_jobs SET state = 'queued', updated_at = ?
+                    WHERE video_id = ? AND state IN ({placeholders})
+                ''', (time.time(), video_key(url), *self.RESUMABLE_JOB_STATES))
+
+        except Exception as e:
+            logger.error(f"Ошибка при возврате загрузки в очередь журнала: {str(e)}")
+
+    def get_interrupted_jobs(self):
+        """Загрузки, прерванные закрытием или сбоем приложения (в очереди или в процессе)"""
+        try:
+            with self._connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute('''
+                    SELECT * FROM download_jobs
+                    WHERE state IN ('queued', 'downloading')
+                    ORDER BY job_id
+                ''')
+                return [self._job_dict(cursor, row) for row in cursor.fetchall()]
+                
+        except Exception as e:
+            logger.error(f"Ошибка при чтении журнала загрузок: {str(e)}")
+            return []
+    
     def update_download_path(self, url, path):
-        """Обновление пути к скачанному файлу"""
+        """Обновление пути к скачанному файлу (вместе с его размером для проверки целостности)"""
         try:
-            video_id = url.split('=')[-1]
+            video_id = video_key(url)
+            download_date = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+            download_size = os.path.getsize(path) if path and os.path.isfile(path) else None
+            
+            if self.write_behind:
+                with self._pending_lock:
+                    self._pending_paths[video_id] = (path, download_date, download_size)
+                self._write_queue.put(('update_path', [(path, download_date, download_size, video_id)]))
+                return
             
-            with sqlite3.connect(self.db_path) as conn:
+            with self._connection() as conn:
                 cursor = conn.cursor()
                 
                 cursor.execute('''
                     UPDATE videos 
-                    SET download_path = ?, download_date = ? 
+                    SET download_path = ?, download_date = ?, download_size = ?
                     WHERE video_id = ?
-                ''', (path, datetime.now().strftime('%Y-%m-%d %H:%M:%S'), video_id))
+                ''', (path, download_date, download_size, video_id))
                 
                 conn.commit()
                 logger.debug(f"Обновлен путь скачивания для видео: {video_id}")
                 
         except Exception as e:
             logger.error(f"Ошибка при обновлении пути скачивания: {str(e)}")
-            raise 
\ No newline at end of file
+            raise
+    
+    def get_downloaded_file(self, url):
+        """
+        Путь к уже скачанному файлу видео или None
+        Файл должен существовать и иметь тот же размер, что и после скачивания;
+        для записей без сохраненного размера проверяется только наличие файла
+        """
+        try:
+            video_id = video_key(url)
+            with self._pending_lock:
+                pending_path = self._pending_paths.get(video_id)
+            
+            if pending_path:
+                path, _, expected_size = pending_path
+            else:
+                with self._connection() as conn:
+                    cursor = conn.cursor()
+                    cursor.execute(
+                        'SELECT download_path, download_size FROM videos WHERE video_id = ?',
+                        (video_id,)
+                    )
+                    result = cursor.fetchone()
+                if not result:
+                    return None
+                path, expected_size = result
+            
+            if not path:
+                return None
+            if not os.path.isfile(path):
+                logger.info(f"Скачанный ранее файл не найден: {path}")
+                return None
+            
+            size = os.path.getsize(path)
+            if expected_size is not None and size != expected_size:
+                logger.warning(f"Размер файла изменился ({size} вместо {expected_size} байт): {path}")
+                return None
+            return path
+            
+        except Exception as e:
+            logger.error(f"Ошибка при проверке скачанного файла: {str(e)}")
+            return None
@@ -0,0 +1,80 @@
+import shutil
+import logging
+
+logger = logging.getLogger(__name__)
+
+class DownloadEngine:
+    """
+    Настройки движка загрузки yt-dlp
+    Параллельная загрузка фрагментов DASH/HLS, размер HTTP-чанков, внешний
+    загрузчик (aria2c) и параметры перекодирования, если без него не обойтись.
+    Значения по умолчанию перекрываются словарем DOWNLOAD_ENGINE из config.py,
+    а он - настройками конкретной загрузки
+    """
+    DEFAULTS = {
+        'concurrent_fragments': 4,            # Одновременно загружаемых фрагментов
+        'http_chunk_size': 10 * 1024 * 1024,  # Размер HTTP-запроса, байт (0 - без деления)
+        'external_downloader': None,          # Например 'aria2c'; None - встроенный загрузчик
+        'aria2c_connections': 16,             # --max-connection-per-server
+        'aria2c_split': 16,                   # --split
+        'aria2c_min_split_size': '1M',        # --min-split-size
+        'reencode_preset': 'veryfast',        # Пресет libx264 при перекодировании
+        'reencode_threads': 0,                # Потоков ffmpeg (0 - автоматически)
+        'bandwidth_weight': 1.0,              # Доля общего лимита полосы относительно других загрузок
+    }
+    # Наборы настроек для выбора в очереди загрузок
+    PRESETS = {
+        'Стандартный': {},
+        'Много фрагментов': {'concurrent_fragments': 16},
+        'aria2c': {'external_downloader': 'aria2c'},
+        'Фоновая': {'bandwidth_weight': 0.25},
+    }
+
+    def __init__(self, settings=None):
+        unknown = set(settings or {}) - set(self.DEFAULTS)
+        if unknown:
+            logger.warning(f"Неизвестные настройки загрузчика: {', '.join(sorted(unknown))}")
+        self.settings = {**self.DEFAULTS, **(settings or {})}
+
+    def resolve(self, overrides=None):
+        """Итоговые настройки с учетом настроек конкретной загрузки"""
+        return {**self.settings, **(overrides or {})}
+
+    def ydl_options(self, overrides=None, rate_limit=None):
+        """
+        Параметры YoutubeDL для загрузки
+        rate_limit (байт/с) передается только внешнему загрузчику: встроенный
+        ограничивается хуком прогресса планировщика полосы
+        """
+        settings = self.resolve(overrides)
+        options = {
+            'concurrent_fragment_downloads': max(1, int(settings['concurrent_fragments'])),
+        }
+        if settings['http_chunk_size']:
+            options['http_chunk_size'] = int(settings['http_chunk_size'])
+
+        downloader = settings['external_downloader']
+        if downloader:
+            if shutil.which(downloader) is None:
+                logger.warning(f"Внешний загрузчик {downloader} не найден, используется встроенный")
+            else:
+                options['external_downloader'] = {'default': downloader}
+                if downloader == 'aria2c':
+                    options['external_downloader_args'] = {'aria2c': [
+                        f"--max-connection-per-server={settings['aria2c_connections']}",
+                        f"--split={settings['aria2c_split']}",
+                        f"--min-split-size={settings['aria2c_min_split_size']}",
+                    ]}
+                    if rate_limit:
+                        # aria2c не вызывает хуки прогресса, лимит задается при запуске
+                        options['external_downloader_args']['aria2c'].append(
+                            f"--max-overall-download-limit={int(rate_limit)}"
+                        )
+
+        # Используются только FFmpegVideoConvertor, т.е. при перекодировании
+        options['postprocessor_args'] = {'videoconvertor': [
+            '-c:v', 'libx264', '-preset', str(settings['reencode_preset']),
+            '-threads', str(int(settings['reencode_threads'])),
+            '-c:a', 'aac',
+        ]}
+        return options
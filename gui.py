@@ -1,4 +1,5 @@
 import sys
+import bisect
 from PyQt6.QtWidgets import (
     QApplication, QMainWindow, QWidget, QVBoxLayout, 
     QLabel, QLineEdit, QPushButton, QProgressBar, 
@@ -7,104 +8,216 @@ from PyQt6.QtWidgets import (
     QTabWidget, QTableWidgetItem, QDialog, QCheckBox, QListWidgetItem,
     QFileDialog, QComboBox
 )
-from PyQt6.QtCore import Qt, QThread, pyqtSignal
-from PyQt6.QtGui import QPixmap, QColor
+from PyQt6.QtCore import Qt, QObject, QThread, QTimer, pyqtSignal
+from PyQt6.QtGui import QImage, QPixmap, QColor
 from main import (
-    download_youtube_video, get_video_info, logger, 
-    download_only_thumbnail, search_youtube_videos, db,  # Добавляем импорт db
-    check_ffmpeg, get_available_formats, get_channel_videos
+    get_video_info, logger, 
+    download_only_thumbnail, db,  # Добавляем импорт db
+    check_ffmpeg, get_available_formats, get_channel_videos, iter_youtube_videos,
+    get_cached_search, download_engine, thumbnail_cache, content_filter
 )
 import logging
+import threading
+import multiprocessing
 import traceback
-import requests
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 from database import VideoDatabase
+from youtube_id import video_key, parser_stats
+from job_engine import JobEngine
 
-class DownloadWorker(QThread):
-    finished = pyqtSignal(bool, str, str, str)
-    progress = pyqtSignal(str, float)
+class ThumbnailPixmaps:
+    """
+    Декодированные и уменьшенные превью в памяти (LRU) отдельно для каждого размера
+    Исходные изображения берутся из общего дискового кэша thumbnail_cache,
+    поэтому повторный показ превью не требует ни сети, ни декодирования
+    """
+    MAX_ITEMS = 500
     
-    def __init__(self, url, format_id=None):
-        super().__init__()
-        self.url = url
-        self.format_id = format_id
-        self._is_running = True
+    def __init__(self, cache, max_items=MAX_ITEMS):
+        self.cache = cache
+        self.max_items = max_items
+        self._pixmaps = OrderedDict()
     
-    def run(self):
-        try:
-            handler = WorkerLogHandler(self.progress)
-            handler.setFormatter(logging.Formatter('%(message)s'))
-            logger.addHandler(handler)
-            
-            try:
-                if not self._is_running:
-                    return
-                    
-                logger.debug(f"Запуск скачивания с URL: {self.url}")
-                video_path, thumbnail_path = download_youtube_video(
-                    self.url, 
-                    format_id=self.format_id
-                )
-                if self._is_running:
-                    self.finished.emit(True, video_path, thumbnail_path or "", self.url)
-            except Exception as e:
-                if self._is_running:
-                    logger.error(f"Ошибка при скачивании: {str(e)}")
-                    logger.debug(f"Полный стек ошибки:\n{traceback.format_exc()}")
-                    self.finished.emit(False, str(e), "", self.url)
-            finally:
-                logger.removeHandler(handler)
-        except Exception as e:
-            if self._is_running:
-                logger.error(f"Критическая ошибка: {str(e)}")
-                logger.debug(f"Полный стек ошибки:\n{traceback.format_exc()}")
-                self.finished.emit(False, str(e), "", self.url)
+    def cached(self, url, size, video_id=None):
+        """QPixmap из памяти без обращения к диску и сети или None"""
+        key = (self.cache.key(url, video_id), size)
+        pixmap = self._pixmaps.get(key)
+        if pixmap is not None:
+            self._pixmaps.move_to_end(key)
+        return pixmap
+    
+    def put(self, url, size, video_id, pixmap):
+        self._pixmaps[(self.cache.key(url, video_id), size)] = pixmap
+        if len(self._pixmaps) > self.max_items:
+            self._pixmaps.popitem(last=False)
     
-    def quit(self):
-        self._is_running = False
-        super().quit()
+    def get(self, url, size, video_id=None):
+        """QPixmap размера size = (ширина, высота) или None"""
+        if not url:
+            return None
+        pixmap = self.cached(url, size, video_id)
+        if pixmap is not None:
+            return pixmap
+        
+        data = self.cache.get(url, video_id)
+        if not data:
+            return None
+        pixmap = QPixmap()
+        if not pixmap.loadFromData(data):
+            return None
+        pixmap = pixmap.scaled(*size, Qt.AspectRatioMode.KeepAspectRatio,
+                               Qt.TransformationMode.SmoothTransformation)
+        self.put(url, size, video_id, pixmap)
+        return pixmap
 
-class WorkerLogHandler(logging.Handler):
-    def __init__(self, signal):
-        super().__init__()
-        self.signal = signal
+# Используется только из потока интерфейса
+thumbnail_pixmaps = ThumbnailPixmaps(thumbnail_cache)
+
+# Одновременных загрузок превью для таблиц (общий пул на все вкладки)
+THUMBNAIL_WORKERS = 6
+_thumbnail_executor = ThreadPoolExecutor(max_workers=THUMBNAIL_WORKERS, thread_name_prefix='thumbnail')
+
+def _load_thumbnail_image(url, video_id, size):
+    """Загрузка и уменьшение превью в фоновом потоке (QImage, в отличие от QPixmap, это допускает)"""
+    data = thumbnail_cache.get(url, video_id)
+    if not data:
+        return None
+    image = QImage()
+    if not image.loadFromData(data):
+        return None
+    return image.scaled(*size, Qt.AspectRatioMode.KeepAspectRatio,
+                        Qt.TransformationMode.SmoothTransformation)
+
+class ThumbnailLoader(QObject):
+    """
+    Асинхронная загрузка превью для колонки таблицы
+    Строка сразу получает заглушку, изображение подставляется по готовности.
+    Загружаются только видимые строки; еще не начатые запросы для строк,
+    ушедших из видимой области, отменяются
+    """
+    image_loaded = pyqtSignal(int, object)  # Номер запроса, QImage или None
+    PREFETCH_ROWS = 2  # Строк за пределами видимой области, загружаемых заранее
+    
+    def __init__(self, table, column, size):
+        super().__init__(table)
+        self.table = table
+        self.column = column
+        self.size = size
+        self._pending = {}  # Номер запроса -> (Future, QLabel)
+        self._next_request = 0
+        self.image_loaded.connect(self._on_loaded)
+        
+        # Прокрутка, добавление строк и изменение размера окна обрабатываются одним вызовом
+        self._refresh_timer = QTimer(self)
+        self._refresh_timer.setSingleShot(True)
+        self._refresh_timer.setInterval(50)
+        self._refresh_timer.timeout.connect(self.load_visible)
+        scroll_bar = table.verticalScrollBar()
+        scroll_bar.valueChanged.connect(self.schedule)
+        scroll_bar.rangeChanged.connect(self.schedule)
+    
+    def add(self, label, url, video_id=None):
+        """Привязка превью к метке в таблице"""
+        if not url:
+            label.setText("Нет превью")
+            return
+        pixmap = thumbnail_pixmaps.cached(url, self.size, video_id)
+        if pixmap is not None:
+            label.setPixmap(pixmap)
+            return
         
-    def emit(self, record):
-        msg = self.format(record)
+        label.setText("Загрузка...")
+        self._next_request += 1
+        label.setProperty('thumbnail_url', url)
+        label.setProperty('video_id', video_id)
+        label.setProperty('thumbnail_request', self._next_request)
+        self.schedule()
+    
+    def schedule(self):
+        self._refresh_timer.start()
+    
+    def visible_rows(self):
+        """Диапазон строк в видимой области (с запасом PREFETCH_ROWS)"""
+        count = self.table.rowCount()
+        if not count:
+            return range(0)
+        height = self.table.viewport().height()
+        first = max(self.table.rowAt(0), 0)
+        last = self.table.rowAt(height - 1) if height > 0 else first
+        if last == -1:
+            last = count - 1
+        return range(max(first - self.PREFETCH_ROWS, 0), min(last + self.PREFETCH_ROWS + 1, count))
+    
+    def load_visible(self):
+        visible = set()
+        for row in self.visible_rows():
+            label = self.table.cellWidget(row, self.column)
+            request_id = label.property('thumbnail_request') if label is not None else None
+            if request_id is None:
+                continue
+            visible.add(request_id)
+            if request_id not in self._pending:
+                future = _thumbnail_executor.submit(
+                    _load_thumbnail_image, label.property('thumbnail_url'),
+                    label.property('video_id'), self.size
+                )
+                self._pending[request_id] = (future, label)
+                future.add_done_callback(lambda f, r=request_id: self._finished(r, f))
+        
+        # Запросы для строк вне видимой области отменяются, если еще не начались
+        for request_id in list(self._pending):
+            if request_id not in visible and self._pending[request_id][0].cancel():
+                del self._pending[request_id]
+    
+    def _finished(self, request_id, future):
+        """Вызывается в потоке загрузки: результат передается в поток интерфейса сигналом"""
+        if future.cancelled():
+            return
         try:
-            # Проверяем различные форматы сообщений о прогрессе
-            if '[download]' in msg:
-                # Формат: [download]   x.x% of y.yMiB at z.zMiB/s
-                if '%' in msg and 'of' in msg and 'at' in msg:
-                    percent_str = msg.split()[1].replace('%', '')
-                    try:
-                        percent = float(percent_str)
-                        self.signal.emit(msg, percent)
-                        return
-                    except ValueError:
-                        pass
-                
-                # Формат: [download] 100% of x.xMiB in mm:ss at y.yMiB/s
-                elif '100%' in msg:
-                    self.signal.emit(msg, 100.0)
-                    return
-                
-                # Формат: [download] Destination:
-                elif 'Destination:' in msg:
-                    self.signal.emit(msg, 0.0)
-                    return
-                
-                # Формат: [download] Downloading video ...
-                elif 'Downloading' in msg:
-                    self.signal.emit(msg, 0.0)
-                    return
-            
-            # Все остальные сообщения отправляем без процента
-            self.signal.emit(msg, -1)
-            
+            image = future.result()
         except Exception as e:
-            print(f"Error parsing progress: {e} in message: {msg}")
-            self.signal.emit(msg, -1)
+            logger.warning(f"Ошибка при загрузке превью: {str(e)}")
+            image = None
+        try:
+            self.image_loaded.emit(request_id, image)
+        except RuntimeError:
+            pass  # Таблица уже закрыта
+    
+    def _on_loaded(self, request_id, image):
+        entry = self._pending.pop(request_id, None)
+        if entry is None:
+            return  # Таблица очищена
+        _, label = entry
+        try:
+            if image is None:
+                label.setText("Нет превью")
+            else:
+                pixmap = QPixmap.fromImage(image)
+                thumbnail_pixmaps.put(label.property('thumbnail_url'), self.size,
+                                      label.property('video_id'), pixmap)
+                label.setPixmap(pixmap)
+            label.setProperty('thumbnail_request', None)
+        except RuntimeError:
+            pass  # Строка удалена, пока шла загрузка
+    
+    def clear(self):
+        """Отмена всех запросов (перед очисткой таблицы)"""
+        for future, _ in self._pending.values():
+            future.cancel()
+        self._pending.clear()
+
+class JobEventBridge(QObject):
+    """
+    Передача событий движка задач в поток интерфейса
+    Движок вызывает подписчиков из своего фонового потока, сигнал доставляет
+    событие в поток Qt через очередь событий
+    """
+    event = pyqtSignal(dict)
+
+    def __call__(self, event):
+        self.event.emit(event)
 
 class LogHandler(logging.Handler):
     def __init__(self, text_widget):
@@ -150,14 +263,10 @@ class VideoInfoWidget(QFrame):
     def update_info(self, info: dict):
         # Загружаем и отображаем превью
         if info['thumbnail']:
-            try:
-                response = requests.get(info['thumbnail'])
-                pixmap = QPixmap()
-                pixmap.loadFromData(response.content)
-                pixmap = pixmap.scaled(320, 180, Qt.AspectRatioMode.KeepAspectRatio, 
-                                     Qt.TransformationMode.SmoothTransformation)
+            pixmap = thumbnail_pixmaps.get(info['thumbnail'], (320, 180), info.get('id'))
+            if pixmap:
                 self.thumbnail_label.setPixmap(pixmap)
-            except:
+            else:
                 self.thumbnail_label.setText("Превью недоступно")
         
         # Обновляем информацию
@@ -200,6 +309,50 @@ class ThumbnailDownloadWorker(QThread):
         except Exception as e:
             self.finished.emit(False, str(e), self.url)
 
+class ChannelVideosWorker(QThread):
+    video_loaded = pyqtSignal(int, dict)  # позиция на канале, видео
+    finished = pyqtSignal(bool, str)  # success, error
+    
+    def __init__(self, channel_url, max_videos, video_filter=None):
+        super().__init__()
+        self.channel_url = channel_url
+        self.max_videos = max_videos
+        self.video_filter = video_filter
+        
+    def run(self):
+        try:
+            get_channel_videos(self.channel_url, self.max_videos, on_result=self.video_loaded.emit,
+                               video_filter=self.video_filter)
+            self.finished.emit(True, "")
+        except Exception as e:
+            self.finished.emit(False, str(e))
+
+class SearchWorker(QThread):
+    video_found = pyqtSignal(dict)
+    finished = pyqtSignal(bool, str, int)  # success, error, количество найденных
+    
+    def __init__(self, query, min_views, excluded_words, max_results):
+        super().__init__()
+        self.query = query
+        self.min_views = min_views
+        self.excluded_words = excluded_words
+        self.max_results = max_results
+        self.cancel_event = threading.Event()
+        
+    def run(self):
+        found = 0
+        try:
+            for video in iter_youtube_videos(self.query, self.min_views, self.excluded_words,
+                                             self.max_results, self.cancel_event):
+                found += 1
+                self.video_found.emit(video)
+            self.finished.emit(True, "", found)
+        except Exception as e:
+            self.finished.emit(False, str(e), found)
+    
+    def cancel(self):
+        self.cancel_event.set()
+
 class SearchTab(QWidget):
     video_selected = pyqtSignal(str)  # Сигнал для передачи URL в основную вкладку
     
@@ -272,6 +425,7 @@ class SearchTab(QWidget):
         
         # Устанавливаем высоту строк для превью
         self.results_table.verticalHeader().setDefaultSectionSize(90)
+        self.thumbnail_loader = ThumbnailLoader(self.results_table, 0, (160, 90))
         
         layout.addWidget(self.results_table)
         
@@ -283,6 +437,9 @@ class SearchTab(QWidget):
         # Добавляем обработчик двойного клика по строке таблицы
         self.results_table.itemDoubleClicked.connect(self.show_video_details)
         
+        self.search_worker = None
+        self.shown_urls = set()  # URL видео, уже показанных в таблице
+        
         # Стилизация
         self.search_button.setStyleSheet("""
             QPushButton {
@@ -306,6 +463,11 @@ class SearchTab(QWidget):
         logger.addHandler(handler)
     
     def search_videos(self):
+        # Повторное нажатие во время поиска останавливает его
+        if self.search_worker and self.search_worker.isRunning():
+            self.cancel_search()
+            return
+        
         self.log_text.clear()  # Очищаем лог перед новым поиском
         query = self.search_input.text().strip()
         if not query:
@@ -330,24 +492,43 @@ class SearchTab(QWidget):
             
         excluded = [w.strip() for w in self.excluded_words.text().split(',') if w.strip()]
         
-        # Показываем индикатор загрузки
-        self.search_button.setEnabled(False)
-        self.search_button.setText("Поиск...")
-        QApplication.processEvents()
-        
-        try:
-            logger.info(f"Начало поиска. Запрос: '{query}', мин. просмотров: {min_views}, "
-                       f"макс. результатов: {max_results}, исключения: {excluded}")
-            videos = search_youtube_videos(query, min_views, excluded, max_results)
-            logger.info(f"Поиск завершен. Найдено видео: {len(videos)}")
+        # Результаты того же поиска из кэша показываем сразу
+        self.thumbnail_loader.clear()
+        self.results_table.setRowCount(0)
+        self.shown_urls = set()
+        cached = get_cached_search(query, min_views, excluded, max_results)
+        if cached:
+            videos, needs_refresh = cached
             self.display_results(videos)
-        except Exception as e:
-            logger.error(f"Ошибка при поиске: {str(e)}")
-            logger.debug(f"Полный стек ошибки:\n{traceback.format_exc()}")
-            QMessageBox.critical(self, "Ошибка", f"Ошибка при поиске: {str(e)}")
-        finally:
-            self.search_button.setEnabled(True)
-            self.search_button.setText("Найти")
+            if not needs_refresh:
+                logger.info(f"Результаты из кэша: {len(videos)}")
+                return
+            logger.info(f"Результаты из кэша: {len(videos)}, проверяем новые видео")
+        
+        # Результаты добавляются в таблицу по мере нахождения
+        self.search_button.setText("Остановить")
+        
+        logger.info(f"Начало поиска. Запрос: '{query}', мин. просмотров: {min_views}, "
+                   f"макс. результатов: {max_results}, исключения: {excluded}")
+        self.search_worker = SearchWorker(query, min_views, excluded, max_results)
+        self.search_worker.video_found.connect(self.append_result)
+        self.search_worker.finished.connect(self.search_complete)
+        self.search_worker.start()
+    
+    def cancel_search(self):
+        """Остановка текущего поиска; уже найденные результаты остаются в таблице"""
+        if self.search_worker and self.search_worker.isRunning():
+            self.search_worker.cancel()
+            self.search_button.setEnabled(False)
+    
+    def search_complete(self, success, error, found):
+        if success:
+            logger.info(f"Поиск завершен. Найдено видео: {found}")
+        else:
+            logger.error(f"Ошибка при поиске: {error}")
+            QMessageBox.critical(self, "Ошибка", f"Ошибка при поиске: {error}")
+        self.search_button.setEnabled(True)
+        self.search_button.setText("Найти")
     
     def create_add_button(self, url):
         """Создание кнопки добавления с правильной привязкой URL"""
@@ -370,77 +551,26 @@ class SearchTab(QWidget):
         """)
         return add_button
     
-    def create_thumbnail_label(self, thumbnail_url):
-        """Создание виджета для превью"""
+    def create_thumbnail_label(self, thumbnail_url, video_id=None):
+        """Создание виджета для превью; изображение загружается асинхронно"""
         label = QLabel()
         label.setFixedSize(160, 90)
         label.setAlignment(Qt.AlignmentFlag.AlignCenter)
         label.setStyleSheet("background-color: #f0f0f0; border-radius: 4px;")
         
-        if thumbnail_url:
-            try:
-                response = requests.get(thumbnail_url)
-                pixmap = QPixmap()
-                pixmap.loadFromData(response.content)
-                pixmap = pixmap.scaled(160, 90, Qt.AspectRatioMode.KeepAspectRatio, 
-                                     Qt.TransformationMode.SmoothTransformation)
-                label.setPixmap(pixmap)
-            except:
-                label.setText("Нет превью")
-        else:
-            label.setText("Нет превью")
+        self.thumbnail_loader.add(label, thumbnail_url, video_id)
             
         return label
 
     def display_results(self, videos):
         try:
+            self.thumbnail_loader.clear()
             self.results_table.setRowCount(len(videos))
             logger.debug(f"Отображение {len(videos)} результатов")
             
             for row, video in enumerate(videos):
-                try:
-                    # Превью
-                    thumbnail_label = self.create_thumbnail_label(video.get('thumbnail'))
-                    self.results_table.setCellWidget(row, 0, thumbnail_label)
-                    
-                    # Название
-                    title_item = QTableWidgetItem(video['title'] or "Без названия")
-                    title_item.setToolTip(video['title'] or "Без названия")
-                    self.results_table.setItem(row, 1, title_item)
-                    
-                    # Просмотры
-                    views = QTableWidgetItem(f"{video['views']:,}".replace(',', ' '))
-                    views.setTextAlignment(Qt.AlignmentFlag.AlignRight | Qt.AlignmentFlag.AlignVCenter)
-                    self.results_table.setItem(row, 2, views)
-                    
-                    # Автор
-                    author_item = QTableWidgetItem(video['uploader'] or "Неизвестно")
-                    author_item.setToolTip(video['uploader'] or "Неизвестно")
-                    self.results_table.setItem(row, 3, author_item)
-                    
-                    # Описание
-                    description = video.get('description') or "Нет описания"
-                    if description and len(description) > 200:
-                        description = description[:197] + "..."
-                    desc_item = QTableWidgetItem(description)
-                    desc_item.setToolTip(video.get('description') or "Нет описания")
-                    self.results_table.setItem(row, 4, desc_item)
-                    
-                    # Кнопка добавления
-                    add_button = self.create_add_button(video['url'])
-                    self.results_table.setCellWidget(row, 5, add_button)
-                    
-                except Exception as e:
-                    logger.error(f"Ошибка при отображении видео {row}: {str(e)}")
-                    logger.debug(f"Данные видео: {video}")
-                    # Заполняем ячейки значениями по умолчанию
-                    self.results_table.setCellWidget(row, 0, QLabel("Ошибка"))
-                    for col, default in enumerate(["Ошибка загрузки", "0", "Неизвестно", "Ошибка загрузки данных"], 1):
-                        self.results_table.setItem(row, col, QTableWidgetItem(default))
-                    error_button = QPushButton("❌")
-                    error_button.setEnabled(False)
-                    self.results_table.setCellWidget(row, 5, error_button)
-                    continue
+                self.fill_result_row(row, video)
+                self.shown_urls.add(video['url'])
             
             logger.info("Результаты успешно отображены")
             
@@ -448,6 +578,59 @@ class SearchTab(QWidget):
             logger.error(f"Ошибка при отображении результатов: {str(e)}")
             logger.debug(f"Полный стек ошибки:\n{traceback.format_exc()}")
             raise
+    
+    def append_result(self, video):
+        """Добавление найденного видео в конец таблицы (если его еще нет)"""
+        if video['url'] in self.shown_urls:
+            return
+        self.shown_urls.add(video['url'])
+        row = self.results_table.rowCount()
+        self.results_table.insertRow(row)
+        self.fill_result_row(row, video)
+    
+    def fill_result_row(self, row, video):
+        try:
+            # Превью
+            thumbnail_label = self.create_thumbnail_label(video.get('thumbnail'), video_key(video['url']))
+            self.results_table.setCellWidget(row, 0, thumbnail_label)
+            
+            # Название
+            title_item = QTableWidgetItem(video['title'] or "Без названия")
+            title_item.setToolTip(video['title'] or "Без названия")
+            self.results_table.setItem(row, 1, title_item)
+            
+            # Просмотры
+            views = QTableWidgetItem(f"{video['views']:,}".replace(',', ' '))
+            views.setTextAlignment(Qt.AlignmentFlag.AlignRight | Qt.AlignmentFlag.AlignVCenter)
+            self.results_table.setItem(row, 2, views)
+            
+            # Автор
+            author_item = QTableWidgetItem(video['uploader'] or "Неизвестно")
+            author_item.setToolTip(video['uploader'] or "Неизвестно")
+            self.results_table.setItem(row, 3, author_item)
+            
+            # Описание
+            description = video.get('description') or "Нет описания"
+            if description and len(description) > 200:
+                description = description[:197] + "..."
+            desc_item = QTableWidgetItem(description)
+            desc_item.setToolTip(video.get('description') or "Нет описания")
+            self.results_table.setItem(row, 4, desc_item)
+            
+            # Кнопка добавления
+            add_button = self.create_add_button(video['url'])
+            self.results_table.setCellWidget(row, 5, add_button)
+            
+        except Exception as e:
+            logger.error(f"Ошибка при отображении видео {row}: {str(e)}")
+            logger.debug(f"Данные видео: {video}")
+            # Заполняем ячейки значениями по умолчанию
+            self.results_table.setCellWidget(row, 0, QLabel("Ошибка"))
+            for col, default in enumerate(["Ошибка загрузки", "0", "Неизвестно", "Ошибка загрузки данных"], 1):
+                self.results_table.setItem(row, col, QTableWidgetItem(default))
+            error_button = QPushButton("❌")
+            error_button.setEnabled(False)
+            self.results_table.setCellWidget(row, 5, error_button)
 
     def show_video_details(self, item):
         row = item.row()
@@ -477,14 +660,10 @@ class VideoDetailsDialog(QDialog):
         
         # Загружаем превью
         if video_info.get('thumbnail'):
-            try:
-                response = requests.get(video_info['thumbnail'])
-                pixmap = QPixmap()
-                pixmap.loadFromData(response.content)
-                pixmap = pixmap.scaled(480, 270, Qt.AspectRatioMode.KeepAspectRatio, 
-                                     Qt.TransformationMode.SmoothTransformation)
+            pixmap = thumbnail_pixmaps.get(video_info['thumbnail'], (480, 270), video_info.get('id'))
+            if pixmap:
                 self.thumbnail_label.setPixmap(pixmap)
-            except:
+            else:
                 self.thumbnail_label.setText("Превью недоступно")
         
         # Информация о видео
@@ -632,6 +811,9 @@ class QualitySelectDialog(QDialog):
 
 class VideoDownloaderApp(QMainWindow):
     MAX_CONCURRENT_DOWNLOADS = 3  # Максимальное количество одновременных загрузок
+    DEFAULT_MAX_HEIGHT = 1080  # Качество, выбираемое в очереди по умолчанию
+    HISTORY_PAGE_SIZE = 100  # Количество строк истории, загружаемых за раз
+    HISTORY_PREFETCH_ROWS = 10  # За сколько строк до конца подгружать следующую страницу
     
     def __init__(self):
         super().__init__()
@@ -639,8 +821,14 @@ class VideoDownloaderApp(QMainWindow):
         self.setMinimumSize(800, 600)
         
         # Инициализация переменных
-        self.active_downloads = {}
+        self.active_downloads = {}  # URL -> номер задачи в движке
         self.download_queue = []
+        
+        # Загрузки выполняются в отдельных процессах, события приходят сигналом
+        self.job_engine = JobEngine(self.MAX_CONCURRENT_DOWNLOADS)
+        self.job_events = JobEventBridge()
+        self.job_events.event.connect(self.on_job_event)
+        self.job_engine.subscribe(self.job_events)
         self.ffmpeg_checked = False
         
         # Создаем вкладки
@@ -664,12 +852,16 @@ class VideoDownloaderApp(QMainWindow):
         # Вкладка истории
         self.history_tab = self.setup_history_tab()
         self.tabs.addTab(self.history_tab, "История")
+        self.tabs.currentChanged.connect(self.on_tab_changed)
         
         # Настройка логирования
         self.setup_logging()
         
         # Добавляем обработчик закрытия окна
         self.setAttribute(Qt.WidgetAttribute.WA_DeleteOnClose, False)
+        
+        # Загрузки, прерванные закрытием или сбоем, предлагаем продолжить после показа окна
+        QTimer.singleShot(0, self.restore_interrupted_jobs)
 
     def setup_download_tab(self):
         """Настройка вкладки загрузки"""
@@ -697,9 +889,9 @@ class VideoDownloaderApp(QMainWindow):
         
         # Таблица URL для загрузки
         self.url_table = QTableWidget()
-        self.url_table.setColumnCount(4)
+        self.url_table.setColumnCount(5)
         self.url_table.setHorizontalHeaderLabels([
-            "URL", "Качество", "Статус", "Действия"
+            "URL", "Качество", "Загрузчик", "Статус", "Действия"
         ])
         
         # Настройка колонок
@@ -707,9 +899,11 @@ class VideoDownloaderApp(QMainWindow):
         self.url_table.horizontalHeader().setSectionResizeMode(1, QHeaderView.ResizeMode.Fixed)
         self.url_table.setColumnWidth(1, 250)
         self.url_table.horizontalHeader().setSectionResizeMode(2, QHeaderView.ResizeMode.Fixed)
-        self.url_table.setColumnWidth(2, 150)
+        self.url_table.setColumnWidth(2, 140)
         self.url_table.horizontalHeader().setSectionResizeMode(3, QHeaderView.ResizeMode.Fixed)
-        self.url_table.setColumnWidth(3, 100)
+        self.url_table.setColumnWidth(3, 150)
+        self.url_table.horizontalHeader().setSectionResizeMode(4, QHeaderView.ResizeMode.Fixed)
+        self.url_table.setColumnWidth(4, 100)
         
         layout.addWidget(self.url_table)
         
@@ -750,14 +944,27 @@ class VideoDownloaderApp(QMainWindow):
         
         return widget
 
+    def find_queue_row(self, url):
+        """Поиск строки очереди с тем же видео (ссылки разного вида сравниваются по ID)"""
+        key = video_key(url)
+        for row in range(self.url_table.rowCount()):
+            if video_key(self.url_table.item(row, 0).text()) == key:
+                return row
+        return -1
+
     def add_url_to_queue(self, url):
         """Добавление URL в очередь"""
         try:
-            # Проверяем, нет ли уже такого URL
-            for row in range(self.url_table.rowCount()):
-                if self.url_table.item(row, 0).text() == url:
-                    logger.warning(f"URL уже в списке: {url}")
-                    return
+            # Проверяем, нет ли уже такого видео
+            if self.find_queue_row(url) != -1:
+                logger.warning(f"URL уже в списке: {url}")
+                return
+            
+            # Видео из библиотеки, файл которого на месте, повторно не скачиваем
+            downloaded_path = db.get_downloaded_file(url)
+            if downloaded_path:
+                logger.info(f"Видео уже скачано, в очередь не добавлено: {downloaded_path}")
+                return
 
             # Получаем форматы для видео
             formats = get_available_formats(url)
@@ -775,18 +982,29 @@ class VideoDownloaderApp(QMainWindow):
             for fmt in formats:
                 format_combo.addItem(fmt['display'], fmt['format_id'])
             
-            # Выбираем формат 1080p со звуком по умолчанию
-            default_index = -1
-            for i in range(format_combo.count()):
-                display = format_combo.itemText(i)
-                if "1920x1080" in display and "🔊" in display:
-                    default_index = i
-                    break
-            if default_index != -1:
-                format_combo.setCurrentIndex(default_index)
+            # По умолчанию - лучший формат не выше 1080p из таблицы форматов,
+            # с добавленной звуковой дорожкой, если она есть в списке
+            best = db.get_best_format(url, self.DEFAULT_MAX_HEIGHT, with_audio=False)
+            if best:
+                default_index = -1
+                for i in range(format_combo.count()):
+                    format_id = format_combo.itemData(i)
+                    if format_id.startswith(f"{best['format_id']}+"):
+                        default_index = i
+                        break
+                    if format_id == best['format_id'] and default_index == -1:
+                        default_index = i
+                if default_index != -1:
+                    format_combo.setCurrentIndex(default_index)
             
             self.url_table.setCellWidget(row, 1, format_combo)
             
+            # Настройки движка загрузки для этого видео
+            engine_combo = QComboBox()
+            for name, overrides in download_engine.PRESETS.items():
+                engine_combo.addItem(name, overrides)
+            self.url_table.setCellWidget(row, 2, engine_combo)
+            
             # Прогресс-бар
             progress_bar = QProgressBar()
             progress_bar.setMinimum(0)
@@ -805,7 +1023,7 @@ class VideoDownloaderApp(QMainWindow):
                     border-radius: 2px;
                 }
             """)
-            self.url_table.setCellWidget(row, 2, progress_bar)
+            self.url_table.setCellWidget(row, 3, progress_bar)
             
             # Кнопка удаления
             delete_button = QPushButton("❌")
@@ -818,7 +1036,7 @@ class VideoDownloaderApp(QMainWindow):
             button_layout.setContentsMargins(0, 0, 0, 0)
             button_layout.setAlignment(Qt.AlignmentFlag.AlignCenter)
             
-            self.url_table.setCellWidget(row, 3, button_widget)
+            self.url_table.setCellWidget(row, 4, button_widget)
             
             self.download_button.setEnabled(True)
             logger.info(f"Добавлен URL: {url}")
@@ -829,6 +1047,11 @@ class VideoDownloaderApp(QMainWindow):
 
     def remove_url(self, row):
         """Удаление URL из очереди"""
+        url = self.url_table.item(row, 0).text()
+        if url in self.active_downloads:
+            self.job_engine.cancel(self.active_downloads[url])
+        else:
+            db.cancel_jobs(url)
         self.url_table.removeRow(row)
         if self.url_table.rowCount() == 0:
             self.download_button.setEnabled(False)
@@ -840,9 +1063,13 @@ class VideoDownloaderApp(QMainWindow):
                 url = self.url_table.item(row, 0).text()
                 format_combo = self.url_table.cellWidget(row, 1)
                 format_id = format_combo.currentData()
+                engine_overrides = self.url_table.cellWidget(row, 2).currentData()
                 
-                if url not in self.active_downloads and url not in self.download_queue:
-                    self.download_queue.append((url, format_id))
+                queued_urls = [queued[0] for queued in self.download_queue]
+                if url not in self.active_downloads and url not in queued_urls:
+                    # Журнал переживает закрытие приложения, в отличие от download_queue
+                    db.start_job(url, format_id, engine_overrides)
+                    self.download_queue.append((url, format_id, engine_overrides))
             
             self.process_queue()
             
@@ -850,11 +1077,49 @@ class VideoDownloaderApp(QMainWindow):
             logger.error(f"Ошибка при запуске загрузок: {str(e)}")
             QMessageBox.critical(self, "Ошибка", f"Не удалось начать загрузку:\n{str(e)}")
 
+    def restore_interrupted_jobs(self):
+        """Восстановление очереди из журнала загрузок после закрытия или сбоя"""
+        try:
+            jobs = db.get_interrupted_jobs()
+            if not jobs:
+                return
+            
+            for job in jobs:
+                self.add_url_to_queue(job['url'])
+                row = self.find_queue_row(job['url'])
+                if row == -1:
+                    continue
+                
+                # Возвращаем выбранные ранее формат и настройки загрузчика
+                format_combo = self.url_table.cellWidget(row, 1)
+                index = format_combo.findData(job['format_id'])
+                if index != -1:
+                    format_combo.setCurrentIndex(index)
+                engine_combo = self.url_table.cellWidget(row, 2)
+                for index in range(engine_combo.count()):
+                    if engine_combo.itemData(index) == (job['engine_overrides'] or {}):
+                        engine_combo.setCurrentIndex(index)
+                        break
+            
+            logger.info(f"Восстановлено прерванных загрузок: {len(jobs)}")
+            reply = QMessageBox.question(
+                self,
+                'Прерванные загрузки',
+                f'Найдено прерванных загрузок: {len(jobs)}. Продолжить их?',
+                QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No,
+                QMessageBox.StandardButton.Yes
+            )
+            if reply == QMessageBox.StandardButton.Yes:
+                self.start_downloads()
+                
+        except Exception as e:
+            logger.error(f"Ошибка при восстановлении загрузок: {str(e)}")
+
     def update_download_status(self, row, status):
         """Обновление статуса загрузки"""
         if 0 <= row < self.url_table.rowCount():
             status_item = QTableWidgetItem(status)
-            self.url_table.setItem(row, 2, status_item)
+            self.url_table.setItem(row, 3, status_item)
 
     def process_queue(self):
         """Обработка очереди загрузок"""
@@ -862,21 +1127,19 @@ class VideoDownloaderApp(QMainWindow):
             # Запускаем новые загрузки, если есть место
             while (len(self.active_downloads) < self.MAX_CONCURRENT_DOWNLOADS and 
                    self.download_queue):
-                url, format_id = self.download_queue.pop(0)
+                url, format_id, engine_overrides = self.download_queue.pop(0)
                 if url not in self.active_downloads:
-                    self.start_single_download(url, format_id)
-                    # Добавляем небольшую задержку между запусками
-                    QThread.msleep(500)
+                    self.start_single_download(url, format_id, engine_overrides)
         except Exception as e:
             logger.error(f"Ошибка при обработке очереди: {str(e)}")
             logger.debug(f"Полный стек ошибки:\n{traceback.format_exc()}")
     
-    def start_single_download(self, url, format_id):
+    def start_single_download(self, url, format_id, engine_overrides=None):
         try:
             # Находим строку с этим URL
             for row in range(self.url_table.rowCount()):
                 if self.url_table.item(row, 0).text() == url:
-                    progress_bar = self.url_table.cellWidget(row, 2)
+                    progress_bar = self.url_table.cellWidget(row, 3)
                     if isinstance(progress_bar, QProgressBar):
                         progress_bar.setValue(0)
                         progress_bar.setFormat('Подготовка...')
@@ -895,13 +1158,9 @@ class VideoDownloaderApp(QMainWindow):
                         progress_bar.repaint()
                     break
 
-            worker = DownloadWorker(url, format_id)
-            worker.finished.connect(self.download_complete)
-            worker.progress.connect(lambda msg, percent: self.update_download_progress(url, msg, percent))
-            
-            # Добавляем в активные загрузки до запуска
-            self.active_downloads[url] = worker
-            worker.start()
+            self.active_downloads[url] = self.job_engine.submit(
+                url, format_id=format_id, engine_overrides=engine_overrides
+            )
             
             logger.info(f"Начало скачивания: {url} в формате {format_id}")
             
@@ -909,6 +1168,27 @@ class VideoDownloaderApp(QMainWindow):
             logger.error(f"Ошибка при подготовке скачивания: {str(e)}")
             QMessageBox.critical(self, "Ошибка", f"Не удалось начать скачивание:\n{str(e)}")
 
+    def on_job_event(self, event):
+        """Событие задачи из движка загрузок (в потоке интерфейса)"""
+        url = event['url']
+        if self.active_downloads.get(url) != event['job_id']:
+            return
+        kind = event['event']
+        if kind == 'started':
+            self.update_download_progress(url, f"Загрузка начата: {url}", 0)
+        elif kind == 'progress' and event['percent'] is not None:
+            total = event['total_bytes'] / (1024 * 1024)
+            self.update_download_progress(
+                url, f"[download] {event['percent']:.1f}% из {total:.1f} МБ: {url}", event['percent']
+            )
+        elif kind == 'completed':
+            result = event['result']
+            self.download_complete(True, result['video_path'], result['thumbnail_path'] or "", url)
+        elif kind == 'failed':
+            self.download_complete(False, event['error'], "", url)
+        elif kind == 'cancelled':
+            self.download_complete(False, "Загрузка отменена", "", url)
+
     def update_download_progress(self, url, message, percent):
         """Обновление прогресса конкретной загрузки"""
         try:
@@ -919,7 +1199,7 @@ class VideoDownloaderApp(QMainWindow):
             if percent >= 0:
                 for row in range(self.url_table.rowCount()):
                     if self.url_table.item(row, 0).text() == url:
-                        progress_bar = self.url_table.cellWidget(row, 2)
+                        progress_bar = self.url_table.cellWidget(row, 3)
                         if isinstance(progress_bar, QProgressBar):
                             # Устанавливаем значение прогресса
                             progress_bar.setValue(int(percent))
@@ -943,9 +1223,6 @@ class VideoDownloaderApp(QMainWindow):
                             else:
                                 progress_bar.setFormat(f'Загрузка: {int(percent)}%')
                             
-                            # Принудительно обновляем виджет
-                            progress_bar.repaint()
-                            QApplication.processEvents()  # Обрабатываем события приложения
                         break
                     
         except Exception as e:
@@ -954,11 +1231,7 @@ class VideoDownloaderApp(QMainWindow):
 
     def download_complete(self, success, result, thumbnail_path, url):
         try:
-            if url in self.active_downloads:
-                worker = self.active_downloads[url]
-                del self.active_downloads[url]
-                worker.quit()
-                worker.wait()
+            self.active_downloads.pop(url, None)
             
             for row in range(self.url_table.rowCount()):
                 if self.url_table.item(row, 0).text() == url:
@@ -968,8 +1241,9 @@ class VideoDownloaderApp(QMainWindow):
             if success:
                 thumb_info = f"\nПревью: {thumbnail_path}" if thumbnail_path else ""
                 logger.info(f"Успешно скачано: {url} -> {result}{thumb_info}")
-                # Обновляем историю после успешной загрузки
-                self.refresh_history()
+                # Обновляем историю после успешной загрузки, если она уже показывалась
+                if self.history_loaded:
+                    self.refresh_history()
             else:
                 logger.error(f"Ошибка при скачивании {url}: {result}")
             
@@ -1044,6 +1318,23 @@ class VideoDownloaderApp(QMainWindow):
         widget = QWidget()
         layout = QVBoxLayout(widget)
         
+        # Фильтр по названию, автору и описанию
+        self.history_filter = QLineEdit()
+        self.history_filter.setPlaceholderText("Поиск по названию, автору или описанию")
+        layout.addWidget(self.history_filter)
+        
+        # Те же правила, что и при поиске на YouTube (filters.json)
+        self.history_content_filter = QCheckBox("Скрывать видео, попадающие под фильтр контента")
+        self.history_content_filter.toggled.connect(lambda _: self.refresh_history())
+        layout.addWidget(self.history_content_filter)
+        
+        # Откладываем поиск, пока пользователь печатает
+        self.history_filter_timer = QTimer(self)
+        self.history_filter_timer.setSingleShot(True)
+        self.history_filter_timer.setInterval(250)
+        self.history_filter_timer.timeout.connect(self.refresh_history)
+        self.history_filter.textChanged.connect(self.history_filter_timer.start)
+        
         # Таблица истории
         self.history_table = QTableWidget()
         self.history_table.setColumnCount(4)
@@ -1061,23 +1352,67 @@ class VideoDownloaderApp(QMainWindow):
         
         layout.addWidget(self.history_table)
         
+        # Подгружаем следующую страницу при прокрутке к концу таблицы
+        self.history_table.verticalScrollBar().valueChanged.connect(self.on_history_scrolled)
+        
         # Кнопка обновления
         refresh_button = QPushButton("Обновить историю")
         refresh_button.clicked.connect(self.refresh_history)
         layout.addWidget(refresh_button)
         
-        # Загружаем историю при создании вкладки
-        self.refresh_history()
+        # История загружается при первом открытии вкладки
+        self.history_loaded = False
+        self.history_cursor = None
+        self.history_exhausted = False
         
         return widget
 
+    def on_tab_changed(self, index):
+        """Загрузка истории при первом показе вкладки"""
+        if self.tabs.widget(index) is self.history_tab and not self.history_loaded:
+            self.refresh_history()
+
+    def on_history_scrolled(self, value):
+        """Подгрузка следующей страницы истории при приближении к концу таблицы"""
+        scroll_bar = self.history_table.verticalScrollBar()
+        if value >= scroll_bar.maximum() - self.HISTORY_PREFETCH_ROWS:
+            self.load_history_page()
+
     def refresh_history(self):
         """Обновление списка скачанных видео"""
+        self.history_loaded = True
+        self.history_cursor = None
+        self.history_exhausted = False
+        self.history_table.setRowCount(0)
+        if self.load_history_page():
+            logger.info("История обновлена")
+
+    def load_history_page(self):
+        """Загрузка следующей страницы истории"""
+        if not self.history_loaded or self.history_exhausted:
+            return False
         try:
-            downloaded_videos = db.get_downloaded_videos()
-            self.history_table.setRowCount(len(downloaded_videos))
+            query = self.history_filter.text().strip()
+            start_row = self.history_table.rowCount()
+            if query or self.history_content_filter.isChecked():
+                downloaded_videos = db.search_library(
+                    query, limit=self.HISTORY_PAGE_SIZE, offset=start_row,
+                    video_filter=content_filter if self.history_content_filter.isChecked() else None
+                )
+            else:
+                downloaded_videos = db.get_downloaded_videos(
+                    after=self.history_cursor, limit=self.HISTORY_PAGE_SIZE
+                )
             
-            for row, (video_id, url, title, path, date) in enumerate(downloaded_videos):
+            if len(downloaded_videos) < self.HISTORY_PAGE_SIZE:
+                self.history_exhausted = True
+            if downloaded_videos:
+                video_id, _, _, _, date = downloaded_videos[-1]
+                self.history_cursor = (date, video_id)
+            
+            self.history_table.setRowCount(start_row + len(downloaded_videos))
+            
+            for row, (video_id, url, title, path, date) in enumerate(downloaded_videos, start_row):
                 # Название
                 title_item = QTableWidgetItem(title)
                 self.history_table.setItem(row, 0, title_item)
@@ -1111,11 +1446,13 @@ class VideoDownloaderApp(QMainWindow):
                 
                 self.history_table.setCellWidget(row, 3, actions_widget)
             
-            logger.info("История обновлена")
+            return True
             
         except Exception as e:
+            self.history_exhausted = True
             logger.error(f"Ошибка при обновлении истории: {str(e)}")
             QMessageBox.critical(self, "Ошибка", f"Не удалось загрузить историю: {str(e)}")
+            return False
 
     def open_file_location(self, path):
         """Открытие папки с файлом"""
@@ -1150,12 +1487,14 @@ class VideoDownloaderApp(QMainWindow):
                 
             with open(file_path, 'r', encoding='utf-8') as file:
                 urls = []
+                seen_keys = set()
                 for line in file:
                     url = line.strip()
                     if url and 'youtube.com' in url or 'youtu.be' in url:
-                        # Проверяем, нет ли уже такого URL в списке
-                        if not any(self.url_table.item(i, 0).text() == url 
-                                 for i in range(self.url_table.rowCount())):
+                        # Проверяем, нет ли уже такого видео в списке или в файле
+                        key = video_key(url)
+                        if key not in seen_keys and self.find_queue_row(url) == -1:
+                            seen_keys.add(key)
                             urls.append(url)
                 
                 if urls:
@@ -1242,14 +1581,22 @@ class VideoDownloaderApp(QMainWindow):
                     event.ignore()
                     return
             
-            # Останавливаем все активные потоки
-            for worker in self.active_downloads.values():
-                worker.quit()
-                worker.wait()  # Ждем завершения потока
+            # Прерываем загрузки: они останутся в журнале и продолжатся при следующем запуске
+            self.job_engine.shutdown(wait=False, cancel_running=True)
             
             # Очищаем очередь
             self.download_queue.clear()
             
+            # Сохраняем отложенные записи БД
+            db.flush()
+            
+            stats = db.cache_stats()
+            logger.info(f"Кэш информации о видео: попаданий {stats['hits']}, "
+                        f"промахов {stats['misses']} ({stats['hit_rate']:.0%})")
+            stats = parser_stats()
+            logger.debug(f"Кэш разбора ссылок: попаданий {stats['hits']}, промахов {stats['misses']}, "
+                         f"записей {stats['size']} ({stats['hit_rate']:.0%})")
+            
             # Удаляем обработчики логов
             for handler in logger.handlers[:]:
                 logger.removeHandler(handler)
@@ -1289,6 +1636,10 @@ class ChannelTab(QWidget):
         
         layout.addLayout(input_layout)
         
+        # Фильтр контента включается явно, как на вкладке истории
+        self.channel_content_filter = QCheckBox("Скрывать видео, попадающие под фильтр контента")
+        layout.addWidget(self.channel_content_filter)
+        
         # Таблица видео
         self.videos_table = QTableWidget()
         self.videos_table.setColumnCount(7)
@@ -1314,6 +1665,7 @@ class ChannelTab(QWidget):
         
         # Устанавливаем высоту строк
         self.videos_table.verticalHeader().setDefaultSectionSize(90)
+        self.thumbnail_loader = ThumbnailLoader(self.videos_table, 1, (160, 90))
         
         layout.addWidget(self.videos_table)
         
@@ -1339,6 +1691,9 @@ class ChannelTab(QWidget):
         self.log_text.setReadOnly(True)
         layout.addWidget(self.log_text)
         
+        # Позиции на канале для строк таблицы, в том же порядке
+        self.loaded_indices = []
+        
         # Настройка логирования
         self.setup_logging()
     
@@ -1365,84 +1720,104 @@ class ChannelTab(QWidget):
         
         self.load_button.setEnabled(False)
         self.load_button.setText("Загрузка...")
-        QApplication.processEvents()
         
-        try:
-            videos = get_channel_videos(channel_url, max_videos)
-            self.display_videos(videos)
-        except Exception as e:
-            logger.error(f"Ошибка при загрузке видео: {str(e)}")
-            QMessageBox.critical(self, "Ошибка", f"Не удалось загрузить видео: {str(e)}")
-        finally:
-            self.load_button.setEnabled(True)
-            self.load_button.setText("Загрузить видео")
+        # Видео появляются в таблице по мере получения информации о них
+        self.thumbnail_loader.clear()
+        self.videos_table.setRowCount(0)
+        self.loaded_indices = []
+        self.channel_worker = ChannelVideosWorker(
+            channel_url, max_videos,
+            video_filter=content_filter if self.channel_content_filter.isChecked() else None
+        )
+        self.channel_worker.video_loaded.connect(self.insert_video)
+        self.channel_worker.finished.connect(self.channel_load_complete)
+        self.channel_worker.start()
+    
+    def channel_load_complete(self, success, error):
+        if not success:
+            logger.error(f"Ошибка при загрузке видео: {error}")
+            QMessageBox.critical(self, "Ошибка", f"Не удалось загрузить видео: {error}")
+        self.load_button.setEnabled(True)
+        self.load_button.setText("Загрузить видео")
+    
+    def insert_video(self, index, video):
+        """Вставка видео в таблицу с сохранением порядка канала"""
+        row = bisect.bisect(self.loaded_indices, index)
+        self.loaded_indices.insert(row, index)
+        self.videos_table.insertRow(row)
+        self.fill_video_row(row, video)
     
     def display_videos(self, videos):
+        self.thumbnail_loader.clear()
         self.videos_table.setRowCount(len(videos))
+        self.loaded_indices = list(range(len(videos)))
         
         for row, video in enumerate(videos):
-            # Чекбокс
-            checkbox = QCheckBox()
-            checkbox_widget = QWidget()
-            checkbox_layout = QHBoxLayout(checkbox_widget)
-            checkbox_layout.addWidget(checkbox)
-            checkbox_layout.setAlignment(Qt.AlignmentFlag.AlignCenter)
-            checkbox_layout.setContentsMargins(0, 0, 0, 0)
-            self.videos_table.setCellWidget(row, 0, checkbox_widget)
-            
-            # Превью
-            thumbnail_label = self.create_thumbnail_label(video.get('thumbnail'))
-            self.videos_table.setCellWidget(row, 1, thumbnail_label)
-            
-            # Название
-            title_item = QTableWidgetItem(video['title'])
-            title_item.setToolTip(video['title'])
-            self.videos_table.setItem(row, 2, title_item)
-            
-            # Просмотры
-            views = QTableWidgetItem(f"{video['views']:,}".replace(',', ' '))
-            views.setTextAlignment(Qt.AlignmentFlag.AlignRight | Qt.AlignmentFlag.AlignVCenter)
-            self.videos_table.setItem(row, 3, views)
-            
-            # Длительность
-            duration = str(timedelta(seconds=video['duration'])).split('.')[0]
-            duration_item = QTableWidgetItem(duration)
-            duration_item.setTextAlignment(Qt.AlignmentFlag.AlignCenter)
-            self.videos_table.setItem(row, 4, duration_item)
-            
-            # Дата загрузки
-            upload_date = video.get('upload_date', '')
-            if upload_date:
-                try:
-                    date = datetime.strptime(upload_date, '%Y%m%d')
-                    date_str = date.strftime('%d.%m.%Y')
-                except:
-                    date_str = upload_date
-            else:
-                date_str = 'Неизвестно'
-            date_item = QTableWidgetItem(date_str)
-            date_item.setTextAlignment(Qt.AlignmentFlag.AlignCenter)
-            self.videos_table.setItem(row, 5, date_item)
-            
-            # Кнопки действий
-            actions_widget = QWidget()
-            actions_layout = QHBoxLayout(actions_widget)
-            actions_layout.setContentsMargins(0, 0, 0, 0)
-            
-            info_button = QPushButton("ℹ️")
-            info_button.setToolTip("Информация")
-            info_button.clicked.connect(lambda _, u=video['url']: self.show_video_details(u))
-            
-            add_button = QPushButton("➕")
-            add_button.setToolTip("Добавить в очередь")
-            # Сохраняем URL как свойство кнопки
-            add_button._url = video['url']
-            add_button.clicked.connect(lambda _, u=video['url']: self.video_selected.emit(u))
-            
-            actions_layout.addWidget(info_button)
-            actions_layout.addWidget(add_button)
-            
-            self.videos_table.setCellWidget(row, 6, actions_widget)
+            self.fill_video_row(row, video)
+    
+    def fill_video_row(self, row, video):
+        # Чекбокс
+        checkbox = QCheckBox()
+        checkbox_widget = QWidget()
+        checkbox_layout = QHBoxLayout(checkbox_widget)
+        checkbox_layout.addWidget(checkbox)
+        checkbox_layout.setAlignment(Qt.AlignmentFlag.AlignCenter)
+        checkbox_layout.setContentsMargins(0, 0, 0, 0)
+        self.videos_table.setCellWidget(row, 0, checkbox_widget)
+        
+        # Превью
+        thumbnail_label = self.create_thumbnail_label(video.get('thumbnail'), video_key(video['url']))
+        self.videos_table.setCellWidget(row, 1, thumbnail_label)
+        
+        # Название
+        title_item = QTableWidgetItem(video['title'])
+        title_item.setToolTip(video['title'])
+        self.videos_table.setItem(row, 2, title_item)
+        
+        # Просмотры
+        views = QTableWidgetItem(f"{video['views']:,}".replace(',', ' '))
+        views.setTextAlignment(Qt.AlignmentFlag.AlignRight | Qt.AlignmentFlag.AlignVCenter)
+        self.videos_table.setItem(row, 3, views)
+        
+        # Длительность
+        duration = str(timedelta(seconds=video['duration'])).split('.')[0]
+        duration_item = QTableWidgetItem(duration)
+        duration_item.setTextAlignment(Qt.AlignmentFlag.AlignCenter)
+        self.videos_table.setItem(row, 4, duration_item)
+        
+        # Дата загрузки
+        upload_date = video.get('upload_date', '')
+        if upload_date:
+            try:
+                date = datetime.strptime(upload_date, '%Y%m%d')
+                date_str = date.strftime('%d.%m.%Y')
+            except:
+                date_str = upload_date
+        else:
+            date_str = 'Неизвестно'
+        date_item = QTableWidgetItem(date_str)
+        date_item.setTextAlignment(Qt.AlignmentFlag.AlignCenter)
+        self.videos_table.setItem(row, 5, date_item)
+        
+        # Кнопки действий
+        actions_widget = QWidget()
+        actions_layout = QHBoxLayout(actions_widget)
+        actions_layout.setContentsMargins(0, 0, 0, 0)
+        
+        info_button = QPushButton("ℹ️")
+        info_button.setToolTip("Информация")
+        info_button.clicked.connect(lambda _, u=video['url']: self.show_video_details(u))
+        
+        add_button = QPushButton("➕")
+        add_button.setToolTip("Добавить в очередь")
+        # Сохраняем URL как свойство кнопки
+        add_button._url = video['url']
+        add_button.clicked.connect(lambda _, u=video['url']: self.video_selected.emit(u))
+        
+        actions_layout.addWidget(info_button)
+        actions_layout.addWidget(add_button)
+        
+        self.videos_table.setCellWidget(row, 6, actions_widget)
     
     def select_all_videos(self):
         self.set_all_checkboxes(True)
@@ -1480,25 +1855,14 @@ class ChannelTab(QWidget):
         else:
             QMessageBox.warning(self, "Внимание", "Не выбрано ни одного видео")
     
-    def create_thumbnail_label(self, thumbnail_url):
-        """Создание виджета для превью"""
+    def create_thumbnail_label(self, thumbnail_url, video_id=None):
+        """Создание виджета для превью; изображение загружается асинхронно"""
         label = QLabel()
         label.setFixedSize(160, 90)
         label.setAlignment(Qt.AlignmentFlag.AlignCenter)
         label.setStyleSheet("background-color: #f0f0f0; border-radius: 4px;")
         
-        if thumbnail_url:
-            try:
-                response = requests.get(thumbnail_url)
-                pixmap = QPixmap()
-                pixmap.loadFromData(response.content)
-                pixmap = pixmap.scaled(160, 90, Qt.AspectRatioMode.KeepAspectRatio, 
-                                     Qt.TransformationMode.SmoothTransformation)
-                label.setPixmap(pixmap)
-            except:
-                label.setText("Нет превью")
-        else:
-            label.setText("Нет превью")
+        self.thumbnail_loader.add(label, thumbnail_url, video_id)
             
         return label
     
@@ -1523,4 +1887,5 @@ def main():
         sys.exit(1)
 
 if __name__ == "__main__":
+    multiprocessing.freeze_support()  # Рабочие процессы загрузок в собранном exe
     main() 
\ No newline at end of file
@@ -7,9 +7,12 @@ from PyQt6.QtWidgets import (
 )
 from PyQt6.QtCore import Qt, QThread, pyqtSignal, QMetaObject, Q_ARG
 from PyQt6.QtGui import QIcon
-from main import download_youtube_video, get_video_info, logger
+from main import find_existing_download, get_video_info, logger, bandwidth
+from job_engine import JobEngine, COMPLETED
 from vk_api import VkApi
+from youtube_id import video_key
 import logging
+import multiprocessing
 import os
 import json
 import traceback
@@ -91,7 +94,9 @@ class UploadWorker(QThread):
 class YouTubeVkDownloader(QMainWindow):
     def __init__(self):
         super().__init__()
-        self.vk_api = VkApi()
+        self.vk_api = VkApi(bandwidth)
+        # Скачивание идет в отдельном процессе и не тормозит интерфейс
+        self.job_engine = JobEngine(max_workers=1)
         self.downloaded_videos = {}  # Словарь для хранения информации о скачанных видео
         self.load_downloaded_videos()  # Загружаем историю скачиваний
         self.init_ui()
@@ -179,11 +184,18 @@ class YouTubeVkDownloader(QMainWindow):
                 
     def handle_download_complete(self, success, video_path, title):
         if success:
+            # Убираем из списка прежние записи того же видео
+            youtube_id = self.download_thread.video_id
+            for key in [key for key, info in self.downloaded_videos.items()
+                        if info.get('video_id') == youtube_id]:
+                del self.downloaded_videos[key]
+            
             # Сохраняем информацию о видео с оригинальным названием
             video_id = os.path.basename(os.path.dirname(video_path))
             self.downloaded_videos[video_id] = {
                 'title': title,  # Сохраняем оригинальное название
                 'path': video_path,
+                'video_id': youtube_id,
                 'uploaded_to_vk': False
             }
             self.save_downloaded_videos()
@@ -296,6 +308,12 @@ class YouTubeVkDownloader(QMainWindow):
             
         logger.info(f"Начинаем обработку URL: {url}")
         
+        # Не запускаем повторно скачивание того же видео (ссылки сравниваются по ID)
+        current = getattr(self, 'download_thread', None)
+        if current and current.isRunning() and current.video_id == video_key(url):
+            logger.warning(f"Это видео уже скачивается: {url}")
+            return
+        
         # Проверяем токен VK
         access_token = self.vk_api.get_current_token()
         if not access_token:
@@ -322,7 +340,7 @@ class YouTubeVkDownloader(QMainWindow):
         
         # Создаем и запускаем поток для загрузки
         try:
-            self.download_thread = DownloadThread(url)
+            self.download_thread = DownloadThread(url, self.job_engine)
             self.download_thread.progress.connect(self.update_progress)
             self.download_thread.finished.connect(self.handle_download_complete)
             self.download_thread.start()
@@ -374,42 +392,54 @@ class YouTubeVkDownloader(QMainWindow):
             logger.error(f"Ошибка при удалении видео: {str(e)}")
             QMessageBox.warning(self, 'Ошибка', f'Не удалось удалить видео: {str(e)}')
 
+    def closeEvent(self, event):
+        """Прерывание загрузки при закрытии: она останется в журнале для продолжения"""
+        self.job_engine.shutdown(wait=False, cancel_running=True)
+        event.accept()
+
 class DownloadThread(QThread):
     progress = pyqtSignal(str, float)
     finished = pyqtSignal(bool, str, str)
     
-    def __init__(self, url):
+    def __init__(self, url, job_engine):
         super().__init__()
         self.url = url
+        self.video_id = video_key(url)
+        self.job_engine = job_engine
+        self.job_id = None
+    
+    def on_job_event(self, event):
+        """Прогресс задачи из движка (вызывается в его фоновом потоке)"""
+        if event['job_id'] == self.job_id and event['event'] == 'progress' and event['percent'] is not None:
+            self.progress.emit(f"Скачивание: {event['percent']:.1f}%", event['percent'])
         
     def run(self):
         try:
-            # Получаем информацию о видео
-            logger.info(f"Начинаем получение информации о видео: {self.url}")
-            try:
-                info = get_video_info(self.url)
-                if not info:
-                    raise ValueError("Не удалось получить информацию о видео")
-                    
-                self.title = info.get('title', 'Без названия')  # Сохраняем оригинальное название
-                logger.info(f"Получена информация о видео: {self.title}")
-                
-            except Exception as e:
-                logger.error("Ошибка при получении информации о видео:", exc_info=True)
-                raise
+            # Файл из библиотеки используется без извлечения и скачивания
+            existing = find_existing_download(self.url)
+            if existing:
+                info = get_video_info(self.url) or {}
+                self.title = info.get('title', 'Без названия')
+                logger.info(f"Видео уже скачано, используем файл: {existing[0]}")
+                self.finished.emit(True, existing[0], self.title)
+                return
             
-            # Скачиваем видео с оригинальным названием
-            logger.info(f"Начинаем скачивание видео: {self.title}")
+            # Скачиваем видео в процессе движка задач, поток только ожидает результат
+            logger.info(f"Начинаем скачивание видео: {self.url}")
+            self.job_engine.subscribe(self.on_job_event)
             try:
-                video_path, thumb_path = download_youtube_video(self.url, title=self.title)  # Передаем название
-                if not video_path or not os.path.exists(video_path):
-                    raise ValueError(f"Видео не было скачано или файл не найден: {video_path}")
-                    
-                logger.info(f"Видео успешно скачано: {video_path}")
-                
-            except Exception as e:
-                logger.error("Ошибка при скачивании видео:", exc_info=True)
-                raise
+                self.job_id = self.job_engine.submit(self.url)
+                job = self.job_engine.wait(self.job_id)
+            finally:
+                self.job_engine.unsubscribe(self.on_job_event)
+            
+            if job['state'] != COMPLETED:
+                raise ValueError(job['error'] or "Загрузка отменена")
+            video_path = job['result']['video_path']
+            if not video_path or not os.path.exists(video_path):
+                raise ValueError(f"Видео не было скачано или файл не найден: {video_path}")
+            self.title = job['result']['title'] or 'Без названия'
+            logger.info(f"Видео успешно скачано: {video_path}")
             
             self.finished.emit(True, video_path, self.title)  # Передаем оригинальное название
             
@@ -436,4 +466,5 @@ def main():
         raise
 
 if __name__ == '__main__':
+    multiprocessing.freeze_support()  # Рабочие процессы загрузок в собранном exe
     main() 
\ No newline at end of file
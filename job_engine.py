@@ -0,0 +1,543 @@
+"""
+Движок задач загрузки, не зависящий от Qt
+
+Каждая загрузка выполняется в одном из рабочих процессов движка, поэтому
+работа yt-dlp на Python (выбор формата, учет фрагментов, разбор JSON) не
+конкурирует за GIL с интерфейсом. События задач (started, progress, downloaded,
+uploaded, completed, failed, cancelled) приходят из процессов через очередь и
+передаются подписчикам в фоновом потоке основного процесса.
+Используется обоими интерфейсами и командной строкой.
+"""
+import os
+import time
+import queue
+import signal
+import logging
+import threading
+import multiprocessing
+
+from yt_dlp.utils import DownloadCancelled
+
+from main import download_youtube_video, get_video_info, download_engine, bandwidth, db, OUTPUT_DIR
+from bandwidth import DIRECTIONS
+
+logger = logging.getLogger(__name__)
+
+# Состояния задачи
+QUEUED = 'queued'
+RUNNING = 'running'
+COMPLETED = 'completed'
+FAILED = 'failed'
+CANCELLED = 'cancelled'
+FINAL_STATES = (COMPLETED, FAILED, CANCELLED)
+
+# Как часто рабочий процесс отправляет прогресс и проверяет отмену, секунд
+PROGRESS_INTERVAL = 0.5
+# Как часто основной процесс проверяет рабочие процессы, секунд
+POLL_INTERVAL = 0.5
+# Через сколько секунд после запроса отмены рабочий процесс завершается принудительно
+CANCEL_TIMEOUT = 5.0
+
+# Общий массив управления рабочим процессом: причина отмены и доля полосы (0 - без ограничения)
+CONTROL_CANCEL = 0
+CONTROL_RATES = {'ingress': 1, 'egress': 2}
+CANCEL_REASONS = {1: 'cancel', 2: 'interrupt'}
+
+class JobCancelled(DownloadCancelled):
+    """Отмена задачи из основного процесса (yt-dlp пропускает это исключение наружу)"""
+
+def upload_to_vk(video_path, title, scheduler=None):
+    """Загрузка видео в VK с сохраненным токеном; возвращает ссылку на видео"""
+    from vk_api import VkApi
+    vk_api = VkApi(scheduler)
+    access_token = vk_api.get_current_token()
+    if not access_token:
+        raise ValueError("Нет действующего токена VK")
+    result = vk_api.upload_video(
+        access_token=access_token,
+        video_path=video_path,
+        title=title,
+        is_private=0,
+        group_id=vk_api.group_id
+    )
+    owner_id, video_id = result.get('owner_id'), result.get('video_id')
+    if not (owner_id and video_id):
+        raise ValueError("Не получены owner_id или video_id")
+    return f"https://vk.com/video{owner_id}_{video_id}"
+
+# --- Рабочий процесс ---
+
+_events = None        # Очередь событий в основной процесс
+_control = None       # Массив управления этого процесса (см. CONTROL_*)
+_current_job = None   # Выполняемая задача
+_terminating = False  # Процесс завершается по SIGTERM не от движка
+
+def _ignore_sigint():
+    # Ctrl+C в консоли получает вся группа процессов; задачи прерывает основной процесс
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+def _on_sigterm(signum, frame):
+    """
+    SIGTERM прерывает задачу в любом месте: в скачивании внешним загрузчиком,
+    ffmpeg или загрузке в VK (дочерние процессы yt-dlp завершает сам)
+    """
+    global _terminating
+    if _current_job is None:
+        raise SystemExit(0)
+    code = int(_control[CONTROL_CANCEL])
+    if not code:
+        # Не отмена от движка, например, завершение основного процесса
+        _terminating = True
+    raise JobCancelled(CANCEL_REASONS.get(code, 'interrupt'))
+
+def _console_handlers():
+    return [handler for handler in logging.getLogger().handlers if type(handler) is logging.StreamHandler]
+
+def _worker_main(tasks, events, control, console_level):
+    """Цикл рабочего процесса: задачи приходят по каналу tasks, None - завершение"""
+    global _events, _control
+    _ignore_sigint()
+    if os.name != 'nt':
+        signal.signal(signal.SIGTERM, _on_sigterm)
+    # Журнал в консоли с тем же уровнем, что и в основном процессе (например, cli.py без -v)
+    for handler in _console_handlers():
+        handler.setLevel(console_level)
+    _events = events
+    _control = control
+    # Лимиты полосы назначает основной процесс; свои профили из config не действуют
+    bandwidth.set_profiles([])
+
+    while not _terminating:
+        try:
+            task = tasks.recv()
+        except EOFError:
+            break
+        if task is None:
+            break
+        try:
+            _run_job(*task)
+        except JobCancelled:
+            pass  # Сигнал пришел, когда итог задачи уже отправлен
+
+class _WorkerHook:
+    """Хук прогресса yt-dlp в рабочем процессе: прогресс, отмена и доля полосы"""
+    def __init__(self, job_id):
+        self.job_id = job_id
+        self._last = 0.0
+        self._rates = None
+
+    def sync(self):
+        """Проверка отмены и применение доли полосы, назначенной основным процессом"""
+        code = int(_control[CONTROL_CANCEL])
+        if code:
+            raise JobCancelled(CANCEL_REASONS.get(code, 'cancel'))
+        rates = {direction: _control[index] or None for direction, index in CONTROL_RATES.items()}
+        if rates != self._rates:
+            self._rates = rates
+            bandwidth.set_caps(**rates)
+
+    def __call__(self, d):
+        if d.get('status') != 'downloading':
+            return
+        now = time.monotonic()
+        if now - self._last < PROGRESS_INTERVAL:
+            return
+        self._last = now
+        self.sync()
+        downloaded = d.get('downloaded_bytes') or 0
+        total = d.get('total_bytes') or d.get('total_bytes_estimate')
+        _events.put({
+            'job_id': self.job_id,
+            'event': 'progress',
+            'downloaded_bytes': downloaded,
+            'total_bytes': total,
+            'percent': round(downloaded * 100 / total, 1) if total else None,
+            'speed': d.get('speed'),
+            'eta': d.get('eta'),
+        })
+
+def _send(event):
+    """Событие в основной процесс после записи БД: он читает результат сразу"""
+    db.flush()
+    _events.put(event)
+
+def _run_job(job_id, url, options):
+    """Выполнение задачи в рабочем процессе; итог передается событием"""
+    global _current_job
+    _current_job = job_id
+    hook = _WorkerHook(job_id)
+    stage = 'download'
+    try:
+        _events.put({'job_id': job_id, 'event': 'started', 'pid': os.getpid()})
+        # Доля полосы известна до начала: внешний загрузчик получает ее при запуске
+        hook.sync()
+        video_path, thumbnail_path = download_youtube_video(
+            url,
+            output_dir=options.get('output_dir') or OUTPUT_DIR,
+            format_id=options.get('format_id'),
+            engine_overrides=options.get('engine_overrides'),
+            reuse_existing=options.get('reuse_existing', True),
+            progress_hooks=[hook],
+        )
+        info = get_video_info(url) or {}
+        result = {
+            'video_path': video_path,
+            'thumbnail_path': thumbnail_path,
+            'title': info.get('title') or os.path.splitext(os.path.basename(video_path))[0],
+        }
+        _send({'job_id': job_id, 'event': 'downloaded', **result})
+
+        if options.get('upload_vk'):
+            stage = 'upload'
+            hook.sync()
+            result['vk_url'] = upload_to_vk(video_path, result['title'], bandwidth)
+            _events.put({'job_id': job_id, 'event': 'uploaded', 'vk_url': result['vk_url']})
+
+        _current_job = None
+        _send({'job_id': job_id, 'event': COMPLETED, 'result': result})
+
+    except JobCancelled as e:
+        _current_job = None
+        # При закрытии приложения загрузка остается в журнале для продолжения
+        if str(e) == 'interrupt':
+            db.requeue_jobs(url)
+        else:
+            db.cancel_jobs(url)
+        _send({'job_id': job_id, 'event': CANCELLED})
+    except Exception as e:
+        _current_job = None
+        _send({'job_id': job_id, 'event': FAILED, 'stage': stage, 'error': str(e)})
+    finally:
+        _current_job = None
+
+# --- Основной процесс ---
+
+class _Worker:
+    """Рабочий процесс движка и задача, которую он выполняет"""
+    def __init__(self, context, events, console_level):
+        self.tasks, child_tasks = context.Pipe(duplex=False)[::-1]
+        self.control = context.Array('d', 1 + len(CONTROL_RATES))
+        self.process = context.Process(
+            target=_worker_main,
+            args=(child_tasks, events, self.control, console_level),
+            name='job-engine-worker',
+            daemon=True,
+        )
+        self.process.start()
+        child_tasks.close()
+        self.job_id = None
+        self.kill_at = None  # Время принудительного завершения после запроса отмены
+
+    def send(self, task):
+        try:
+            self.tasks.send(task)
+        except (OSError, ValueError):
+            pass  # Процесс уже завершился
+
+class JobEngine:
+    """
+    Очередь загрузок в рабочих процессах
+    submit() ставит задачу и возвращает ее номер, cancel() отменяет,
+    status() возвращает состояние, wait() ожидает завершения. Подписчики
+    (subscribe) получают события задач в фоновом потоке - интерфейс должен
+    сам передать их в свой поток (например, сигналом Qt).
+    Процессы переиспользуются между задачами; процесс, не завершивший
+    отмененную задачу за CANCEL_TIMEOUT, завершается и заменяется новым.
+    Общие лимиты полосы делятся между выполняемыми задачами по весам
+    (bandwidth_weight) и передаются в рабочие процессы
+    """
+    def __init__(self, max_workers=3, scheduler=bandwidth):
+        self.max_workers = max_workers
+        self.scheduler = scheduler
+        # spawn: одинаково в Windows и Linux и без копирования потоков основного процесса
+        self._context = multiprocessing.get_context('spawn')
+        self._lock = threading.Lock()
+        self._jobs = {}
+        self._done = {}
+        self._queue = []
+        self._workers = []
+        self._subscribers = []
+        self._next_id = 0
+        self._events = None
+        self._listener = None
+        self._closed = False
+
+    def _ensure_started(self):
+        """Запуск потока событий при первой задаче (процессы запускаются по мере надобности)"""
+        if self._events:
+            return
+        self._events = self._context.Queue()
+        self._listener = threading.Thread(target=self._listen, name='job-engine-events', daemon=True)
+        self._listener.start()
+
+    def subscribe(self, callback):
+        """callback(event: dict) вызывается для каждого события любой задачи"""
+        self._subscribers.append(callback)
+
+    def unsubscribe(self, callback):
+        if callback in self._subscribers:
+            self._subscribers.remove(callback)
+
+    def submit(self, url, output_dir=None, format_id=None, engine_overrides=None,
+               reuse_existing=True, upload_vk=False):
+        """Постановка загрузки в очередь; возвращает номер задачи"""
+        if self._closed:
+            raise RuntimeError("Движок задач остановлен")
+        options = {
+            'output_dir': output_dir,
+            'format_id': format_id,
+            'engine_overrides': engine_overrides,
+            'reuse_existing': reuse_existing,
+            'upload_vk': upload_vk,
+        }
+        with self._lock:
+            self._ensure_started()
+            self._next_id += 1
+            job_id = self._next_id
+            self._jobs[job_id] = {
+                'job_id': job_id,
+                'url': url,
+                'state': QUEUED,
+                # Как в BandwidthScheduler.register: нулевой вес не исключает задачу из деления
+                'weight': max(float(download_engine.resolve(engine_overrides)['bandwidth_weight']), 0.01),
+                'options': options,
+                'progress': None,
+                'result': None,
+                'error': None,
+            }
+            self._done[job_id] = threading.Event()
+            self._queue.append(job_id)
+            self._dispatch()
+        return job_id
+
+    def _dispatch(self):
+        """Передача задач из очереди свободным процессам (под self._lock)"""
+        while self._queue and not self._closed:
+            worker = next((w for w in self._workers if w.job_id is None and w.process.is_alive()), None)
+            if worker is None:
+                if len(self._workers) >= self.max_workers:
+                    return
+                level = min((handler.level for handler in _console_handlers()), default=logging.NOTSET)
+                worker = _Worker(self._context, self._events, level)
+                self._workers.append(worker)
+                logger.debug(f"Запущен процесс загрузки: {worker.process.pid}")
+
+            job = self._jobs[self._queue.pop(0)]
+            job['state'] = RUNNING
+            worker.job_id = job['job_id']
+            worker.kill_at = None
+            worker.control[CONTROL_CANCEL] = 0
+            # Доля полосы назначается до отправки задачи
+            self._rebalance_locked(self.scheduler.caps() if self.scheduler else None)
+            worker.send((job['job_id'], job['url'], job['options']))
+
+    def cancel(self, job_id, interrupt=False):
+        """
+        Отмена задачи: ожидающая снимается сразу, выполняемая прерывается
+        сигналом (в Windows - при следующем событии прогресса), а через
+        CANCEL_TIMEOUT ее процесс завершается принудительно.
+        interrupt=True (закрытие приложения) оставляет загрузку в журнале для продолжения
+        """
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if not job or job['state'] in FINAL_STATES:
+                return False
+            queued = job_id in self._queue
+            if queued:
+                self._queue.remove(job_id)
+            else:
+                worker = self._worker_for(job_id)
+                if worker is None:
+                    # Процесс уже завершился: итог задачи выставит _check_workers
+                    return False
+                worker.control[CONTROL_CANCEL] = 2 if interrupt else 1
+                worker.kill_at = time.monotonic() + CANCEL_TIMEOUT
+                if os.name != 'nt':
+                    try:
+                        os.kill(worker.process.pid, signal.SIGTERM)
+                    except OSError:
+                        pass
+        if queued:
+            # Задача не начиналась: журнал обновляем здесь
+            if not interrupt:
+                db.cancel_jobs(job['url'])
+            self._handle({'job_id': job_id, 'event': CANCELLED})
+        return True
+
+    def _worker_for(self, job_id):
+        return next((worker for worker in self._workers if worker.job_id == job_id), None)
+
+    def status(self, job_id=None):
+        """Состояние задачи (или всех задач): state, progress, result, error"""
+        def public(job):
+            return {key: value for key, value in job.items() if key != 'options'}
+        with self._lock:
+            if job_id is not None:
+                job = self._jobs.get(job_id)
+                return public(job) if job else None
+            return {job_id: public(job) for job_id, job in self._jobs.items()}
+
+    def wait(self, job_id, timeout=None):
+        """Ожидание завершения задачи; возвращает ее состояние"""
+        self._done[job_id].wait(timeout)
+        return self.status(job_id)
+
+    def active_count(self):
+        with self._lock:
+            return sum(job['state'] not in FINAL_STATES for job in self._jobs.values())
+
+    def _listen(self):
+        last_check = time.monotonic()
+        while True:
+            try:
+                event = self._events.get(timeout=POLL_INTERVAL)
+            except queue.Empty:
+                event = False
+            except (EOFError, OSError):
+                break
+            if event is None:
+                break
+            if event:
+                self._handle(event)
+            if time.monotonic() - last_check >= POLL_INTERVAL:
+                last_check = time.monotonic()
+                self._check_workers()
+                # Смена профиля полосы по времени суток
+                self._rebalance()
+
+    def _check_workers(self):
+        """Процессы, завершившиеся без итога задачи, и просроченные отмены"""
+        lost = []
+        with self._lock:
+            for worker in list(self._workers):
+                if not worker.process.is_alive():
+                    self._workers.remove(worker)
+                    if worker.job_id is not None:
+                        lost.append((worker.job_id, int(worker.control[CONTROL_CANCEL]), worker.process.exitcode))
+                elif worker.kill_at and time.monotonic() > worker.kill_at:
+                    logger.warning(f"Процесс загрузки {worker.process.pid} не завершил задачу после отмены, "
+                                   f"завершаем принудительно")
+                    worker.kill_at = None
+                    worker.process.kill()
+
+        if lost:
+            # Итог, отправленный процессом перед выходом, уже в очереди
+            while True:
+                try:
+                    event = self._events.get_nowait()
+                except (queue.Empty, EOFError, OSError):
+                    break
+                if event is None:
+                    # Сигнал остановки оставляем потоку событий
+                    self._events.put(None)
+                    break
+                self._handle(event)
+        for job_id, code, exitcode in lost:
+            url = self._jobs[job_id]['url']
+            if code:
+                if CANCEL_REASONS[code] == 'interrupt':
+                    db.requeue_jobs(url)
+                else:
+                    db.cancel_jobs(url)
+                self._handle({'job_id': job_id, 'event': CANCELLED})
+            else:
+                self._handle({'job_id': job_id, 'event': FAILED, 'stage': 'download',
+                              'error': f"Процесс загрузки завершился аварийно (код {exitcode})"})
+        if lost:
+            with self._lock:
+                self._dispatch()
+
+    def _handle(self, event):
+        job_id = event['job_id']
+        kind = event['event']
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if not job or job['state'] in FINAL_STATES:
+                return
+            if kind == 'progress':
+                job['progress'] = {key: event[key] for key in
+                                   ('downloaded_bytes', 'total_bytes', 'percent', 'speed', 'eta')}
+            elif kind == 'downloaded':
+                job['result'] = {key: event[key] for key in ('video_path', 'thumbnail_path', 'title')}
+            elif kind == COMPLETED:
+                job['state'] = COMPLETED
+                job['result'] = event['result']
+            elif kind in (FAILED, CANCELLED):
+                job['state'] = kind
+                job['error'] = event.get('error')
+            event = {**event, 'url': job['url'], 'state': job['state']}
+            final = job['state'] in FINAL_STATES
+            if final:
+                worker = self._worker_for(job_id)
+                if worker:
+                    worker.job_id = None
+                    worker.kill_at = None
+                    worker.control[CONTROL_CANCEL] = 0
+                self._dispatch()
+                self._rebalance_locked(self.scheduler.caps() if self.scheduler else None)
+
+        for callback in list(self._subscribers):
+            try:
+                callback(event)
+            except Exception as e:
+                logger.error(f"Ошибка в обработчике события задачи: {str(e)}")
+        if final:
+            self._done[job_id].set()
+
+    def _rebalance(self):
+        """Деление общих лимитов полосы между выполняемыми задачами по весам"""
+        if not self.scheduler:
+            return
+        caps = self.scheduler.caps()
+        with self._lock:
+            self._rebalance_locked(caps)
+
+    def _rebalance_locked(self, caps):
+        if not caps:
+            return
+        busy = [(worker, self._jobs[worker.job_id]) for worker in self._workers if worker.job_id is not None]
+        total_weight = sum(job['weight'] for _, job in busy)
+        for worker, job in busy:
+            rates = {
+                direction: caps[direction] * job['weight'] / total_weight if caps[direction] else None
+                for direction in DIRECTIONS
+            }
+            job['rates'] = rates
+            for direction, index in CONTROL_RATES.items():
+                worker.control[index] = rates[direction] or 0
+
+    def shutdown(self, wait=True, cancel_running=False):
+        """
+        Остановка движка; ожидающие задачи снимаются. cancel_running прерывает
+        выполняемые загрузки (они останутся в журнале для продолжения).
+        wait=False не блокирует вызывающий поток (закрытие окна): процессы
+        завершатся сами после прерванной задачи
+        """
+        if not self._events:
+            self._closed = True
+            return
+        with self._lock:
+            queued = list(self._queue)
+            running = [worker.job_id for worker in self._workers if worker.job_id is not None]
+        for job_id in queued:
+            self.cancel(job_id, interrupt=True)
+        if cancel_running:
+            for job_id in running:
+                self.cancel(job_id, interrupt=True)
+        with self._lock:
+            self._closed = True
+            workers = list(self._workers)
+        for worker in workers:
+            worker.send(None)
+
+        if wait:
+            for worker in workers:
+                worker.process.join(CANCEL_TIMEOUT if cancel_running else None)
+                if worker.process.is_alive():
+                    worker.process.kill()
+                    worker.process.join()
+            self._events.put(None)
+            self._listener.join()
+            # Итог задач, процессы которых завершены принудительно
+            self._check_workers()
+        logger.debug("Процессы загрузки остановлены")
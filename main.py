@@ -1,14 +1,32 @@
 import os
+import sys
 import logging
 import traceback
-import requests
 import subprocess
 from typing import Optional, Tuple
 from yt_dlp import YoutubeDL
+from yt_dlp.postprocessor import FFmpegVideoConvertorPP, FFmpegVideoRemuxerPP, PostProcessor
 from config import *
+import config
 import time
 import random
+import copy
+import threading
+from functools import lru_cache
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from database import VideoDatabase
+from ytdl_pool import YoutubeDLPool
+from youtube_id import canonical_url
+from content_filter import ContentFilter, FilterRule
+from download_engine import DownloadEngine
+from bandwidth import BandwidthScheduler
+from thumbnail_cache import ThumbnailCache
+
+if __name__ == '__mp_main__':
+    # Рабочий процесс движка задач при запуске python main.py загружает этот файл
+    # как __mp_main__; без псевдонима import main создал бы второй экземпляр модуля
+    # (еще одна запись в БД, прогрев yt-dlp и кэш миниатюр)
+    sys.modules['main'] = sys.modules[__name__]
 
 # Настройка логирования
 logging.basicConfig(
@@ -22,7 +40,32 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 # В начале файла добавим инициализацию БД
-db = VideoDatabase()
+# Запись в БД выполняется отдельным потоком, чтобы потоки yt-dlp не ждали fsync
+db = VideoDatabase(write_behind=True)
+
+# Фоновое обновление устаревшего кэша информации о видео
+_refresh_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix='video-info-refresh')
+_refreshing = {}  # URL -> Future выполняемого обновления
+_refreshing_lock = threading.Lock()
+
+# Пул экземпляров yt-dlp с общим постоянным кэшем; прогреваем его в фоне
+ytdl_pool = YoutubeDLPool()
+ytdl_pool.warm_async(['metadata'])
+
+# Количество параллельных запросов информации о видео при загрузке канала
+CHANNEL_HYDRATION_WORKERS = 8
+
+# Настройки движка загрузки; в config.py можно задать словарь DOWNLOAD_ENGINE
+download_engine = DownloadEngine(getattr(config, 'DOWNLOAD_ENGINE', None))
+
+# Общие лимиты полосы для загрузок и выгрузки в VK; в config.py можно задать словарь BANDWIDTH
+bandwidth = BandwidthScheduler(getattr(config, 'BANDWIDTH', None))
+
+# Правила фильтрации результатов (маркеры региона и т.п.) из filters.json
+content_filter = ContentFilter.from_file()
+
+# Общий кэш превью для загрузчика и интерфейса
+thumbnail_cache = ThumbnailCache()
 
 def check_ffmpeg():
     """Проверка и установка ffmpeg"""
@@ -34,12 +77,10 @@ def check_ffmpeg():
         logger.info("ffmpeg не найден")
         return False
 
-def download_thumbnail(url: str, output_dir: str, video_title: str = None) -> Optional[str]:
-    """Скачивание превью видео"""
+def download_thumbnail(url: str, output_dir: str, video_title: str = None,
+                       video_id: str = None) -> Optional[str]:
+    """Сохранение превью видео в папку (через общий кэш превью)"""
     try:
-        response = requests.get(url)
-        response.raise_for_status()
-        
         # Создаем уникальное имя файла из названия видео или timestamp
         if video_title:
             safe_title = "".join(c for c in video_title if c.isalnum() or c in (' ', '-', '_')).rstrip()
@@ -49,8 +90,9 @@ def download_thumbnail(url: str, output_dir: str, video_title: str = None) -> Op
             
         thumbnail_path = os.path.join(output_dir, thumbnail_name)
         
-        with open(thumbnail_path, 'wb') as f:
-            f.write(response.content)
+        if not thumbnail_cache.copy_to(url, thumbnail_path, video_id):
+            logger.error(f"Превью недоступно: {url}")
+            return None
             
         logger.debug(f"Превью сохранено: {thumbnail_path}")
         return thumbnail_path
@@ -67,18 +109,13 @@ def download_only_thumbnail(url: str, output_dir: str = OUTPUT_DIR) -> Optional[
         if not os.path.exists(output_dir):
             os.makedirs(output_dir)
         
-        ydl_opts = {
-            'quiet': True,
-            'no_warnings': True,
-        }
-        
-        with YoutubeDL(ydl_opts) as ydl:
+        with ytdl_pool.acquire('metadata') as ydl:
             info = ydl.extract_info(url, download=False)
             thumbnail_url = info.get('thumbnail')
             title = info.get('title', '')
             
             if thumbnail_url:
-                return download_thumbnail(thumbnail_url, output_dir, title)
+                return download_thumbnail(thumbnail_url, output_dir, title, info.get('id'))
             else:
                 logger.error("Превью не найдено")
                 return None
@@ -96,101 +133,306 @@ def check_video_has_audio(formats: list) -> bool:
 def get_available_formats(url: str) -> list:
     """Получение списка доступных форматов видео"""
     logger.debug(f"Получение форматов для видео: {url}")
+    url = canonical_url(url)
     try:
-        ydl_opts = {
-            'quiet': True,
-            'no_warnings': True,
-        }
+        # Список форматов берем из БД; URL потоков все равно заново
+        # получаются при скачивании, поэтому их устаревание не мешает
+        available = db.get_formats(url)
+        if available is None:
+            logger.debug("Форматов нет в кэше, получаем информацию о видео")
+            info = _fetch_video_info(url)
+            available = [db.normalize_format(f) for f in info.get('formats', [])]
+        else:
+            logger.debug("Список форматов получен из кэша")
         
-        with YoutubeDL(ydl_opts) as ydl:
-            info = ydl.extract_info(url, download=False)
-            formats = []
-            
-            # Получаем лучший аудио формат
-            best_audio = None
-            for f in info.get('formats', []):
-                if f.get('vcodec', '') == 'none' and f.get('acodec', 'none') != 'none':
-                    if best_audio is None or f.get('filesize', 0) > best_audio.get('filesize', 0):
-                        best_audio = f
-            
-            # Фильтруем и группируем форматы
-            for f in info.get('formats', []):
-                # Пропускаем аудио-форматы
-                if f.get('vcodec', '') == 'none':
-                    continue
-                    
-                format_id = f.get('format_id', '')
-                ext = f.get('ext', '')
-                resolution = f.get('resolution', 'unknown')
-                filesize = f.get('filesize', 0)
-                filesize_mb = filesize / (1024 * 1024) if filesize else 0
-                has_audio = f.get('acodec', 'none') != 'none'
+        formats = []
+        
+        # Получаем лучший аудио формат
+        best_audio = None
+        for f in available:
+            if f['vcodec'] == 'none' and f['acodec'] != 'none':
+                if best_audio is None or f['filesize'] > best_audio['filesize']:
+                    best_audio = f
+        
+        # Фильтруем и группируем форматы
+        for f in available:
+            # Пропускаем аудио-форматы
+            if f['vcodec'] == 'none':
+                continue
                 
-                # Если формат без звука и есть лучший аудио формат, создаем комбинированный формат
-                if not has_audio and best_audio:
-                    combined_format_id = f"{format_id}+{best_audio['format_id']}"
-                    combined_filesize = filesize + best_audio.get('filesize', 0)
-                    combined_filesize_mb = combined_filesize / (1024 * 1024) if combined_filesize else 0
-                    
-                    format_str = f"{resolution} ({ext}) + 🔊"
-                    if combined_filesize_mb > 0:
-                        format_str += f" - {combined_filesize_mb:.1f}MB"
-                    
-                    formats.append({
-                        'format_id': combined_format_id,
-                        'ext': ext,
-                        'resolution': resolution,
-                        'filesize': combined_filesize,
-                        'has_audio': True,
-                        'display': format_str
-                    })
+            format_id = f['format_id']
+            ext = f['ext']
+            resolution = f['resolution']
+            filesize = f['filesize']
+            filesize_mb = filesize / (1024 * 1024) if filesize else 0
+            has_audio = f['acodec'] != 'none'
+            
+            # Если формат без звука и есть лучший аудио формат, создаем комбинированный формат
+            if not has_audio and best_audio:
+                combined_format_id = f"{format_id}+{best_audio['format_id']}"
+                combined_filesize = filesize + best_audio['filesize']
+                combined_filesize_mb = combined_filesize / (1024 * 1024) if combined_filesize else 0
                 
-                # Добавляем оригинальный формат
-                format_str = f"{resolution} ({ext})"
-                if filesize_mb > 0:
-                    format_str += f" - {filesize_mb:.1f}MB"
-                if has_audio:
-                    format_str += " 🔊"
-                else:
-                    format_str += " 🔇"
+                format_str = f"{resolution} ({ext}) + 🔊"
+                if combined_filesize_mb > 0:
+                    format_str += f" - {combined_filesize_mb:.1f}MB"
                 
                 formats.append({
-                    'format_id': format_id,
+                    'format_id': combined_format_id,
                     'ext': ext,
                     'resolution': resolution,
-                    'filesize': filesize,
-                    'has_audio': has_audio,
+                    'filesize': combined_filesize,
+                    'has_audio': True,
                     'display': format_str
                 })
             
-            # Сортируем по качеству и размеру
-            def sort_key(x):
-                # Извлекаем числовое значение разрешения (например, из "1920x1080" получаем 1080)
-                res = x['resolution']
-                height = int(res.split('x')[1]) if 'x' in res else 0
-                return (x['has_audio'], height, x['filesize'] if x['filesize'] else 0)
-            
-            formats.sort(key=sort_key, reverse=True)
+            # Добавляем оригинальный формат
+            format_str = f"{resolution} ({ext})"
+            if filesize_mb > 0:
+                format_str += f" - {filesize_mb:.1f}MB"
+            if has_audio:
+                format_str += " 🔊"
+            else:
+                format_str += " 🔇"
             
-            return formats
+            formats.append({
+                'format_id': format_id,
+                'ext': ext,
+                'resolution': resolution,
+                'filesize': filesize,
+                'has_audio': has_audio,
+                'display': format_str
+            })
+        
+        # Сортируем по качеству и размеру
+        def sort_key(x):
+            # Извлекаем числовое значение разрешения (например, из "1920x1080" получаем 1080)
+            res = x['resolution']
+            height = int(res.split('x')[1]) if 'x' in res else 0
+            return (x['has_audio'], height, x['filesize'] if x['filesize'] else 0)
+        
+        formats.sort(key=sort_key, reverse=True)
+        
+        return formats
             
     except Exception as e:
         logger.error(f"Ошибка при получении форматов: {str(e)}")
         raise
 
-def download_youtube_video(url: str, output_dir: str = OUTPUT_DIR, title: str = None) -> Tuple[str, Optional[str]]:
+# Формат по умолчанию: Full HD, а если его нет - максимальное качество.
+# Запасной вариант выбирается из того же списка форматов без повторного извлечения;
+# H.264 + AAC предпочитаются, т.к. собираются в MP4 без перекодирования
+DEFAULT_DOWNLOAD_FORMAT = (
+    'bestvideo[height=1080][vcodec^=avc1]+bestaudio[ext=m4a]/'
+    'bestvideo[height=1080][ext=mp4]+bestaudio[ext=m4a]/best[height=1080][ext=mp4]/'
+    'bestvideo[vcodec^=avc1]+bestaudio[ext=m4a]/'
+    'bestvideo[ext=mp4]+bestaudio[ext=m4a]/best[ext=mp4]/best'
+)
+# Кодеки, которые переносятся в MP4 копированием потоков (-c copy)
+MP4_COPY_VCODECS = ('avc1', 'avc3', 'h264', 'hev1', 'hvc1', 'h265', 'av01')
+MP4_COPY_ACODECS = ('mp4a', 'aac', 'mp3', 'none')
+# Подписанные ссылки на потоки YouTube живут около 6 часов; берем запас
+STREAM_URL_MAX_AGE = 3 * 60 * 60
+
+def _has_fresh_streams(info: Optional[dict]) -> bool:
+    """Информация yt-dlp со ссылками на потоки, которые еще действуют"""
+    return bool(info and info.get('formats') and time.time() - info.get('epoch', 0) < STREAM_URL_MAX_AGE)
+
+def _resolve_download_info(url: str, info: dict = None) -> dict:
+    """
+    Полная информация о видео с действующими ссылками на потоки
+    Переданный info используется повторно, если он получен из yt-dlp недавно;
+    иначе - результат фонового обновления того же видео, если оно идет или уже сохранено
+    """
+    if _has_fresh_streams(info):
+        logger.debug("Используем ранее полученную информацию о видео")
+        return info
+
+    # Устаревший кэш уже обновляется в фоне (get_video_info): ждем его вместо второго извлечения
+    with _refreshing_lock:
+        refresh = _refreshing.get(url)
+    if refresh:
+        logger.debug("Ожидаем фоновое обновление информации о видео")
+        info = refresh.result()
+        if _has_fresh_streams(info):
+            return info
+
+    # Обновление могло завершиться в другом процессе (например, в интерфейсе до запуска задачи)
+    info = db.get_video(url, full=True)
+    if _has_fresh_streams(info):
+        logger.debug("Используем недавно полученную информацию о видео из БД")
+        return info
+
+    logger.debug("Получаем информацию о видео для скачивания")
+    return _fetch_video_info(url)
+
+def _unselected_info(info: dict) -> dict:
+    """
+    Копия info без результата прежнего выбора формата
+    extract_info уже выбрал формат по профилю получения информации: requested_formats,
+    format_id, ext и другие поля выбранного формата перенесены в корень словаря.
+    Если их оставить, process_ie_result скачает прежние потоки, даже когда
+    новый селектор выберет один формат
+    """
+    info = YoutubeDL.sanitize_info(copy.deepcopy(info), remove_private_keys=True)
+    format_keys = {key for fmt in info.get('formats') or [] for key in fmt}
+    for key in format_keys | {'format', 'requested_subtitles'}:
+        info.pop(key, None)
+    return info
+
+def _ensure_mp4(ydl: YoutubeDL, info: dict) -> dict:
+    """
+    Приведение скачанного файла к MP4
+    Если кодеки подходят для MP4, файл только перепаковывается (FFmpegVideoRemuxer),
+    иначе перекодируется с пресетом и числом потоков из настроек загрузчика
+    """
+    # yt-dlp удаляет из requested_downloads поля, совпадающие с основным словарем
+    # (в том числе ext), поэтому постпроцессору передается их объединение
+    downloaded = {**info, **(info.get('requested_downloads') or [{}])[0]}
+    filepath = downloaded.get('filepath') or downloaded.get('_filename')
+    if filepath:
+        downloaded['ext'] = os.path.splitext(filepath)[1][1:]
+    if downloaded.get('ext') == 'mp4':
+        return downloaded
+    
+    vcodec = (downloaded.get('vcodec') or 'none').lower()
+    acodec = (downloaded.get('acodec') or 'none').lower()
+    if vcodec.startswith(MP4_COPY_VCODECS) and acodec.startswith(MP4_COPY_ACODECS):
+        logger.info(f"Перепаковка в MP4 без перекодирования ({vcodec}, {acodec})")
+        postprocessor = FFmpegVideoRemuxerPP(ydl, preferedformat='mp4')
+    else:
+        logger.info(f"Кодеки несовместимы с MP4 ({vcodec}, {acodec}), перекодирование")
+        postprocessor = FFmpegVideoConvertorPP(ydl, preferedformat='mp4')
+    return ydl.run_pp(postprocessor, downloaded)
+
+# Как часто сохранять прогресс загрузки в журнал (в секундах)
+JOURNAL_PROGRESS_INTERVAL = 1.0
+
+class JournalPP(PostProcessor):
+    """Запись выбранного формата в журнал загрузок перед началом скачивания"""
+    def __init__(self, job_id, downloader=None):
+        super().__init__(downloader)
+        self.job_id = job_id
+    
+    def run(self, info):
+        db.update_job(self.job_id, state='downloading', selected_format=info.get('format_id'))
+        return [], info
+
+def _journal_progress_hook(job_id: int):
+    """Хук прогресса yt-dlp, периодически сохраняющий прогресс в журнал загрузок"""
+    last_saved = 0
+    
+    def hook(d):
+        nonlocal last_saved
+        if d['status'] != 'downloading' or time.time() - last_saved < JOURNAL_PROGRESS_INTERVAL:
+            return
+        last_saved = time.time()
+        db.update_job(
+            job_id,
+            downloaded_bytes=d.get('downloaded_bytes'),
+            total_bytes=d.get('total_bytes') or d.get('total_bytes_estimate'),
+            fragment_index=d.get('fragment_index'),
+            fragment_count=d.get('fragment_count'),
+        )
+    
+    return hook
+
+THUMBNAIL_EXTENSIONS = ('.jpg', '.png', '.webp')
+
+def _inside_dir(path: str, directory: str) -> bool:
+    """Находится ли path внутри directory"""
+    try:
+        directory = os.path.abspath(directory)
+        return os.path.commonpath([os.path.abspath(path), directory]) == directory
+    except ValueError:
+        # Разные диски в Windows
+        return False
+
+def find_existing_download(url: str, output_dir: str = OUTPUT_DIR) -> Optional[Tuple[str, Optional[str]]]:
+    """
+    Уже скачанное видео из библиотеки: (путь к видео, путь к превью) или None
+    Файл должен существовать и не измениться после скачивания. Если он лежит
+    вне output_dir, там создается жесткая ссылка на него вместо повторной загрузки;
+    если ссылку создать нельзя (другой диск, FAT), возвращается исходный путь
+    """
+    video_path = db.get_downloaded_file(url)
+    if not video_path:
+        return None
+    
+    video_dir = os.path.dirname(video_path)
+    thumbnails = sorted(f for f in os.listdir(video_dir) if f.endswith(THUMBNAIL_EXTENSIONS))
+    thumbnail_path = os.path.join(video_dir, thumbnails[0]) if thumbnails else None
+    
+    if _inside_dir(video_path, output_dir):
+        return video_path, thumbnail_path
+    
+    link_dir = os.path.join(output_dir, os.path.basename(video_dir))
+    try:
+        os.makedirs(link_dir, exist_ok=True)
+        linked = []
+        for path in (video_path, thumbnail_path):
+            if not path:
+                linked.append(None)
+                continue
+            link_path = os.path.join(link_dir, os.path.basename(path))
+            if not os.path.exists(link_path):
+                os.link(path, link_path)
+            linked.append(os.path.normpath(link_path))
+        logger.info(f"Создана жесткая ссылка на скачанное ранее видео: {linked[0]}")
+        return linked[0], linked[1]
+    except OSError as e:
+        logger.warning(f"Не удалось создать жесткую ссылку в {link_dir}: {str(e)}")
+        return video_path, thumbnail_path
+
+def download_youtube_video(url: str, output_dir: str = OUTPUT_DIR, title: str = None,
+                           format_id: str = None, info: dict = None,
+                           engine_overrides: dict = None,
+                           reuse_existing: bool = True,
+                           progress_hooks: list = None) -> Tuple[str, Optional[str]]:
     """
     Скачивание видео с YouTube используя yt-dlp
-    Пытается скачать в Full HD (1080p), если недоступно - берет максимальное качество
+    Пытается скачать в Full HD (1080p), если недоступно - берет максимальное качество.
+    info - ранее полученный словарь extract_info: скачивание идет по нему через
+    process_ie_result без повторного извлечения; format_id - выбранный формат;
+    engine_overrides - настройки движка загрузки для этого видео (см. DownloadEngine).
+    Загрузка записывается в журнал: незавершенная загрузка того же видео
+    продолжается в прежней папке с тем же форматом (continuedl).
+    Если видео уже есть в библиотеке и файл цел, загрузка не выполняется
+    (см. find_existing_download); reuse_existing=False скачивает заново.
+    Скорость ограничивается общим планировщиком полосы (вес - bandwidth_weight);
+    progress_hooks - дополнительные хуки прогресса yt-dlp
     """
     logger.debug(f"Начало функции download_youtube_video с URL: {url}")
+    url = canonical_url(url)
+    job = None
+    bandwidth_job = None
     try:
         if not os.path.exists(output_dir):
             os.makedirs(output_dir)
+        
+        job = db.start_job(url, format_id, engine_overrides, output_dir)
+        
+        if reuse_existing:
+            existing = find_existing_download(url, output_dir)
+            if existing:
+                logger.info(f"Видео уже скачано, загрузка пропущена: {existing[0]}")
+                if job:
+                    db.update_job(job['job_id'], state='completed')
+                return existing
+        
+        if job and engine_overrides is None:
+            engine_overrides = job['engine_overrides']
             
-        # Получаем информацию о видео для создания папки
-        with YoutubeDL({'quiet': True}) as ydl:
-            info = ydl.extract_info(url, download=False)
+        # Одно извлечение на всё скачивание: и название, и выбор формата берутся из него
+        info = _resolve_download_info(url, info)
+        
+        resume = bool(job and job['video_dir'] and os.path.isdir(job['video_dir']))
+        if resume:
+            # Имена частично скачанных файлов зависят от названия и формата
+            video_dir = job['video_dir']
+            video_title = job['title'] or title or info['title']
+            logger.info(f"Продолжаем прерванную загрузку в папке: {video_dir}")
+        else:
             video_title = title or info['title']
             timestamp = f"{int(time.time())}_{random.randint(1000, 9999)}"
             video_dir = os.path.join(output_dir, f"{video_title}_{timestamp}")
@@ -198,33 +440,47 @@ def download_youtube_video(url: str, output_dir: str = OUTPUT_DIR, title: str =
             # Создаем отдельную папку для видео
             os.makedirs(video_dir, exist_ok=True)
             logger.debug(f"Создана папка для видео: {video_dir}")
+            if job:
+                db.update_job(job['job_id'], video_dir=video_dir, title=video_title)
             
-        # Сначала пробуем скачать в Full HD
+        # Доля общего лимита скачивания на время загрузки
+        bandwidth_job = bandwidth.register(
+            'ingress', download_engine.resolve(engine_overrides)['bandwidth_weight'], name=video_title
+        )
+        
         ydl_opts = {
-            'format': 'bestvideo[height=1080][ext=mp4]+bestaudio[ext=m4a]/best[height=1080][ext=mp4]/best[ext=mp4]/best',
+            'format': DEFAULT_DOWNLOAD_FORMAT,
             'outtmpl': os.path.join(video_dir, f"{video_title}.%(ext)s"),
+            # Слияние дорожек в MP4 выполняется копированием потоков
             'merge_output_format': 'mp4',
-            'postprocessors': [{
-                'key': 'FFmpegVideoConvertor',
-                'preferedformat': 'mp4',
-            }],
             'quiet': True,
             'no_warnings': True,
-            'writethumbnail': True,
+            # Прогресс передается хуками; строка прогресса в stdout смешалась бы с выводом cli.py
+            'noprogress': True,
+            # Превью не скачивается yt-dlp: оно берется из общего кэша после загрузки
+            'cachedir': ytdl_pool.cachedir,
+            # Частично скачанные файлы (.part, .ytdl) дописываются, а не начинаются заново
+            'continuedl': True,
+            **download_engine.ydl_options(engine_overrides, rate_limit=bandwidth_job.rate),
+            'progress_hooks': [bandwidth_job.progress_hook],
         }
+        if format_id:
+            # Выбранный пользователем формат; если он без звука, добавляем лучшую дорожку
+            ydl_opts['format'] = f"{format_id}+bestaudio[ext=m4a]/{format_id}+bestaudio/{format_id}/{DEFAULT_DOWNLOAD_FORMAT}"
+        if resume and job['selected_format']:
+            # Тот же формат, что и в прерванной загрузке, иначе части файлов не подойдут
+            ydl_opts['format'] = f"{job['selected_format']}/{ydl_opts['format']}"
+        if job:
+            ydl_opts['progress_hooks'].append(_journal_progress_hook(job['job_id']))
+        ydl_opts['progress_hooks'].extend(progress_hooks or [])
         
-        try:
-            # Пробуем скачать в Full HD
-            with YoutubeDL(ydl_opts) as ydl:
-                info = ydl.extract_info(url, download=True)
-                logger.info("Видео успешно скачано в Full HD качестве")
-        except Exception as e:
-            logger.info("Не удалось скачать в Full HD, пробуем максимальное качество")
-            # Если не получилось, скачиваем в максимальном качестве
-            ydl_opts['format'] = 'bestvideo[ext=mp4]+bestaudio[ext=m4a]/best[ext=mp4]/best'
-            with YoutubeDL(ydl_opts) as ydl:
-                info = ydl.extract_info(url, download=True)
-                logger.info("Видео успешно скачано в максимальном доступном качестве")
+        with bandwidth_job, YoutubeDL(ydl_opts) as ydl:
+            if job:
+                ydl.add_post_processor(JournalPP(job['job_id']), when='before_dl')
+            # Формат выбирается заново по селектору загрузки; исходный словарь не меняется
+            info = ydl.process_ie_result(_unselected_info(info), download=True)
+            logger.info(f"Видео скачано в формате {info.get('format_id')} ({info.get('resolution')})")
+            _ensure_mp4(ydl, info)
         
         video_path = os.path.join(video_dir, f"{video_title}.mp4")
         video_path = os.path.normpath(video_path)
@@ -244,7 +500,7 @@ def download_youtube_video(url: str, output_dir: str = OUTPUT_DIR, title: str =
         # Удаляем все лишние файлы, оставляем только MP4 и превью
         for file in os.listdir(video_dir):
             file_path = os.path.join(video_dir, file)
-            if file_path != video_path and not file.endswith(('.jpg', '.png', '.webp')):
+            if file_path != video_path and not file.endswith(THUMBNAIL_EXTENSIONS):
                 try:
                     os.remove(file_path)
                     logger.debug(f"Удален временный файл: {file_path}")
@@ -255,7 +511,12 @@ def download_youtube_video(url: str, output_dir: str = OUTPUT_DIR, title: str =
         thumbnail_url = info.get('thumbnail')
         thumbnail_path = None
         if thumbnail_url:
-            thumbnail_path = download_thumbnail(thumbnail_url, video_dir, video_title)
+            thumbnail_path = download_thumbnail(thumbnail_url, video_dir, video_title, info.get('id'))
+        
+        # Запоминаем путь к файлу для истории загрузок
+        db.update_download_path(url, video_path)
+        if job:
+            db.update_job(job['job_id'], state='completed')
         
         logger.info(f"Видео успешно скачано: {video_path}")
         if thumbnail_path:
@@ -266,6 +527,11 @@ def download_youtube_video(url: str, output_dir: str = OUTPUT_DIR, title: str =
     except Exception as e:
         logger.error(f"Ошибка при скачивании видео: {str(e)}")
         logger.error(f"Полный стек ошибки:\n{traceback.format_exc()}")
+        if bandwidth_job:
+            bandwidth_job.close()
+        if job:
+            # Папка и части файлов остаются: повторная загрузка продолжит с того же места
+            db.update_job(job['job_id'], state='failed', error=str(e))
         raise
 
 def download_progress_hook(d):
@@ -279,235 +545,290 @@ def download_progress_hook(d):
     elif d['status'] == 'finished':
         print("\nЗагрузка завершена!")
 
-def get_video_info(url: str) -> dict:
-    """Получение информации о видео"""
+def _fetch_video_info(url: str) -> dict:
+    """Получение информации о видео через yt-dlp с сохранением в БД"""
+    with ytdl_pool.acquire('metadata') as ydl:
+        info = ydl.extract_info(url, download=False)
+        # Сохраняем в БД
+        db.add_video(info)
+        return info
+
+def _refresh_video_info(url: str) -> Optional[dict]:
+    """Фоновое обновление устаревшей информации о видео; None при ошибке"""
+    try:
+        info = _fetch_video_info(url)
+        logger.debug(f"Информация о видео обновлена в фоне: {url}")
+        return info
+    except Exception as e:
+        logger.warning(f"Не удалось обновить информацию о видео {url}: {str(e)}")
+        return None
+    finally:
+        with _refreshing_lock:
+            _refreshing.pop(url, None)
+
+def refresh_video_info_async(url: str):
+    """Запуск фонового обновления, если оно еще не выполняется для этого URL; возвращает Future"""
+    with _refreshing_lock:
+        refresh = _refreshing.get(url)
+        if refresh is None:
+            refresh = _refreshing[url] = _refresh_executor.submit(_refresh_video_info, url)
+    return refresh
+
+def get_video_info(url: str, fresh: bool = False, fields: tuple = None) -> dict:
+    """
+    Получение информации о видео
+    Устаревший кэш возвращается сразу и обновляется в фоне (stale-while-revalidate);
+    fresh=True принудительно запрашивает актуальные данные, fields ограничивает
+    набор полей, по которым оценивается свежесть кэша
+    """
     logger.debug(f"Получение информации о видео: {url}")
+    # Убираем метки времени и плейлисты, чтобы ключ кэша совпадал с ID видео
+    url = canonical_url(url)
     
     # Сначала пробуем получить из БД
-    cached_info = db.get_video(url)
-    if cached_info:
-        logger.debug("Информация получена из кэша")
-        return cached_info
+    if not fresh:
+        cached_info = db.get_video(url)
+        if cached_info:
+            if db.is_stale(cached_info, fields):
+                logger.debug("Информация из кэша устарела, обновляем в фоне")
+                refresh_video_info_async(url)
+            else:
+                logger.debug("Информация получена из кэша")
+            return cached_info
     
     try:
-        ydl_opts = {
-            'quiet': True,
-            'no_warnings': True,
-        }
-        
-        with YoutubeDL(ydl_opts) as ydl:
-            info = ydl.extract_info(url, download=False)
-            # Сохраняем в БД
-            db.add_video(info)
-            return info
+        return _fetch_video_info(url)
     except Exception as e:
         logger.error(f"Ошибка при получении информации о видео: {str(e)}")
         raise
 
-def search_youtube_videos(query: str, min_views: int = 0, excluded_words: list = None, max_results: int = 50) -> list:
+def _video_summary(video_info: dict) -> dict:
+    """Краткая информация о видео для таблиц результатов"""
+    return {
+        'url': f"https://www.youtube.com/watch?v={video_info['id']}",
+        'title': video_info.get('title') or 'Без названия',
+        'views': video_info.get('view_count') or 0,
+        'duration': video_info.get('duration') or 0,
+        'thumbnail': video_info.get('thumbnail'),
+        'uploader': video_info.get('uploader') or 'Неизвестно',
+        'description': video_info.get('description') or '',
+        'upload_date': video_info.get('upload_date') or ''
+    }
+
+# Запас на округление числа просмотров в краткой выдаче поиска
+FLAT_VIEWS_TOLERANCE = 1.1
+
+@lru_cache(maxsize=64)
+def _search_filter(excluded_words: tuple) -> ContentFilter:
+    """Фильтр поиска: правила из файла плюс исключаемые слова в описании видео"""
+    if not excluded_words:
+        return content_filter
+    return content_filter.extend([FilterRule('excluded_words', ('description',), excluded_words)])
+
+def _passes_search_filters(video: dict, min_views: int, search_filter: ContentFilter, partial: bool = False) -> bool:
     """
-    Поиск видео на YouTube по заданным критериям
+    Проверка видео по критериям поиска
+    partial=True - предварительная проверка записи краткой выдачи (extract_flat):
+    видео отсеивается, только если оно заведомо не пройдет полную проверку
+    """
+    matched = search_filter.match(video)
+    if matched:
+        logger.debug(f"Пропущено видео {video.get('title')}: правило {matched.rule}, "
+                     f"поле {matched.field}, совпадение '{matched.value}'")
+        return False
+    
+    view_count = video.get('view_count')
+    
+    # Проверяем критерии
+    if partial:
+        # В краткой выдаче число просмотров округлено ("1,2 тыс."), поэтому
+        # отсеиваем только то, что не проходит порог и с учетом округления
+        if view_count is not None and view_count * FLAT_VIEWS_TOLERANCE < min_views:
+            return False
+    elif (view_count or 0) < min_views:
+        return False
+    
+    return True
+
+def iter_youtube_videos(query: str, min_views: int = 0, excluded_words: list = None,
+                        max_results: int = 50, cancel_event: threading.Event = None):
+    """
+    Поиск видео на YouTube с выдачей результатов по мере получения
+    Поиск в два этапа: кандидаты сначала проверяются по краткой выдаче
+    (название, канал, фрагмент описания, просмотры), и полностью запрашиваются
+    только прошедшие; затем фильтры применяются к полной информации. Поиск
+    прекращается после max_results подходящих видео или установки cancel_event.
+    Найденные видео сохраняются в БД при завершении, в том числе досрочном
     """
     logger.debug(f"Поиск видео по запросу: {query}, мин. просмотров: {min_views}, макс. результатов: {max_results}")
+    search_filter = _search_filter(tuple(word.lower() for word in (excluded_words or [])))
+    to_cache = []
+    summaries = []
+    cancelled = False
+    hydrated = 0
+    prefiltered = 0
     try:
-        ydl_opts = {
-            'quiet': True,
-            'no_warnings': True,
-            'extract_flat': False,
-            'force_generic_extractor': False,
-        }
-        
-        with YoutubeDL(ydl_opts) as ydl:
-            # Поиск видео
+        with ytdl_pool.acquire('search') as ydl:
+            # Список кандидатов (краткая выдача) запрашивается лениво, по страницам
             search_query = f"ytsearch{min(max_results * 2, 100)}:{query}"
-            results = ydl.extract_info(search_query, download=False)
+            results = ydl.extract_info(search_query, download=False, process=False)
             
             if not results or 'entries' not in results:
                 logger.warning("Ничего не найдено")
-                return []
+                return
             
-            # Фильтрация результатов
-            filtered_videos = []
-            excluded_words = [word.lower() for word in (excluded_words or [])]
-            
-            # Список украинских маркеров
-            ukrainian_markers = [
-                # Доменные зоны и сокращения
-                'ua', '.ua', 'укр', 'ukr',
-                
-                # Города
-                'київ', 'киев', 'львів', 'львов', 'харків', 'харьков', 
-                'одеса', 'одесса', 'дніпро', 'днепр', 'запоріжжя', 'запорожье',
-                
-                # Языковые маркеры
-                'україн', 'украин', 'украïн',
-                'украïнською', 'украïнська', 'українською', 'українська',
-                'украинский', 'украинская', 'по-украински',
-                
-                # Каналы и медиа
-                'тсн', 'громадське', 'общественное',
-                '1+1', 'інтер', 'интер', 'новий', 'новый',
-                'україна', 'украина', 'ukrainian',
-                
-                # Распространенные слова
-                'перемога', 'незалежність', 'майдан',
-                'слава україні', 'слава украине',
-                'вісті', 'вести', 'новини', 'новости украины'
-            ]
-            
-            for video in results['entries']:
-                if len(filtered_videos) >= max_results:
+            for entry in results['entries']:
+                if len(summaries) >= max_results:
                     break
-                    
-                if not video:
+                if cancel_event is not None and cancel_event.is_set():
+                    logger.info("Поиск отменен")
+                    cancelled = True
+                    break
+                if not entry:
                     continue
                 
-                # Проверяем различные поля на наличие украинских маркеров
-                is_ukrainian = False
-                
-                # Проверяем название канала
-                channel_name = video.get('channel', '').lower()
-                channel_title = video.get('channel_title', '').lower()
-                uploader = video.get('uploader', '').lower()
-                
-                for channel_identifier in [channel_name, channel_title, uploader]:
-                    if any(marker in channel_identifier for marker in ukrainian_markers):
-                        is_ukrainian = True
-                        logger.debug(f"Обнаружен украинский канал: {video.get('channel', 'Неизвестно')}")
-                        break
-                
-                # Проверяем язык канала
-                channel_lang = video.get('channel_language', '').lower()
-                if channel_lang in ['uk', 'ua']:
-                    is_ukrainian = True
-                    logger.debug(f"Обнаружен украинский язык канала: {channel_lang}")
-                
-                # Проверяем страну канала
-                channel_country = video.get('channel_country', '').lower()
-                if channel_country in ['ua', 'ukr', 'ukraine', 'україна', 'украина']:
-                    is_ukrainian = True
-                    logger.debug(f"Обнаружена украинская страна канала: {channel_country}")
-                
-                # Проверяем описание канала
-                channel_description = video.get('channel_description', '').lower()
-                if any(marker in channel_description for marker in ukrainian_markers):
-                    is_ukrainian = True
-                    logger.debug(f"Обнаружены украинские маркеры в описании канала")
-                
-                # Проверяем название и описание видео
-                title = video.get('title', '').lower()
-                description = video.get('description', '').lower()
-                
-                if any(marker in title for marker in ukrainian_markers):
-                    is_ukrainian = True
-                    logger.debug(f"Обнаружены украинские маркеры в названии видео: {video.get('title')}")
-                
-                if any(marker in description for marker in ukrainian_markers):
-                    is_ukrainian = True
-                    logger.debug(f"Обнаружены украинские маркеры в описании видео")
-                
-                # Пропускаем украинские видео
-                if is_ukrainian:
-                    logger.debug(f"Пропущено украинское видео: {video.get('title')}")
+                # Первый этап: отсев по данным краткой выдачи без извлечения
+                if not _passes_search_filters(entry, min_views, search_filter, partial=True):
+                    prefiltered += 1
                     continue
                 
-                view_count = video.get('view_count', 0)
-                
-                # Проверяем критерии
-                if view_count < min_views:
-                    continue
-                    
-                if excluded_words and any(word in description for word in excluded_words):
-                    continue
-                
-                # Сохраняем в БД для кэширования
+                # Второй этап: полная информация только для прошедших отсев
+                hydrated += 1
                 try:
-                    db.add_video(video)
+                    video = ydl.process_ie_result(entry, download=False)
                 except Exception as e:
-                    logger.error(f"Ошибка при сохранении видео в БД: {str(e)}")
+                    logger.warning(f"Не удалось получить информацию о видео: {str(e)}")
+                    continue
                 
-                filtered_videos.append({
-                    'url': f"https://www.youtube.com/watch?v={video['id']}",
-                    'title': video.get('title', 'Без названия'),
-                    'views': view_count,
-                    'duration': video.get('duration', 0),
-                    'thumbnail': video.get('thumbnail'),
-                    'uploader': video.get('uploader', 'Неизвестно'),
-                    'description': video.get('description', ''),
-                    'upload_date': video.get('upload_date', '')
-                })
+                if not video or not _passes_search_filters(video, min_views, search_filter):
+                    continue
+                
+                # Откладываем сохранение в БД до конца поиска
+                to_cache.append(video)
+                summaries.append(_video_summary(video))
+                yield summaries[-1]
+            
+            logger.info(f"Найдено видео: {len(summaries)}")
+            logger.info(f"Полных извлечений: {hydrated}, сэкономлено за счет краткой выдачи: {prefiltered}")
             
-            logger.info(f"Найдено видео: {len(filtered_videos)}")
-            return filtered_videos[:max_results]
+            # В кэш поиска попадают только завершенные поиски
+            if not cancelled:
+                db.put_search_results(
+                    db.search_cache_key(query, min_views, excluded_words, max_results), summaries
+                )
             
     except Exception as e:
         logger.error(f"Ошибка при поиске видео: {str(e)}")
         logger.debug(f"Полный стек ошибки:\n{traceback.format_exc()}")
         raise
+    finally:
+        # Сохраняем в БД для кэширования одной транзакцией
+        try:
+            db.add_videos(to_cache)
+        except Exception as e:
+            logger.error(f"Ошибка при сохранении видео в БД: {str(e)}")
+
+def get_cached_search(query: str, min_views: int = 0, excluded_words: list = None, max_results: int = 50):
+    """
+    Результаты того же поиска из кэша: пара (результаты, нужно ли обновить)
+    или None, если подходящей записи нет
+    """
+    return db.get_search_results(db.search_cache_key(query, min_views, excluded_words, max_results))
 
-def get_channel_videos(channel_url: str, max_videos: int = 50) -> list:
-    """Получение списка видео с канала"""
+def search_youtube_videos(query: str, min_views: int = 0, excluded_words: list = None, max_results: int = 50) -> list:
+    """
+    Поиск видео на YouTube по заданным критериям
+    Недавние результаты того же поиска берутся из кэша
+    """
+    cached = get_cached_search(query, min_views, excluded_words, max_results)
+    if cached and not cached[1]:
+        logger.info(f"Результаты поиска из кэша: {len(cached[0])}")
+        return cached[0]
+    return list(iter_youtube_videos(query, min_views, excluded_words, max_results))
+
+def _hydrate_entry(url: str) -> Optional[dict]:
+    """Получение информации об одном видео из списка канала"""
+    with ytdl_pool.acquire('flat') as ydl:
+        return ydl.extract_info(url, download=False, process=False)
+
+def get_channel_videos(channel_url: str, max_videos: int = 50,
+                       concurrency: int = CHANNEL_HYDRATION_WORKERS, on_result=None,
+                       video_filter: ContentFilter = None) -> list:
+    """
+    Получение списка видео с канала
+    Информация о видео запрашивается параллельно (не более concurrency запросов);
+    видео, свежие в БД, не запрашиваются. on_result(index, video) вызывается
+    по мере готовности каждого видео, index - позиция на канале.
+    video_filter исключает видео, попавшие под его правила
+    """
     logger.debug(f"Получение видео с канала: {channel_url}")
     try:
-        ydl_opts = {
-            'quiet': True,
-            'no_warnings': True,
-            'extract_flat': True,
-            'force_generic_extractor': False,
-            'playlistend': max_videos  # Ограничиваем количество видео
-        }
-        
-        with YoutubeDL(ydl_opts) as ydl:
+        # Ограничиваем количество видео
+        with ytdl_pool.acquire('flat', playlistend=max_videos) as ydl:
             # Получаем информацию о канале и его видео
             channel_info = ydl.extract_info(
                 channel_url,
                 download=False,
                 process=False
             )
+            entries = list(channel_info.get('entries', []))[:max_videos]  # Преобразуем генератор в список
+        
+        results = [None] * len(entries)
+        to_cache = []
+        pending = {}
+        
+        def report(index, video_info):
+            if video_filter is not None:
+                matched = video_filter.match(video_info)
+                if matched:
+                    logger.debug(f"Пропущено видео {video_info.get('title')}: правило {matched.rule}")
+                    return
+            results[index] = _video_summary(video_info)
+            if on_result:
+                on_result(index, results[index])
+        
+        # Видео, свежие в кэше, отдаем сразу, остальные запрашиваем в пуле потоков
+        with ThreadPoolExecutor(max_workers=max(1, concurrency), thread_name_prefix='channel-hydrate') as executor:
+            for index, entry in enumerate(entries):
+                if not entry or not entry.get('url'):
+                    continue
+                # Отсев по краткой выдаче (название, канал): такие видео не запрашиваются
+                if video_filter is not None and video_filter.match(entry):
+                    logger.debug(f"Пропущено видео {entry.get('title')} по краткой выдаче")
+                    continue
+                
+                cached_info = db.get_video(entry['url'])
+                if cached_info and not db.is_stale(cached_info):
+                    report(index, cached_info)
+                    continue
+                
+                pending[executor.submit(_hydrate_entry, entry['url'])] = index
             
-            videos = []
-            entries = list(channel_info.get('entries', []))  # Преобразуем генератор в список
-            
-            # Обрабатываем каждое видео
-            for entry in entries:
+            for future in as_completed(pending):
                 try:
                     # Получаем полную информацию о видео
-                    video_info = ydl.extract_info(
-                        entry['url'],
-                        download=False,
-                        process=False
-                    )
-                    
+                    video_info = future.result()
                     if not video_info:
                         continue
                     
-                    videos.append({
-                        'url': f"https://www.youtube.com/watch?v={video_info['id']}",
-                        'title': video_info.get('title', 'Без названия'),
-                        'views': video_info.get('view_count', 0),
-                        'duration': video_info.get('duration', 0),
-                        'thumbnail': video_info.get('thumbnail'),
-                        'uploader': video_info.get('uploader', 'Неизвестно'),
-                        'description': video_info.get('description', ''),
-                        'upload_date': video_info.get('upload_date', '')
-                    })
+                    report(pending[future], video_info)
+                    # Откладываем сохранение в БД до конца обработки
+                    to_cache.append(video_info)
                     
-                    # Сохраняем в БД для кэширования
-                    try:
-                        db.add_video(video_info)
-                    except Exception as e:
-                        logger.error(f"Ошибка при сохранении видео в БД: {str(e)}")
-                    
-                    # Проверяем достижение лимита
-                    if len(videos) >= max_videos:
-                        break
-                        
                 except Exception as e:
                     logger.error(f"Ошибка при получении информации о видео: {str(e)}")
                     continue
-            
-            logger.info(f"Найдено видео на канале: {len(videos)}")
-            return videos
+        
+        # Сохраняем в БД для кэширования одной транзакцией
+        try:
+            db.add_videos(to_cache)
+        except Exception as e:
+            logger.error(f"Ошибка при сохранении видео в БД: {str(e)}")
+        
+        videos = [video for video in results if video]
+        logger.info(f"Найдено видео на канале: {len(videos)} "
+                    f"(из кэша: {len(videos) - len(to_cache)}, запрошено: {len(pending)})")
+        return videos
             
     except Exception as e:
         logger.error(f"Ошибка при получении видео с канала: {str(e)}")
@@ -515,13 +836,8 @@ def get_channel_videos(channel_url: str, max_videos: int = 50) -> list:
         raise
 
 if __name__ == "__main__":
-    try:
-        youtube_video_url = input("Введите ссылку на YouTube видео: ")
-        video_path, thumb_path = download_youtube_video(youtube_video_url)
-        print(f"Видео сохранено: {video_path}")
-        if thumb_path:
-            print(f"Превью сохранено: {thumb_path}")
-    except KeyboardInterrupt:
-        logger.info("Процесс прерван пользователем")
-    except Exception as e:
-        logger.error(f"Критическая ошибка: {str(e)}")
+    # Командная строка вынесена в cli.py: python main.py принимает те же аргументы
+    # cli импортирует этот модуль как main; без этого он загрузился бы второй раз
+    sys.modules['main'] = sys.modules['__main__']
+    from cli import main as cli_main
+    sys.exit(cli_main())
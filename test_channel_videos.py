@@ -0,0 +1,56 @@
+"""
+Проверка get_channel_videos без сети: фильтр контента применяется только по запросу
+Запуск: python -m pytest test_channel_videos.py (или python test_channel_videos.py); нужен config.py
+"""
+from contextlib import contextmanager
+from unittest import mock
+
+import main
+
+# Обычные названия, в которых встречается маркер "ua" из filters.json
+TITLES = ['Video quality tips', 'How I usually edit', 'Learning a language', 'January recap', 'Cooking pasta']
+
+def make_entry(index):
+    video_id = f'vid{index:08d}'
+    return {
+        'id': video_id,
+        'url': f'https://www.youtube.com/watch?v={video_id}',
+        'title': TITLES[index],
+        'uploader': 'Test channel',
+    }
+
+class FakeYoutubeDL:
+    """Краткая выдача канала и полная информация о видео"""
+    def extract_info(self, url, download=False, process=False):
+        if 'watch?v=' in url:
+            index = int(url[-8:])
+            return {**make_entry(index), 'view_count': 100, 'duration': 60}
+        return {'entries': [make_entry(index) for index in range(len(TITLES))]}
+
+@contextmanager
+def fake_acquire(profile='metadata', **overrides):
+    yield FakeYoutubeDL()
+
+def channel_videos(**kwargs):
+    loaded = []
+    with mock.patch.object(main.ytdl_pool, 'acquire', fake_acquire), \
+            mock.patch.object(main.db, 'get_video', return_value=None), \
+            mock.patch.object(main.db, 'add_videos'):
+        videos = main.get_channel_videos('https://www.youtube.com/@test', max_videos=10,
+                                         on_result=lambda index, video: loaded.append(index), **kwargs)
+    return videos, loaded
+
+def test_unfiltered_listing_returns_every_entry():
+    videos, loaded = channel_videos()
+    assert [video['title'] for video in videos] == TITLES
+    assert sorted(loaded) == list(range(len(TITLES)))
+
+def test_filter_is_applied_when_passed():
+    videos, _ = channel_videos(video_filter=main.content_filter)
+    assert [video['title'] for video in videos] == ['Cooking pasta']
+
+if __name__ == '__main__':
+    for name, test in list(globals().items()):
+        if name.startswith('test_'):
+            test()
+            print(f"{name}: OK")
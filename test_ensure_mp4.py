@@ -0,0 +1,73 @@
+"""
+Проверка _ensure_mp4 на словаре, возвращенном process_ie_result
+Запуск: python -m pytest test_ensure_mp4.py (или python test_ensure_mp4.py); нужен config.py
+"""
+import os
+import tempfile
+from yt_dlp import YoutubeDL
+from yt_dlp.postprocessor import FFmpegVideoRemuxerPP, FFmpegVideoConvertorPP
+
+import main
+
+def make_info(ext, vcodec, acodec):
+    """Минимальный результат извлечения с одним форматом (как у прямой ссылки на файл)"""
+    return {
+        'id': 'dQw4w9WgXcQ',
+        'ext': ext,
+        'title': 'test',
+        'extractor': 'youtube',
+        'extractor_key': 'Youtube',
+        'webpage_url': 'https://www.youtube.com/watch?v=dQw4w9WgXcQ',
+        'formats': [{
+            'format_id': '1',
+            'url': 'http://127.0.0.1:9/video',
+            'ext': ext,
+            'vcodec': vcodec,
+            'acodec': acodec,
+            'protocol': 'https',
+        }],
+    }
+
+class RecordingYoutubeDL(YoutubeDL):
+    """YoutubeDL без скачивания: постпроцессоры только запоминаются"""
+    def __init__(self, params):
+        super().__init__(params)
+        self.run_pps = []
+
+    def run_pp(self, pp, infodict):
+        self.run_pps.append((pp, infodict))
+        return infodict
+
+def process(ext, vcodec, acodec):
+    outtmpl = os.path.join(tempfile.gettempdir(), '%(title)s.%(ext)s')
+    ydl = RecordingYoutubeDL({'quiet': True, 'simulate': True, 'outtmpl': outtmpl})
+    info = ydl.process_ie_result(make_info(ext, vcodec, acodec), download=True)
+    # Условие, при котором раньше возникал KeyError: 'ext'
+    assert 'ext' not in info['requested_downloads'][0]
+    return ydl, info
+
+def test_mp4_is_not_postprocessed():
+    ydl, info = process('mp4', 'avc1.64001F', 'mp4a.40.2')
+    result = main._ensure_mp4(ydl, info)
+    assert result['ext'] == 'mp4'
+    assert ydl.run_pps == []
+
+def test_compatible_codecs_are_remuxed():
+    ydl, info = process('mkv', 'avc1.64001F', 'mp4a.40.2')
+    main._ensure_mp4(ydl, info)
+    pp, infodict = ydl.run_pps[0]
+    assert isinstance(pp, FFmpegVideoRemuxerPP)
+    assert infodict['ext'] == 'mkv' and infodict['_filename'].endswith('.mkv')
+
+def test_incompatible_codecs_are_reencoded():
+    ydl, info = process('webm', 'vp9', 'opus')
+    main._ensure_mp4(ydl, info)
+    pp, infodict = ydl.run_pps[0]
+    assert isinstance(pp, FFmpegVideoConvertorPP)
+    assert infodict['ext'] == 'webm'
+
+if __name__ == '__main__':
+    for name, test in list(globals().items()):
+        if name.startswith('test_'):
+            test()
+            print(f"{name}: OK")
@@ -0,0 +1,196 @@
+import os
+import json
+import time
+import shutil
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+import requests
+
+logger = logging.getLogger(__name__)
+
+class ThumbnailCache:
+    """
+    Дисковый кэш превью, общий для загрузчика и интерфейса
+    Файл адресуется ID видео и хэшем URL превью, поэтому каждое превью
+    скачивается один раз. Объем кэша ограничен: при превышении удаляются
+    давно не использованные файлы. Устаревшие записи проверяются условным
+    запросом (ETag / If-Modified-Since) - неизмененное превью не скачивается
+    """
+    MAX_SIZE = 200 * 1024 * 1024    # Максимальный объем кэша на диске, байт
+    REVALIDATE_AFTER = 24 * 3600    # Сколько секунд превью используется без проверки на сервере
+    TIMEOUT = 15                    # Таймаут HTTP-запроса, секунд
+    LOCK_STRIPES = 32               # Блокировки по ключам: одно превью не скачивается дважды параллельно
+
+    def __init__(self, cache_dir='cache/thumbnails', max_size=None):
+        self.cache_dir = os.path.abspath(cache_dir)
+        self.max_size = max_size or self.MAX_SIZE
+        os.makedirs(self.cache_dir, exist_ok=True)
+        # Общая сессия: соединения с сервером превью переиспользуются
+        self.session = requests.Session()
+        self._lock = threading.Lock()
+        self._key_locks = [threading.Lock() for _ in range(self.LOCK_STRIPES)]
+        self._entries, self._total_size = self._scan()
+        # Статистика: из кэша, подтверждено сервером (304), скачано
+        self.hits = 0
+        self.revalidated = 0
+        self.downloads = 0
+        self.bytes_downloaded = 0
+
+    @staticmethod
+    def key(url, video_id=None):
+        """Ключ превью: ID видео и хэш URL (у одного видео бывают превью разных размеров)"""
+        digest = hashlib.sha1(url.encode('utf-8')).hexdigest()[:16]
+        if video_id:
+            safe_id = ''.join(c for c in str(video_id) if c.isalnum() or c in '-_')
+            return f"{safe_id}_{digest}"
+        return digest
+
+    def _data_path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.img")
+
+    def _meta_path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.json")
+
+    def _scan(self):
+        """Файлы кэша от давно использованных к недавним (по времени изменения)"""
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if name.endswith('.img'):
+                try:
+                    stat = os.stat(os.path.join(self.cache_dir, name))
+                    entries.append((stat.st_mtime, name[:-4], stat.st_size))
+                except OSError:
+                    continue
+        entries.sort()
+        ordered = OrderedDict((key, size) for _, key, size in entries)
+        return ordered, sum(ordered.values())
+
+    def _read_meta(self, key):
+        try:
+            with open(self._meta_path(key), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _write_meta(self, key, meta):
+        with open(self._meta_path(key), 'w', encoding='utf-8') as f:
+            json.dump(meta, f)
+
+    def _touch(self, key):
+        """Отметка использования: время изменения файла сохраняет порядок LRU между запусками"""
+        try:
+            os.utime(self._data_path(key))
+        except OSError:
+            pass
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+
+    def _store(self, key, data, meta):
+        """Атомарная запись превью и вытеснение старых записей"""
+        path = self._data_path(key)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+        self._write_meta(key, meta)
+
+        with self._lock:
+            self._total_size += len(data) - self._entries.pop(key, 0)
+            self._entries[key] = len(data)
+            evicted = []
+            while self._total_size > self.max_size and len(self._entries) > 1:
+                old_key, size = self._entries.popitem(last=False)
+                self._total_size -= size
+                evicted.append(old_key)
+
+        for old_key in evicted:
+            for old_path in (self._data_path(old_key), self._meta_path(old_key)):
+                try:
+                    os.remove(old_path)
+                except OSError:
+                    pass
+        if evicted:
+            logger.debug(f"Из кэша превью удалено записей: {len(evicted)}")
+
+    def get_path(self, url, video_id=None):
+        """Путь к файлу превью в кэше (при необходимости скачивается) или None"""
+        if not url:
+            return None
+        key = self.key(url, video_id)
+        path = self._data_path(key)
+
+        with self._key_locks[hash(key) % self.LOCK_STRIPES]:
+            meta = self._read_meta(key)
+            cached = meta is not None and os.path.exists(path)
+            if cached and time.time() - meta.get('checked_at', 0) < self.REVALIDATE_AFTER:
+                self._touch(key)
+                self.hits += 1
+                return path
+
+            headers = {}
+            if cached:
+                if meta.get('etag'):
+                    headers['If-None-Match'] = meta['etag']
+                if meta.get('last_modified'):
+                    headers['If-Modified-Since'] = meta['last_modified']
+
+            try:
+                response = self.session.get(url, headers=headers, timeout=self.TIMEOUT)
+                if cached and response.status_code == 304:
+                    meta['checked_at'] = time.time()
+                    self._write_meta(key, meta)
+                    self._touch(key)
+                    self.revalidated += 1
+                    return path
+                response.raise_for_status()
+
+                self._store(key, response.content, {
+                    'url': url,
+                    'etag': response.headers.get('ETag'),
+                    'last_modified': response.headers.get('Last-Modified'),
+                    'checked_at': time.time(),
+                })
+                self.downloads += 1
+                self.bytes_downloaded += len(response.content)
+                return path
+
+            except Exception as e:
+                logger.warning(f"Не удалось загрузить превью {url}: {str(e)}")
+                # Устаревшее превью лучше, чем никакого
+                return path if cached else None
+
+    def get(self, url, video_id=None):
+        """Содержимое превью (bytes) или None"""
+        path = self.get_path(url, video_id)
+        if not path:
+            return None
+        try:
+            with open(path, 'rb') as f:
+                return f.read()
+        except OSError as e:
+            logger.warning(f"Не удалось прочитать превью из кэша: {str(e)}")
+            return None
+
+    def copy_to(self, url, dest_path, video_id=None):
+        """Копирование превью из кэша в dest_path; возвращает dest_path или None"""
+        path = self.get_path(url, video_id)
+        if not path:
+            return None
+        shutil.copyfile(path, dest_path)
+        return dest_path
+
+    def stats(self):
+        """Статистика использования кэша"""
+        with self._lock:
+            entries, total_size = len(self._entries), self._total_size
+        return {
+            'entries': entries,
+            'size': total_size,
+            'hits': self.hits,
+            'revalidated': self.revalidated,
+            'downloads': self.downloads,
+            'bytes_downloaded': self.bytes_downloaded,
+        }
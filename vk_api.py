@@ -6,12 +6,16 @@ from urllib.parse import urlencode
 from config import VK_CLIENT_ID, VK_GROUP_ID, VK_API_VERSION
 import os
 from token_manager import TokenManager
+from bandwidth import ThrottledReader
+from urllib3.filepost import choose_boundary
 import time
 
 logger = logging.getLogger(__name__)
 
 class VkApi:
-    def __init__(self):
+    def __init__(self, bandwidth=None):
+        # Планировщик полосы (bandwidth.BandwidthScheduler) для ограничения отдачи
+        self.bandwidth = bandwidth
         self.client_id = VK_CLIENT_ID
         self.group_id = VK_GROUP_ID
         self.api_version = VK_API_VERSION
@@ -75,8 +79,26 @@ class VkApi:
             logger.error(f"Ошибка при получении сервера для загрузки: {str(e)}")
             raise 
 
-    def upload_video(self, access_token, video_path, title=None, description=None, is_private=0, group_id=None):
-        """Загрузка видео в ВК"""
+    def _upload_body(self, video_path, job=None):
+        """
+        Тело multipart-запроса с файлом видео
+        Файл читается по кускам во время отправки (а не целиком в память),
+        и каждый кусок учитывается лимитом отдачи
+        """
+        boundary = choose_boundary()
+        filename = os.path.basename(video_path).replace('"', '')
+        head = (
+            f'--{boundary}\r\n'
+            f'Content-Disposition: form-data; name="video_file"; filename="{filename}"\r\n'
+            f'Content-Type: video/mp4\r\n\r\n'
+        ).encode('utf-8')
+        tail = f'\r\n--{boundary}--\r\n'.encode('utf-8')
+        body = ThrottledReader([head, video_path, tail], job)
+        return body, f'multipart/form-data; boundary={boundary}'
+
+    def upload_video(self, access_token, video_path, title=None, description=None, is_private=0,
+                     group_id=None, bandwidth_weight=1.0):
+        """Загрузка видео в ВК (скорость отдачи ограничивается планировщиком полосы, если он задан)"""
         try:
             video_path = os.path.normpath(video_path)
             if not os.path.exists(video_path):
@@ -94,16 +116,21 @@ class VkApi:
             
             # Загружаем файл
             logger.info("Шаг 1: Загрузка файла на сервер...")
-            with open(video_path, 'rb') as video_file:
-                files = {'video_file': (os.path.basename(video_path), video_file, 'video/mp4')}
-                response = requests.post(upload_url, files=files)
+            job = self.bandwidth.register('egress', bandwidth_weight, name=title) if self.bandwidth else None
+            body, content_type = self._upload_body(video_path, job)
+            try:
+                response = requests.post(upload_url, data=body, headers={'Content-Type': content_type})
                 response.raise_for_status()
                 logger.debug(f"Ответ сервера на загрузку файла: {response.text}")
-            
-                upload_result = response.json()
-                video_hash = upload_result.get('video_hash')
-                if not video_hash:
-                    raise ValueError("Не получен video_hash после загрузки")
+            finally:
+                body.close()
+                if job:
+                    job.close()
+            
+            upload_result = response.json()
+            video_hash = upload_result.get('video_hash')
+            if not video_hash:
+                raise ValueError("Не получен video_hash после загрузки")
             
             # Сохраняем видео с названием
             logger.info("Шаг 2: Сохранение видео с параметрами...")
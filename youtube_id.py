@@ -0,0 +1,80 @@
+import re
+from functools import lru_cache
+from typing import Optional
+from urllib.parse import urlparse, parse_qs, unquote
+
+VIDEO_ID_RE = re.compile(r'^[0-9A-Za-z_-]{11}$')
+
+YOUTUBE_HOSTS = (
+    'youtube.com', 'www.youtube.com', 'm.youtube.com', 'music.youtube.com',
+    'gaming.youtube.com', 'youtube-nocookie.com', 'www.youtube-nocookie.com',
+)
+
+# Пути вида /shorts/ID, /embed/ID, /live/ID и т.д.
+PATH_PREFIXES = ('shorts', 'embed', 'v', 'e', 'live')
+
+@lru_cache(maxsize=4096)
+def extract_video_id(url: str) -> Optional[str]:
+    """
+    Получение канонического ID видео YouTube из URL любого вида:
+    watch?v=ID&t=30, youtu.be/ID, shorts/ID, embed/ID, ссылки с плейлистом
+    и просто ID. Возвращает None, если ID найти не удалось
+    """
+    if not url:
+        return None
+
+    url = url.strip()
+    if VIDEO_ID_RE.match(url):
+        return url
+
+    if '://' not in url:
+        url = f"https://{url}"
+
+    try:
+        parsed = urlparse(url)
+    except ValueError:
+        return None
+
+    host = (parsed.hostname or '').lower()
+    path_parts = [part for part in parsed.path.split('/') if part]
+    query = parse_qs(parsed.query)
+
+    if host in ('youtu.be', 'www.youtu.be'):
+        candidate = path_parts[0] if path_parts else None
+    elif host in YOUTUBE_HOSTS:
+        candidate = None
+        if 'v' in query:
+            candidate = query['v'][0]
+        elif len(path_parts) >= 2 and path_parts[0] in PATH_PREFIXES:
+            candidate = path_parts[1]
+        elif path_parts and path_parts[0] == 'attribution_link' and 'u' in query:
+            # attribution_link?u=/watch%3Fv%3DID
+            return extract_video_id(f"https://www.youtube.com{unquote(query['u'][0])}")
+    else:
+        return None
+
+    if candidate and VIDEO_ID_RE.match(candidate):
+        return candidate
+    return None
+
+def canonical_url(url: str) -> str:
+    """Приведение ссылки на видео к виду https://www.youtube.com/watch?v=ID"""
+    video_id = extract_video_id(url)
+    if video_id:
+        return f"https://www.youtube.com/watch?v={video_id}"
+    return url.strip()
+
+def video_key(url: str) -> str:
+    """Ключ видео для кэша: канонический ID или прежний разбор для прочих сайтов"""
+    return extract_video_id(url) or url.split('=')[-1]
+
+def parser_stats() -> dict:
+    """Статистика кэша разбора URL"""
+    info = extract_video_id.cache_info()
+    total = info.hits + info.misses
+    return {
+        'hits': info.hits,
+        'misses': info.misses,
+        'size': info.currsize,
+        'hit_rate': info.hits / total if total else 0.0,
+    }
@@ -0,0 +1,112 @@
+import os
+import queue
+import logging
+import threading
+from contextlib import contextmanager
+from yt_dlp import YoutubeDL
+
+logger = logging.getLogger(__name__)
+
+class YoutubeDLPool:
+    """
+    Пул заранее созданных экземпляров YoutubeDL
+    Экземпляр хранит загруженные экстракторы, cookie, HTTP-соединения и кэш
+    player JS, поэтому повторное использование экономит время на каждом запросе.
+    Одновременно экземпляром владеет только один поток
+    """
+    # Профили настроек; параметры, меняющиеся от вызова к вызову, передаются в acquire()
+    PROFILES = {
+        'metadata': {
+            'quiet': True,
+            'no_warnings': True,
+        },
+        'search': {
+            'quiet': True,
+            'no_warnings': True,
+            'extract_flat': False,
+            'force_generic_extractor': False,
+        },
+        'flat': {
+            'quiet': True,
+            'no_warnings': True,
+            'extract_flat': True,
+            'force_generic_extractor': False,
+        },
+    }
+    POOL_SIZE = 4  # Максимальное количество простаивающих экземпляров на профиль
+
+    def __init__(self, cachedir='cache/yt-dlp', profiles=None):
+        self.cachedir = os.path.abspath(cachedir)
+        self.profiles = dict(profiles or self.PROFILES)
+        self._pools = {name: queue.LifoQueue(maxsize=self.POOL_SIZE) for name in self.profiles}
+        self._closed = False
+
+    def options(self, profile, **overrides):
+        """Полные настройки профиля с общим постоянным cachedir"""
+        return {**self.profiles[profile], 'cachedir': self.cachedir, **overrides}
+
+    def _create(self, profile):
+        """Создание экземпляра с прогретым экстрактором YouTube"""
+        ydl = YoutubeDL(self.options(profile))
+        ydl.get_info_extractor('Youtube')
+        return ydl
+
+    def warm(self, profiles=None, count=1):
+        """Предварительное создание экземпляров"""
+        for profile in profiles or self.profiles:
+            for _ in range(count):
+                try:
+                    self._pools[profile].put_nowait(self._create(profile))
+                except queue.Full:
+                    break
+                except Exception as e:
+                    logger.warning(f"Не удалось подготовить экземпляр yt-dlp ({profile}): {str(e)}")
+                    return
+        logger.debug("Экземпляры yt-dlp подготовлены")
+
+    def warm_async(self, profiles=None, count=1):
+        """Подготовка экземпляров в фоновом потоке"""
+        threading.Thread(
+            target=self.warm, args=(profiles, count), name='ytdl-pool-warmup', daemon=True
+        ).start()
+
+    @contextmanager
+    def acquire(self, profile='metadata', **overrides):
+        """
+        Выдача экземпляра на время одной операции
+        overrides временно заменяют параметры профиля и восстанавливаются при возврате
+        """
+        try:
+            ydl = self._pools[profile].get_nowait()
+        except queue.Empty:
+            ydl = self._create(profile)
+
+        missing = object()
+        saved = {key: ydl.params.get(key, missing) for key in overrides}
+        ydl.params.update(overrides)
+        try:
+            yield ydl
+        finally:
+            for key, value in saved.items():
+                if value is missing:
+                    ydl.params.pop(key, None)
+                else:
+                    ydl.params[key] = value
+
+            if self._closed:
+                ydl.close()
+            else:
+                try:
+                    self._pools[profile].put_nowait(ydl)
+                except queue.Full:
+                    ydl.close()
+
+    def close(self):
+        """Закрытие всех простаивающих экземпляров"""
+        self._closed = True
+        for pool in self._pools.values():
+            while True:
+                try:
+                    pool.get_nowait().close()
+                except queue.Empty:
+                    break